@@ -0,0 +1,301 @@
+import math
+
+import numpy as np
+
+from mario_game import (
+    Game, SCREEN_HEIGHT, FPS, GRAVITY, JUMP_STRENGTH, JUMP_BOOST, PLAYER_SPEED, BOOSTED_SPEED, LEVEL_END_MARGIN,
+    INPUT_LEFT, INPUT_RIGHT, INPUT_JUMP, INPUT_JUMP_PRESSED,
+)
+
+class BatchGame:
+    """Many copies of one level simulated together in NumPy arrays.
+
+    Every array holds one row per game, so a single step() advances all of
+    them with vectorized code instead of Python loops over objects. The rules
+    are the same as Game.step(); a game stops changing once it is over or has
+    reached the end of the level (level_complete), where Game would move on
+    to the next level. Every object is always simulated, so on levels wider
+    than the active chunk window results differ from Game, which freezes
+    objects far from the player.
+    """
+    def __init__(self, num_games, level=1):
+        self.num_games = num_games
+        self.level = level
+        self.frame_count = 0
+
+        # Build the level once with the scalar engine and copy its layout
+        template = Game(headless=True)
+        template.current_level = level
+        template.setup_level()
+        n = num_games
+        self.world_width = template.world_width
+
+        # Static platforms never move, so they are shared by every game
+        platforms = template.platforms
+        self.platform_x = np.array([p.x for p in platforms], dtype=float)
+        self.platform_y = np.array([p.y for p in platforms], dtype=float)
+        self.platform_width = np.array([p.width for p in platforms], dtype=float)
+        self.platform_height = np.array([p.height for p in platforms], dtype=float)
+
+        # Moving platforms: layout is shared, position and direction per game
+        moving = template.moving_platforms
+        self.moving_y = np.array([p.y for p in moving], dtype=float)
+        self.moving_width = np.array([p.width for p in moving], dtype=float)
+        self.moving_height = np.array([p.height for p in moving], dtype=float)
+        self.moving_speed = np.array([p.speed for p in moving], dtype=float)
+        self.moving_min_x = np.array([p.min_x for p in moving], dtype=float)
+        self.moving_max_x = np.array([p.max_x for p in moving], dtype=float)
+        self.moving_x = np.tile(np.array([p.x for p in moving], dtype=float), (n, 1))
+        self.moving_direction = np.tile(np.array([p.direction for p in moving], dtype=float), (n, 1))
+
+        # Coins and power-ups: fixed layout plus a collected mask per game
+        coins = template.coins
+        self.coin_x = np.array([c.x for c in coins], dtype=float)
+        self.coin_y = np.array([c.y for c in coins], dtype=float)
+        self.coin_value = np.array([c.value for c in coins], dtype=np.int64)
+        self.coin_width = coins[0].width if coins else 0
+        self.coin_height = coins[0].height if coins else 0
+        self.coin_collected = np.zeros((n, len(coins)), dtype=bool)
+        self.coin_bob = np.zeros(n)
+
+        power_ups = template.power_ups
+        self.power_up_x = np.array([u.x for u in power_ups], dtype=float)
+        self.power_up_y = np.array([u.y for u in power_ups], dtype=float)
+        self.power_up_is_speed = np.array([u.power_type == "speed" for u in power_ups], dtype=bool)
+        self.power_up_is_jump = np.array([u.power_type == "jump" for u in power_ups], dtype=bool)
+        self.power_up_width = power_ups[0].width if power_ups else 0
+        self.power_up_height = power_ups[0].height if power_ups else 0
+        self.power_up_collected = np.zeros((n, len(power_ups)), dtype=bool)
+        self.power_up_bob = np.zeros(n)
+
+        # Enemies: patrol settings are shared, motion state is per game
+        enemies = template.enemies
+        self.enemy_speed = np.array([e.speed for e in enemies], dtype=float)
+        self.enemy_start_x = np.array([e.start_x for e in enemies], dtype=float)
+        self.enemy_width = np.array([e.width for e in enemies], dtype=float)
+        self.enemy_height = np.array([e.height for e in enemies], dtype=float)
+        self.enemy_patrol_distance = np.array([e.patrol_distance for e in enemies], dtype=float)
+        self.enemy_is_jumper = np.array([e.enemy_type == "jumper" for e in enemies], dtype=bool)
+        self.jumper_index = np.flatnonzero(self.enemy_is_jumper)
+        self.enemy_x = np.tile(np.array([e.x for e in enemies], dtype=float), (n, 1))
+        self.enemy_y = np.tile(np.array([e.y for e in enemies], dtype=float), (n, 1))
+        self.enemy_direction = np.tile(np.array([e.direction for e in enemies], dtype=float), (n, 1))
+        self.enemy_vel_y = np.zeros((n, len(enemies)))
+        self.enemy_jump_timer = np.zeros((n, len(enemies)), dtype=np.int64)
+
+        # Player
+        player = template.player
+        self.player_width = player.width
+        self.player_height = player.height
+        self.player_start_x = float(player.start_x)
+        self.player_start_y = float(player.start_y)
+        self.player_x = np.full(n, float(player.x))
+        self.player_y = np.full(n, float(player.y))
+        self.player_vel_x = np.zeros(n)
+        self.player_vel_y = np.zeros(n)
+        self.player_speed = np.full(n, float(player.speed))
+        self.player_on_ground = np.zeros(n, dtype=bool)
+        self.player_invincible = np.zeros(n, dtype=bool)
+        self.player_invincible_timer = np.zeros(n, dtype=np.int64)
+
+        # Game state
+        self.score = np.zeros(n, dtype=np.int64)
+        self.lives = np.full(n, template.lives, dtype=np.int64)
+        self.speed_boost_timer = np.zeros(n, dtype=np.int64)
+        self.jump_boost_timer = np.zeros(n, dtype=np.int64)
+        self.game_over = np.zeros(n, dtype=bool)
+        self.level_complete = np.zeros(n, dtype=bool)
+
+    def step(self, buttons):
+        """Advance every game by one frame.
+
+        buttons is an array of INPUT_* bitmasks, one per game, or a single
+        bitmask applied to all of them.
+        """
+        buttons = np.broadcast_to(np.asarray(buttons, dtype=np.uint8), (self.num_games,))
+        left = (buttons & INPUT_LEFT) != 0
+        right = (buttons & INPUT_RIGHT) != 0
+        jump = (buttons & INPUT_JUMP) != 0
+        jump_pressed = (buttons & INPUT_JUMP_PRESSED) != 0
+
+        # Special jump boost handling (happens before the update, like Game.step)
+        boost = ~self.level_complete & jump_pressed & (self.jump_boost_timer > 0) & self.player_on_ground
+        self.player_vel_y[boost] = JUMP_STRENGTH * JUMP_BOOST
+
+        active = ~(self.game_over | self.level_complete)
+
+        # Update power-up timers
+        counting = active & (self.speed_boost_timer > 0)
+        self.speed_boost_timer[counting] -= 1
+        self.player_speed[counting & (self.speed_boost_timer == 0)] = PLAYER_SPEED
+        counting = active & (self.jump_boost_timer > 0)
+        self.jump_boost_timer[counting] -= 1
+
+        # Player physics
+        died = self.update_players(active, left, right, jump)
+        active = active & ~died
+
+        self.update_moving_platforms(active)
+
+        # Coins and power-ups share one bob offset per game
+        ticks = self.frame_count * 1000 // FPS
+        self.coin_bob[active] = math.sin(ticks * 0.01) * 5
+        self.power_up_bob[active] = math.sin(ticks * 0.015) * 3
+
+        self.update_enemies(active)
+        self.handle_collisions(active)
+        self.frame_count += 1
+
+    def update_players(self, active, left, right, jump):
+        """Move the players; returns the mask of games whose player fell into a pit"""
+        invincible = active & self.player_invincible
+        self.player_invincible_timer[invincible] -= 1
+        self.player_invincible[invincible & (self.player_invincible_timer <= 0)] = False
+
+        vel_x = np.where(right, self.player_speed, np.where(left, -self.player_speed, 0.0))
+        self.player_vel_x = np.where(active, vel_x, self.player_vel_x)
+
+        jumping = active & jump & self.player_on_ground
+        self.player_vel_y[jumping] = JUMP_STRENGTH
+        self.player_on_ground[jumping] = False
+
+        self.player_vel_y[active] += GRAVITY
+        self.player_x[active] += self.player_vel_x[active]
+        self.player_y[active] += self.player_vel_y[active]
+        self.player_x[active] = np.clip(self.player_x[active], 0, self.world_width - self.player_width)
+
+        died = active & (self.player_y > SCREEN_HEIGHT)
+        self.lose_life(died)
+        return died
+
+    def update_moving_platforms(self, active):
+        rows = active[:, None]
+        moved = self.moving_x + self.moving_speed * self.moving_direction
+        self.moving_x = np.where(rows, moved, self.moving_x)
+        turn = rows & ((self.moving_x <= self.moving_min_x) | (self.moving_x >= self.moving_max_x))
+        self.moving_direction[turn] *= -1
+
+    def update_enemies(self, active):
+        rows = active[:, None]
+
+        # Jumping enemy logic, only for the jumper columns
+        if self.jumper_index.size:
+            cols = self.jumper_index
+            vel_y = self.enemy_vel_y[:, cols]
+            y = self.enemy_y[:, cols]
+            timer = self.enemy_jump_timer[:, cols]
+
+            vel_y = np.where(rows, vel_y + GRAVITY * 0.5, vel_y)
+            y = np.where(rows, y + vel_y, y)
+            timer = np.where(rows, timer + 1, timer)
+            jumping = rows & (timer > 120) & (np.abs(vel_y) < 1)
+            vel_y[jumping] = -12
+            timer[jumping] = 0
+
+            # Ground collision: land on the first platform that qualifies
+            plat_x, plat_y, plat_w, plat_h = self.all_platform_rects()
+            ex = np.trunc(self.enemy_x[:, cols])[:, :, None]
+            ey = np.trunc(y)[:, :, None]
+            ew = self.enemy_width[cols][None, :, None]
+            eh = self.enemy_height[cols][None, :, None]
+            px, py, pw, ph = (a[:, None, :] for a in (plat_x, plat_y, plat_w, plat_h))
+            hits = (ex < px + pw) & (px < ex + ew) & (ey < py + ph) & (py < ey + eh)
+            hits &= (vel_y > 0)[:, :, None] & (y[:, :, None] < py)
+            hits &= rows[:, :, None]
+            landed = hits.any(axis=2)
+            first = hits.argmax(axis=2)
+            ground = np.take_along_axis(np.broadcast_to(py, hits.shape), first[:, :, None], axis=2)[:, :, 0]
+            y = np.where(landed, ground - self.enemy_height[cols], y)
+            vel_y[landed] = 0
+
+            self.enemy_vel_y[:, cols] = vel_y
+            self.enemy_y[:, cols] = y
+            self.enemy_jump_timer[:, cols] = timer
+
+        # Horizontal movement and patrol turns
+        moved = self.enemy_x + self.enemy_speed * self.enemy_direction
+        self.enemy_x = np.where(rows, moved, self.enemy_x)
+        turn = rows & (np.abs(self.enemy_x - self.enemy_start_x) > self.enemy_patrol_distance)
+        self.enemy_direction[turn] *= -1
+        turn = rows & ((self.enemy_x <= 0) | (self.enemy_x >= self.world_width - self.enemy_width))
+        self.enemy_direction[turn] *= -1
+
+    def all_platform_rects(self):
+        """Static then moving platform rects as (games, platforms) arrays, in Game's order"""
+        n = self.num_games
+        static = len(self.platform_x)
+        def join(static_values, moving_values):
+            return np.concatenate([np.broadcast_to(static_values, (n, static)), moving_values], axis=1)
+        return (
+            join(self.platform_x, np.trunc(self.moving_x)),
+            join(self.platform_y, np.broadcast_to(self.moving_y, self.moving_x.shape)),
+            join(self.platform_width, np.broadcast_to(self.moving_width, self.moving_x.shape)),
+            join(self.platform_height, np.broadcast_to(self.moving_height, self.moving_x.shape)),
+        )
+
+    def handle_collisions(self, active):
+        # The player rect is taken once, before any landing adjusts it
+        rx = np.trunc(self.player_x)[:, None]
+        ry = np.trunc(self.player_y)[:, None]
+        rw = self.player_width
+        rh = self.player_height
+        rows = active[:, None]
+
+        # Platform collisions: the first qualifying platform wins
+        plat_x, plat_y, plat_w, plat_h = self.all_platform_rects()
+        hits = (rx < plat_x + plat_w) & (plat_x < rx + rw) & (ry < plat_y + plat_h) & (plat_y < ry + rh)
+        hits &= rows & (self.player_vel_y > 0)[:, None] & (self.player_y[:, None] < plat_y)
+        landed = hits.any(axis=1)
+        first = hits.argmax(axis=1)
+        ground = plat_y[np.arange(self.num_games), first]
+        self.player_y = np.where(landed, ground - rh, self.player_y)
+        self.player_vel_y[landed] = 0
+        self.player_on_ground[landed] = True
+
+        # Move player with platform
+        static = len(self.platform_x)
+        riding = landed & (first >= static)
+        if riding.any():
+            index = first[riding] - static
+            rides = np.flatnonzero(riding)
+            self.player_x[riding] += self.moving_speed[index] * self.moving_direction[rides, index]
+
+        # Coin collection
+        cy = np.trunc(self.coin_y + self.coin_bob[:, None])
+        hits = (rx < self.coin_x + self.coin_width) & (self.coin_x < rx + rw) & (ry < cy + self.coin_height) & (cy < ry + rh)
+        hits &= rows & ~self.coin_collected
+        self.coin_collected |= hits
+        self.score += hits @ self.coin_value
+
+        # Power-up collection
+        uy = np.trunc(self.power_up_y + self.power_up_bob[:, None])
+        hits = (rx < self.power_up_x + self.power_up_width) & (self.power_up_x < rx + rw) & (ry < uy + self.power_up_height) & (uy < ry + rh)
+        hits &= rows & ~self.power_up_collected
+        self.power_up_collected |= hits
+        self.score += 25 * hits.sum(axis=1)
+        speed = (hits & self.power_up_is_speed).any(axis=1)
+        self.speed_boost_timer[speed] = 300
+        self.player_speed[speed] = BOOSTED_SPEED
+        self.jump_boost_timer[(hits & self.power_up_is_jump).any(axis=1)] = 300
+
+        # Enemy collisions
+        ex = np.trunc(self.enemy_x)
+        ey = np.trunc(self.enemy_y)
+        hits = (rx < ex + self.enemy_width) & (ex < rx + rw) & (ry < ey + self.enemy_height) & (ey < ry + rh)
+        hit = active & ~self.player_invincible & hits.any(axis=1)
+        self.lose_life(hit)
+
+        # Check level completion (reach right side)
+        self.level_complete |= active & ~hit & (self.player_x > self.world_width - LEVEL_END_MARGIN)
+
+    def lose_life(self, mask):
+        self.lives[mask] -= 1
+        over = mask & (self.lives <= 0)
+        self.game_over |= over
+        reset = mask & ~over
+        self.player_x[reset] = self.player_start_x
+        self.player_y[reset] = self.player_start_y
+        self.player_vel_x[reset] = 0
+        self.player_vel_y[reset] = 0
+        self.player_invincible[reset] = True
+        self.player_invincible_timer[reset] = 120
@@ -0,0 +1,271 @@
+import argparse
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+# Time real drawing and presentation without needing a window
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+
+import pygame
+
+from mario_game import Game, InputFrame, SCREEN_WIDTH
+from level_format import LEVEL_DIR
+
+PHASES = ["update", "handle_collisions", "draw", "draw_hud", "present"]
+WARMUP_FRAMES = 60  # At most; short scenes warm up for a fifth of their frames
+
+DEFAULT_FRAMES = 600
+
+# Stress scenes copy every object of level 3 this many times; the bigger ones
+# are timed for fewer frames so the suite stays quick
+STRESS_SOURCE = "level3.json"
+STRESS_SCENES = [(10, 600), (100, 200), (1000, 30)]  # (copies, frames)
+
+# Scenes too slow for every run (a 1000x frame takes seconds), timed only when named with --scenes
+OPT_IN_SCENES = ["stress1000x"]
+
+# Startup is timed in this many fresh interpreters, one stage after another:
+# importing pygame, importing the game, setting up the first level headless,
+# stepping and drawing the first frame, and opening a window
+STARTUP_RUNS = 10
+STARTUP_STAGES = ["import_pygame", "import_game", "level_setup", "first_frame", "window", "process"]
+STARTUP_SCRIPT = """
+import json, time
+start = time.perf_counter()
+import pygame
+pygame_imported = time.perf_counter()
+from mario_game import Game, InputFrame
+game_imported = time.perf_counter()
+game = Game(headless=True)
+level_ready = time.perf_counter()
+game.step(InputFrame())
+game.draw()
+frame_drawn = time.perf_counter()
+window = Game()
+window.draw()
+pygame.display.flip()
+window_shown = time.perf_counter()
+print(json.dumps([pygame_imported - start, game_imported - pygame_imported, level_ready - game_imported,
+                  frame_drawn - level_ready, window_shown - frame_drawn]))
+"""
+
+# Relative slowdown a phase may show before compare reports a regression, and
+# the absolute difference below which timings count as noise
+DEFAULT_THRESHOLD = 0.25
+NOISE_MS = 0.05
+
+class Scene:
+    """A level file and the number of frames to time it for"""
+    def __init__(self, name, path, frames):
+        self.name = name
+        self.path = path
+        self.frames = frames
+
+class PhaseTimer:
+    """Wraps methods of one object and collects the duration of every call"""
+    def __init__(self):
+        self.samples = {phase: [] for phase in PHASES}
+        self.recording = False
+
+    def wrap(self, obj, name):
+        method = getattr(obj, name)
+        samples = self.samples[name]
+
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            result = method(*args, **kwargs)
+            if self.recording:
+                samples.append(time.perf_counter() - start)
+            return result
+        setattr(obj, name, timed)
+
+    def time(self, name, function):
+        start = time.perf_counter()
+        function()
+        if self.recording:
+            self.samples[name].append(time.perf_counter() - start)
+
+    def summary(self):
+        """Mean and p99 of every phase in milliseconds"""
+        result = {}
+        for phase, samples in self.samples.items():
+            if not samples:
+                continue
+            ordered = sorted(samples)
+            result[phase] = {
+                "mean_ms": sum(ordered) / len(ordered) * 1000,
+                "p99_ms": ordered[min(len(ordered) - 1, len(ordered) * 99 // 100)] * 1000,
+                "calls": len(ordered),
+            }
+        return result
+
+def script(frame):
+    """The fixed input script: mostly run right, sometimes back off, jump on a beat"""
+    back = frame // 240 % 4 == 3
+    return InputFrame(left=back, right=not back, jump=frame % 40 < 10, jump_pressed=frame % 40 == 0)
+
+def write_stress_level(directory, factor, seed=0):
+    """Write a level with factor copies of each object of the stress source level"""
+    with open(os.path.join(LEVEL_DIR, STRESS_SOURCE)) as f:
+        data = json.load(f)
+    rng = random.Random(seed)
+    for key in ("platforms", "moving_platforms", "coins", "enemies", "power_ups"):
+        copies = []
+        for item in data.get(key, []):
+            for i in range(factor):
+                copy = dict(item)
+                if i:
+                    shift = rng.uniform(-100, 100)
+                    copy["x"] = min(max(item["x"] + shift, 0), SCREEN_WIDTH - 60)
+                    if key == "moving_platforms":
+                        copy["min_x"] = item["min_x"] + copy["x"] - item["x"]
+                        copy["max_x"] = item["max_x"] + copy["x"] - item["x"]
+                copies.append(copy)
+        data[key] = copies
+    path = os.path.join(directory, f"stress{factor}.json")
+    with open(path, "w") as f:
+        json.dump(data, f)
+    return path
+
+def build_scenes(frames, directory):
+    game_levels = Game(headless=True).level_paths
+    scenes = [Scene(f"level{i}", path, frames or DEFAULT_FRAMES) for i, path in enumerate(game_levels, 1)]
+    for factor, scene_frames in STRESS_SCENES:
+        scenes.append(Scene(f"stress{factor}x", write_stress_level(directory, factor), frames or scene_frames))
+    return scenes
+
+def run_scene(scene):
+    """Play a scene with the input script and return its phase timings"""
+    game = Game()
+    game.level_paths = [scene.path]
+    game.setup_level()
+
+    timer = PhaseTimer()
+    for phase in ("update", "handle_collisions", "draw", "draw_hud"):
+        timer.wrap(game, phase)
+
+    warmup = min(WARMUP_FRAMES, scene.frames // 5)
+    for frame in range(warmup + scene.frames):
+        timer.recording = frame >= warmup
+        pygame.event.pump()
+        # Start over rather than sit on an end screen
+        if game.game_over or game.game_won:
+            game.restart_game()
+        game.step(script(frame))
+        game.draw()
+        timer.time("present", pygame.display.flip)
+    return timer.summary()
+
+def run_startup(runs=STARTUP_RUNS):
+    """Start the game in fresh interpreters and return the timings of each startup stage"""
+    timer = PhaseTimer()
+    timer.samples = {stage: [] for stage in STARTUP_STAGES}
+    environment = dict(os.environ, PYGAME_HIDE_SUPPORT_PROMPT="1")
+    directory = os.path.dirname(os.path.abspath(__file__))
+    for _ in range(runs):
+        start = time.perf_counter()
+        output = subprocess.run([sys.executable, "-c", STARTUP_SCRIPT], cwd=directory, env=environment,
+                                capture_output=True, text=True, check=True).stdout
+        timer.samples["process"].append(time.perf_counter() - start)
+        for stage, duration in zip(STARTUP_STAGES, json.loads(output)):
+            timer.samples[stage].append(duration)
+    return timer.summary()
+
+def run_suite(frames=None, names=None):
+    results = {}
+    if not names or "startup" in names:
+        print(f"startup: {STARTUP_RUNS} runs", file=sys.stderr)
+        results["startup"] = run_startup()
+    with tempfile.TemporaryDirectory() as directory:
+        for scene in build_scenes(frames, directory):
+            wanted = scene.name in names if names else scene.name not in OPT_IN_SCENES
+            if not wanted:
+                continue
+            print(f"{scene.name}: {scene.frames} frames", file=sys.stderr)
+            results[scene.name] = run_scene(scene)
+    return {
+        "python": platform.python_version(),
+        "pygame": pygame.version.ver,
+        "platform": platform.platform(),
+        "video_driver": os.environ["SDL_VIDEODRIVER"],
+        "scenes": results,
+    }
+
+def print_results(results):
+    startup = results["scenes"].get("startup")
+    if startup:
+        print(f"{'startup':<12} " + " ".join(f"{stage:>15}" for stage in STARTUP_STAGES))
+        print(f"{'mean ms':<12} " + " ".join(f"{startup[stage]['mean_ms']:>15.1f}" for stage in STARTUP_STAGES))
+        print()
+    if len(results["scenes"]) == (1 if startup else 0):
+        return
+    print(f"{'scene':<12} " + " ".join(f"{phase:>22}" for phase in PHASES))
+    print(f"{'':<12} " + " ".join(f"{'mean / p99 ms':>22}" for _ in PHASES))
+    for name, phases in results["scenes"].items():
+        if name == "startup":
+            continue
+        cells = []
+        for phase in PHASES:
+            timing = phases.get(phase)
+            cells.append(f"{timing['mean_ms']:>10.3f} / {timing['p99_ms']:<9.3f}" if timing else f"{'-':>22}")
+        print(f"{name:<12} " + " ".join(cells))
+
+def compare(baseline, current, threshold):
+    """Print every phase's change from the baseline; returns the list of regressions"""
+    regressions = []
+    for name, phases in baseline["scenes"].items():
+        if name not in current["scenes"]:
+            print(f"{name}: missing from the current results")
+            continue
+        for phase, before in phases.items():
+            after = current["scenes"][name].get(phase)
+            if after is None:
+                continue
+            for stat in ("mean_ms", "p99_ms"):
+                old, new = before[stat], after[stat]
+                change = (new - old) / old if old else 0.0
+                regressed = change > threshold and new - old > NOISE_MS
+                marker = "REGRESSED" if regressed else ""
+                print(f"{name:<12} {phase:<18} {stat:<8} {old:>9.3f} -> {new:>9.3f} ms {change:>+7.1%} {marker}")
+                if regressed:
+                    regressions.append((name, phase, stat, change))
+    return regressions
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Per-phase frame timing benchmarks")
+    commands = parser.add_subparsers(dest="command", required=True)
+    run_parser = commands.add_parser("run", help="run the benchmarks and save a JSON baseline")
+    run_parser.add_argument("--output", "-o", help="JSON file to write")
+    run_parser.add_argument("--frames", type=int, help="timed frames per scene (default: 600, fewer for the big stress scenes)")
+    run_parser.add_argument("--scenes", nargs="+", help="only run these scenes; startup is the startup timings, and "
+                            f"{', '.join(OPT_IN_SCENES)} only runs when named here")
+    compare_parser = commands.add_parser("compare", help="fail if a phase got slower than a baseline")
+    compare_parser.add_argument("baseline", help="JSON file from an earlier run")
+    compare_parser.add_argument("current", nargs="?", help="JSON file to check (default: run the benchmarks now)")
+    compare_parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD, help="allowed relative slowdown")
+    compare_parser.add_argument("--frames", type=int, help="timed frames per scene when running now")
+    args = parser.parse_args()
+
+    if args.command == "run":
+        results = run_suite(args.frames, args.scenes)
+        print_results(results)
+        if args.output:
+            with open(args.output, "w") as f:
+                json.dump(results, f, indent=2)
+    else:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if args.current:
+            with open(args.current) as f:
+                current = json.load(f)
+        else:
+            current = run_suite(args.frames, list(baseline["scenes"]))
+        regressions = compare(baseline, current, args.threshold)
+        print(f"{len(regressions)} regressions (threshold {args.threshold:.0%})")
+        sys.exit(1 if regressions else 0)
+    pygame.quit()
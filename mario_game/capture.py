@@ -0,0 +1,213 @@
+import argparse
+import os
+
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")  # Keep stdout clean for the raw export
+
+import queue
+import struct
+import sys
+import threading
+import time
+import zlib
+
+import pygame
+
+from mario_game import FPS
+
+# File layout: a header, then for every written frame its number (gaps are
+# dropped frames), seconds since the first frame, payload size and payload.
+# A payload is the screen's raw 32-bit pixels, zlib-compressed unless the
+# compression is "raw".
+MAGIC = b"MVID"
+VERSION = 1
+HEADER = struct.Struct("<4sBBHHHH4I")  # magic, version, compression, fps, width, height, pitch, RGBA masks
+FRAME = struct.Struct("<IdI")  # frame number, seconds, payload size
+COMPRESSIONS = ["raw", "zlib"]
+
+# Frames the game can be ahead of the writer before it starts dropping them
+RING_FRAMES = 8
+WRITER_NICENESS = 19
+ZLIB_LEVEL = 1  # Game screens are mostly flat colour, so the fastest level already does well
+
+class VideoCapture:
+    """Records what Game.run draws to a video file without holding up the game.
+
+    capture() only copies the screen into a free buffer of a preallocated
+    ring and hands it to a writer thread, which compresses and writes it.
+    When the writer falls behind and no buffer is free, the frame is
+    dropped and counted instead of waited for. At most fps frames a second
+    are kept, whatever the render rate.
+    """
+    def __init__(self, path, compression="zlib", fps=FPS, ring_frames=RING_FRAMES):
+        if compression not in COMPRESSIONS:
+            raise ValueError(f"unknown compression {compression!r}")
+        self.path = path
+        self.compression = compression
+        self.fps = fps
+        self.ring_frames = ring_frames
+        self.buffers = None  # Allocated on the first frame, once the screen format is known
+        self.free = queue.Queue()
+        self.filled = queue.Queue()
+        self.writer = None
+        self.file = None
+        self.start = 0.0
+        self.next_time = 0.0
+        self.frames = 0  # Frames kept or dropped, numbered from 0
+        self.written = 0
+        self.dropped = 0
+        self.copy_time = 0.0
+        self.max_copy_time = 0.0
+
+    def open(self, surface):
+        if surface.get_bitsize() != 32:
+            raise ValueError("video capture needs a 32-bit screen surface")
+        width, height = surface.get_size()
+        # Same format as the screen, so copying a frame in is a plain memcpy blit
+        self.buffers = [pygame.Surface((width, height), 0, surface) for _ in range(self.ring_frames)]
+        for slot in range(self.ring_frames):
+            self.free.put(slot)
+        self.file = open(self.path, "wb")
+        self.file.write(HEADER.pack(MAGIC, VERSION, COMPRESSIONS.index(self.compression), self.fps,
+                                    width, height, self.buffers[0].get_pitch(), *self.buffers[0].get_masks()))
+        self.writer = threading.Thread(target=self.write_frames, name="video-writer", daemon=True)
+        self.writer.start()
+        self.start = self.next_time = time.perf_counter()
+
+    def capture(self, surface):
+        """Queue a copy of surface for writing; returns False if the frame was skipped or dropped"""
+        if self.buffers is None:
+            self.open(surface)
+        start = time.perf_counter()
+        if start < self.next_time:
+            return False
+        # Keep to the frame rate without trying to make up for slow frames
+        self.next_time = max(self.next_time + 1 / self.fps, start) if self.fps else start
+        number = self.frames
+        self.frames += 1
+        try:
+            slot = self.free.get_nowait()
+        except queue.Empty:
+            self.dropped += 1
+            return False
+        self.buffers[slot].blit(surface, (0, 0))
+        self.filled.put((slot, number, start - self.start))
+        elapsed = time.perf_counter() - start
+        self.copy_time += elapsed
+        self.max_copy_time = max(self.max_copy_time, elapsed)
+        return True
+
+    def write_frames(self):
+        if sys.platform.startswith("linux"):
+            # Linux niceness is per thread: encode only in time the game leaves idle
+            os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), WRITER_NICENESS)
+        compress = self.compression == "zlib"
+        while True:
+            item = self.filled.get()
+            if item is None:
+                return
+            slot, number, seconds = item
+            # The buffer is locked while viewed, so it goes back on the free queue only once released
+            with memoryview(self.buffers[slot].get_buffer()) as pixels, pixels.cast("B") as data:
+                payload = zlib.compress(data, ZLIB_LEVEL) if compress else data
+                self.file.write(FRAME.pack(number, seconds, len(payload)))
+                self.file.write(payload)
+            self.free.put(slot)
+            self.written += 1
+
+    def close(self):
+        """Write out the queued frames and close the file; returns a one-line summary"""
+        if self.writer is not None:
+            self.filled.put(None)
+            self.writer.join()
+            self.file.close()
+            self.writer = None
+        return self.summary()
+
+    def summary(self):
+        kept = self.frames - self.dropped
+        mean = self.copy_time / kept * 1000 if kept else 0.0
+        return (f"{self.path}: {self.written} frames written, {self.dropped} dropped; "
+                f"capture cost {mean:.3f} ms mean, {self.max_copy_time * 1000:.3f} ms max per frame")
+
+class VideoInfo:
+    """Header of a video file"""
+    def __init__(self, compression, fps, width, height, pitch, masks):
+        self.compression = compression
+        self.fps = fps
+        self.width = width
+        self.height = height
+        self.pitch = pitch
+        self.masks = masks
+
+def read_video(path):
+    """Yield the VideoInfo of a video file, then (number, seconds, pixels) for every written frame"""
+    with open(path, "rb") as f:
+        magic, version, compression, fps, width, height, pitch, *masks = HEADER.unpack(f.read(HEADER.size))
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path} is not a version {VERSION} video")
+        info = VideoInfo(COMPRESSIONS[compression], fps, width, height, pitch, tuple(masks))
+        yield info
+        while True:
+            head = f.read(FRAME.size)
+            if len(head) < FRAME.size:
+                return
+            number, seconds, size = FRAME.unpack(head)
+            payload = f.read(size)
+            yield number, seconds, zlib.decompress(payload) if info.compression == "zlib" else payload
+
+def frame_surface(info, pixels):
+    """A pygame Surface holding one frame"""
+    surface = pygame.Surface((info.width, info.height), 0, 32, info.masks)
+    if surface.get_pitch() == info.pitch:
+        surface.get_buffer().write(pixels)
+    else:
+        row = info.width * 4
+        for y in range(info.height):
+            surface.get_buffer().write(pixels[y * info.pitch:y * info.pitch + row], y * surface.get_pitch())
+    return surface
+
+def ffmpeg_pixel_format(masks):
+    """The ffmpeg name of the byte order of the recorded pixels"""
+    names = {masks[0]: "r", masks[1]: "g", masks[2]: "b"}
+    return "".join(names.get(0xFF << (8 * i), "0") for i in range(4))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Inspect and export videos recorded with mario_game.py --capture")
+    commands = parser.add_subparsers(dest="command", required=True)
+    info_parser = commands.add_parser("info", help="show the size, length and dropped frames of a video")
+    info_parser.add_argument("video")
+    png_parser = commands.add_parser("png", help="save every frame as a PNG")
+    png_parser.add_argument("video")
+    png_parser.add_argument("directory")
+    raw_parser = commands.add_parser("raw", help="write raw frames to stdout, repeating frames over drops")
+    raw_parser.add_argument("video")
+    args = parser.parse_args()
+
+    frames = read_video(args.video)
+    info = next(frames)
+    if args.command == "info":
+        count = dropped = 0
+        last_number, last_seconds = -1, 0.0
+        for number, seconds, _ in frames:
+            count += 1
+            dropped += number - last_number - 1
+            last_number, last_seconds = number, seconds
+        print(f"{info.width}x{info.height} at up to {info.fps} fps, {info.compression}")
+        print(f"{count} frames, {dropped} dropped, {last_seconds:.1f} s")
+        print(f"convert with: python capture.py raw {args.video} | ffmpeg -f rawvideo "
+              f"-pix_fmt {ffmpeg_pixel_format(info.masks)} -s {info.width}x{info.height} -r {info.fps} -i - out.mp4")
+    elif args.command == "png":
+        os.makedirs(args.directory, exist_ok=True)
+        for number, _, pixels in frames:
+            pygame.image.save(frame_surface(info, pixels), os.path.join(args.directory, f"frame{number:06d}.png"))
+    else:
+        out = sys.stdout.buffer
+        row = info.width * 4
+        last_number, last = -1, None
+        for number, _, pixels in frames:
+            if info.pitch != row:
+                pixels = b"".join(pixels[y * info.pitch:y * info.pitch + row] for y in range(info.height))
+            for _ in range(number - last_number - 1 if last is not None else 0):
+                out.write(last)
+            out.write(pixels)
+            last_number, last = number, pixels
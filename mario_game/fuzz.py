@@ -0,0 +1,305 @@
+import argparse
+import json
+import multiprocessing
+import os
+import queue
+import random
+import struct
+import sys
+import time
+import traceback
+
+import pygame
+
+from mario_game import Game, InputFrame, FPS, INPUT_JUMP_PRESSED
+
+# One result per session: session id, level, policy, outcome, flags, frames, score,
+# then lives lost to each death cause, followed by an optional utf-8 detail message
+RESULT = struct.Struct("<IBBBBIi4H")
+
+OUTCOMES = ["completed", "game_over", "timeout", "crashed"]
+OUTCOME_COMPLETED, OUTCOME_GAME_OVER, OUTCOME_TIMEOUT, OUTCOME_CRASHED = range(4)
+DEATH_CAUSES = ["pit", "basic", "fast", "jumper"]
+
+FLAG_PINNED = 1  # Player sat inside a platform without moving
+FLAG_STALLED = 2  # Player made no progress to the right for a long time
+
+PIN_FRAMES = FPS * 2
+STALL_FRAMES = FPS * 20
+RESULT_QUEUE_SIZE = 1024
+RESULT_TIMEOUT = 1.0  # Seconds to wait for a result before checking the workers are alive
+
+class RandomPolicy:
+    """Random held buttons with occasional jump presses"""
+    def __init__(self, rng):
+        self.rng = rng
+        self.held = 0
+
+    def __call__(self, game):
+        if self.rng.random() < 0.1:
+            self.held = self.rng.randrange(8)
+        bits = self.held | (INPUT_JUMP_PRESSED if self.rng.random() < 0.05 else 0)
+        return InputFrame.from_bits(bits)
+
+class ScriptedPolicy:
+    """Run right and jump on a fixed rhythm picked by the seed"""
+    def __init__(self, rng):
+        self.period = rng.randrange(20, 60)
+        self.hold = rng.randrange(4, 16)
+        self.frame = rng.randrange(self.period)
+
+    def __call__(self, game):
+        beat = self.frame % self.period
+        self.frame += 1
+        return InputFrame(right=True, jump=beat < self.hold, jump_pressed=beat == 0)
+
+class GreedyPolicy:
+    """Head for the nearest coin ahead, else the end of the level, jumping over enemies and gaps"""
+    def __init__(self, rng):
+        self.rng = rng
+        self.chase_frames = {}  # id(coin) -> frames spent heading for it
+
+    def __call__(self, game):
+        player = game.player
+        center = player.x + player.width / 2
+        target = None
+        target_x, target_y = game.world_width, player.y
+        for coin in game.active_coins:
+            dx = coin.x + coin.width / 2 - center
+            if (-50 < dx < 300 and coin.y > player.y - 250 and abs(dx) < abs(target_x - center)
+                    and self.chase_frames.get(id(coin), 0) < FPS * 2):
+                target = coin
+                target_x, target_y = coin.x + coin.width / 2, coin.y
+        # Give up on coins that take too long to reach
+        if target is not None:
+            self.chase_frames[id(target)] = self.chase_frames.get(id(target), 0) + 1
+        right = target_x > center + 5
+        left = target_x < center - 5
+        direction = -1 if left else 1
+
+        # Jump for anything above, an enemy close ahead, or no ground under the next step
+        ahead = pygame.Rect(player.x + direction * player.width, player.y, player.width * 2, player.height)
+        below = pygame.Rect(player.x + direction * player.width, player.y + player.height, player.width, 300)
+        index = game.collision_index
+        jump = (target_y < player.y - 40
+                or any(ahead.colliderect(enemy.get_rect()) for enemy in index.enemies_near(ahead))
+                or not any(below.colliderect(platform.get_rect()) for platform in index.platforms_near(below))
+                or self.rng.random() < 0.01)
+        return InputFrame(left=left, right=right, jump=jump, jump_pressed=jump)
+
+POLICIES = {"random": RandomPolicy, "scripted": ScriptedPolicy, "greedy": GreedyPolicy}
+POLICY_NAMES = list(POLICIES)
+
+def session_plan(session, levels, policies, seed):
+    """Level, policy and seed of a session; the same arguments always give the same session"""
+    return levels[session % len(levels)], policies[session // len(levels) % len(policies)], seed + session
+
+def run_session(session, level, policy_name, seed, max_frames):
+    """Play one headless session from the start of a level and return a packed RESULT"""
+    deaths = [0] * len(DEATH_CAUSES)
+    flags = 0
+    frames = 0
+    score = 0
+    detail = ""
+    try:
+        game = Game(headless=True)
+        game.current_level = level
+        game.setup_level()
+        policy = POLICIES[policy_name](random.Random(seed))
+
+        outcome = OUTCOME_TIMEOUT
+        pinned = 0
+        best_x = game.player.x
+        last_progress = 0
+        last_position = None
+        while frames < max_frames:
+            lives = game.lives
+            game.step(policy(game))
+            frames += 1
+            if game.lives < lives:
+                deaths[DEATH_CAUSES.index(game.last_death)] += 1
+            if game.current_level != level or game.game_won:
+                outcome = OUTCOME_COMPLETED
+                break
+            if game.game_over:
+                outcome = OUTCOME_GAME_OVER
+                break
+
+            player = game.player
+            position = (player.x, player.y)
+            player_rect = player.get_rect()
+            inside = any(
+                player_rect.colliderect(platform.get_rect())
+                for platform in game.collision_index.platforms_near(player_rect)
+            )
+            pinned = pinned + 1 if inside and position == last_position else 0
+            last_position = position
+            if pinned == PIN_FRAMES:
+                flags |= FLAG_PINNED
+                detail = f"pinned at ({player.x:.1f}, {player.y:.1f}) on frame {frames}"
+
+            if player.x > best_x:
+                best_x = player.x
+                last_progress = frames
+            elif frames - last_progress == STALL_FRAMES:
+                flags |= FLAG_STALLED
+        score = game.score
+    except Exception:
+        outcome = OUTCOME_CRASHED
+        detail = traceback.format_exc(limit=-3)
+    packed = RESULT.pack(session, level, POLICY_NAMES.index(policy_name), outcome, flags, frames, score, *deaths)
+    return packed + detail.encode("utf-8")
+
+def worker(start, stride, sessions, levels, policies, seed, max_frames, results):
+    """Play every stride-th session from start and stream the results back"""
+    for session in range(start, sessions, stride):
+        level, policy, session_seed = session_plan(session, levels, policies, seed)
+        results.put(run_session(session, level, policy, session_seed, max_frames))
+
+class Stats:
+    """Aggregate results per (level, policy)"""
+    def __init__(self):
+        self.groups = {}
+        self.flagged = []  # (session, level, policy, what, detail)
+        self.frames = 0
+
+    def add(self, data):
+        (session, level, policy, outcome, flags, frames, score, *deaths) = RESULT.unpack_from(data)
+        detail = data[RESULT.size:].decode("utf-8")
+        policy = POLICY_NAMES[policy]
+        group = self.groups.setdefault((level, policy), {
+            "sessions": 0, "outcomes": [0] * len(OUTCOMES), "finish_frames": [], "scores": [],
+            "deaths": [0] * len(DEATH_CAUSES), "stalled": 0,
+        })
+        group["sessions"] += 1
+        group["outcomes"][outcome] += 1
+        group["scores"].append(score)
+        if outcome == OUTCOME_COMPLETED:
+            group["finish_frames"].append(frames)
+        for i, count in enumerate(deaths):
+            group["deaths"][i] += count
+        if flags & FLAG_STALLED:
+            group["stalled"] += 1
+        if outcome == OUTCOME_CRASHED:
+            self.flagged.append((session, level, policy, "crash", detail))
+        elif flags & FLAG_PINNED:
+            self.flagged.append((session, level, policy, "pinned", detail))
+        self.frames += frames
+
+    def summary(self):
+        rows = []
+        for (level, policy), group in sorted(self.groups.items()):
+            scores = sorted(group["scores"])
+            finish = sorted(group["finish_frames"])
+            rows.append({
+                "level": level,
+                "policy": policy,
+                "sessions": group["sessions"],
+                "completion_rate": group["outcomes"][OUTCOME_COMPLETED] / group["sessions"],
+                "outcomes": dict(zip(OUTCOMES, group["outcomes"])),
+                "frames_to_finish": {
+                    "mean": sum(finish) / len(finish) if finish else None,
+                    "median": percentile(finish, 50),
+                },
+                "score": {"min": scores[0], "p10": percentile(scores, 10), "median": percentile(scores, 50),
+                          "p90": percentile(scores, 90), "max": scores[-1]},
+                "deaths": dict(zip(DEATH_CAUSES, group["deaths"])),
+                "stalled": group["stalled"],
+            })
+        return rows
+
+def percentile(values, p):
+    """Nearest-rank percentile of sorted values"""
+    if not values:
+        return None
+    return values[min(len(values) - 1, len(values) * p // 100)]
+
+def run(sessions, levels, policies, seed, max_frames, workers):
+    """Fan sessions out over worker processes and aggregate what comes back"""
+    results = multiprocessing.Queue(RESULT_QUEUE_SIZE)
+    processes = [
+        multiprocessing.Process(
+            target=worker, args=(i, workers, sessions, levels, policies, seed, max_frames, results), daemon=True
+        )
+        for i in range(workers)
+    ]
+    for process in processes:
+        process.start()
+
+    stats = Stats()
+    # Sessions each worker has yet to report; worker i plays sessions i, i + workers, ...
+    remaining = [set(range(i, sessions, workers)) for i in range(workers)]
+    done = 0
+    start = time.perf_counter()
+    last_report = start
+    while done < sessions:
+        try:
+            received = [results.get(timeout=RESULT_TIMEOUT)]
+        except queue.Empty:
+            # Nothing is queued, so a worker that has exited will never report
+            # the rest of its sessions; count them as crashes instead of waiting
+            received = []
+            for i, process in enumerate(processes):
+                if remaining[i] and not process.is_alive():
+                    detail = f"worker {i} exited with code {process.exitcode} without reporting this session"
+                    for session in sorted(remaining[i]):
+                        level, policy, _ = session_plan(session, levels, policies, seed)
+                        packed = RESULT.pack(session, level, POLICY_NAMES.index(policy), OUTCOME_CRASHED,
+                                             0, 0, 0, *[0] * len(DEATH_CAUSES))
+                        received.append(packed + detail.encode("utf-8"))
+        for data in received:
+            session = RESULT.unpack_from(data)[0]
+            remaining[session % workers].discard(session)
+            stats.add(data)
+            done += 1
+        now = time.perf_counter()
+        if now - last_report > 2:
+            last_report = now
+            print(f"{done}/{sessions} sessions, {stats.frames / (now - start):.0f} frames/s", file=sys.stderr)
+    for process in processes:
+        process.join()
+    return stats, time.perf_counter() - start
+
+def print_report(stats, elapsed):
+    print(f"{'level':>5} {'policy':<9} {'sessions':>8} {'done':>6} {'finish':>7} "
+          f"{'score p10/p50/p90':>18}  deaths " + "/".join(DEATH_CAUSES) + "  stalled")
+    for row in stats.summary():
+        finish = row["frames_to_finish"]["median"]
+        score = row["score"]
+        print(f"{row['level']:>5} {row['policy']:<9} {row['sessions']:>8} {row['completion_rate']:>6.1%} "
+              f"{finish if finish is not None else '-':>7} "
+              f"{score['p10']:>6}/{score['median']}/{score['p90']:<6}  "
+              + "/".join(str(row["deaths"][cause]) for cause in DEATH_CAUSES) + f"  {row['stalled']}")
+    print(f"{stats.frames} frames in {elapsed:.1f}s ({stats.frames / elapsed:.0f} frames/s)")
+    for session, level, policy, what, detail in stats.flagged[:20]:
+        print(f"FLAGGED {what}: session {session} (level {level}, {policy})")
+        print("    " + detail.strip().replace("\n", "\n    "))
+    if len(stats.flagged) > 20:
+        print(f"... and {len(stats.flagged) - 20} more flagged sessions")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fuzz levels with many headless playthroughs across all cores")
+    parser.add_argument("--sessions", type=int, default=1000, help="number of playthroughs")
+    parser.add_argument("--frames", type=int, default=FPS * 60, help="frame limit per playthrough")
+    parser.add_argument("--levels", type=int, nargs="+", help="levels to fuzz (default: all)")
+    parser.add_argument("--policies", nargs="+", choices=POLICY_NAMES, default=POLICY_NAMES, help="input policies to use")
+    parser.add_argument("--seed", type=int, default=0, help="base seed; session n uses seed + n")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="worker processes")
+    parser.add_argument("--json", metavar="FILE", help="also write the statistics as JSON")
+    args = parser.parse_args()
+
+    levels = args.levels or list(range(1, len(Game(headless=True).level_paths) + 1))
+    stats, elapsed = run(args.sessions, levels, args.policies, args.seed, args.frames, max(1, args.workers))
+    print_report(stats, elapsed)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({
+                "frames": stats.frames,
+                "seconds": elapsed,
+                "groups": stats.summary(),
+                "flagged": [
+                    {"session": session, "level": level, "policy": policy, "kind": what, "detail": detail}
+                    for session, level, policy, what, detail in stats.flagged
+                ],
+            }, f, indent=2)
+    sys.exit(1 if stats.flagged else 0)
@@ -0,0 +1,221 @@
+import glob
+import json
+import mmap
+import os
+import re
+import struct
+import sys
+
+# Levels are edited as JSON and compiled to a binary .lvl file next to them,
+# which the game memory-maps when the level starts
+LEVEL_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "levels")
+
+MAGIC = b"MLVL"
+VERSION = 1
+HEADER = struct.Struct("<4sHH")  # magic, version, grid cell size
+# Difficulty color, background color, player start, bounds (left, top, right, bottom),
+# then counts of clouds, platforms, moving platforms, coins, enemies, power-ups,
+# grid cells and grid entries
+META = struct.Struct("<3B3Bdd4d8I")
+CLOUD = struct.Struct("<dd")
+PLATFORM = struct.Struct("<ddii3Bx")  # x, y, width, height, color
+MOVING_PLATFORM = struct.Struct("<ddiiddd")  # x, y, width, height, speed, min_x, max_x
+COIN = struct.Struct("<ddi")  # x, y, value
+ENEMY = struct.Struct("<dddB")  # x, y, speed, type
+POWER_UP = struct.Struct("<ddB")  # x, y, type
+GRID_CELL = struct.Struct("<iiII")  # cell x, cell y, first entry, entry count
+GRID_ENTRY = struct.Struct("<I")  # static platform index
+
+BROWN = (139, 69, 19)
+ENEMY_TYPES = ["basic", "fast", "jumper"]
+POWER_UP_TYPES = ["speed", "jump"]
+
+class LevelData:
+    """Plain level layout as loaded from a compiled level file"""
+    def __init__(self):
+        self.name = ""
+        self.difficulty = ""
+        self.difficulty_color = (255, 255, 255)
+        self.background = (0, 0, 0)
+        self.player_start = (0, 0)
+        self.bounds = (0, 0, 0, 0)
+        self.clouds = []
+        self.platforms = []  # (x, y, width, height, color)
+        self.moving_platforms = []  # (x, y, width, height, speed, min_x, max_x)
+        self.coins = []  # (x, y, value)
+        self.enemies = []  # (x, y, speed, enemy_type)
+        self.power_ups = []  # (x, y, power_type)
+        self.cell_size = 0
+        self.platform_cells = {}  # (cell x, cell y) -> static platform indices in level order
+
+def find_levels(level_dir=LEVEL_DIR):
+    """Level JSON files in play order (level1, level2, ..., level10, ...)"""
+    paths = glob.glob(os.path.join(level_dir, "*.json"))
+    def number(path):
+        digits = re.findall(r"\d+", os.path.basename(path))
+        return (int(digits[-1]) if digits else 0, path)
+    return sorted(paths, key=number)
+
+def platform_cells(platforms, cell_size):
+    """Bucket static platforms into grid cells the same way SpatialHash does"""
+    cells = {}
+    for i, (x, y, width, height, color) in enumerate(platforms):
+        left, top = int(x), int(y)
+        right, bottom = left + int(width), top + int(height)
+        for cx in range(left // cell_size, (right - 1) // cell_size + 1):
+            for cy in range(top // cell_size, (bottom - 1) // cell_size + 1):
+                cells.setdefault((cx, cy), []).append(i)
+    return cells
+
+def compile_level(source, cell_size):
+    """Compile a level JSON file to the bytes of a .lvl file"""
+    with open(source) as f:
+        data = json.load(f)
+
+    platforms = [(p["x"], p["y"], p["w"], p["h"], tuple(p.get("color", BROWN))) for p in data.get("platforms", [])]
+    moving = [(p["x"], p["y"], p["w"], p["h"], p["speed"], p["min_x"], p["max_x"]) for p in data.get("moving_platforms", [])]
+    coins = [(c["x"], c["y"], c.get("value", 10)) for c in data.get("coins", [])]
+    enemies = [(e["x"], e["y"], e.get("speed", 2), ENEMY_TYPES.index(e.get("type", "basic"))) for e in data.get("enemies", [])]
+    power_ups = [(u["x"], u["y"], POWER_UP_TYPES.index(u.get("type", "speed"))) for u in data.get("power_ups", [])]
+    clouds = [tuple(c) for c in data.get("clouds", [])]
+    cells = sorted(platform_cells(platforms, cell_size).items())
+
+    # Bounds of everything solid or collectable
+    boxes = [(x, y, x + w, y + h) for x, y, w, h, _ in platforms]
+    boxes += [(min_x, y, max_x + w, y + h) for x, y, w, h, _, min_x, max_x in moving]
+    boxes += [(x, y, x, y) for x, y, *_ in coins + enemies + power_ups]
+    if boxes:
+        bounds = (min(b[0] for b in boxes), min(b[1] for b in boxes), max(b[2] for b in boxes), max(b[3] for b in boxes))
+    else:
+        bounds = (0, 0, 0, 0)
+
+    out = bytearray(HEADER.pack(MAGIC, VERSION, cell_size))
+    for text in (data.get("name", ""), data.get("difficulty", "")):
+        encoded = text.encode("utf-8")
+        out += bytes([len(encoded)]) + encoded
+    out += META.pack(
+        *data.get("difficulty_color", (255, 255, 255)), *data.get("background", (0, 0, 0)),
+        *data.get("player_start", (50, 500)), *bounds,
+        len(clouds), len(platforms), len(moving), len(coins), len(enemies), len(power_ups),
+        len(cells), sum(len(ids) for _, ids in cells),
+    )
+    for cloud in clouds:
+        out += CLOUD.pack(*cloud)
+    for x, y, w, h, color in platforms:
+        out += PLATFORM.pack(x, y, w, h, *color)
+    for platform in moving:
+        out += MOVING_PLATFORM.pack(*platform)
+    for coin in coins:
+        out += COIN.pack(*coin)
+    for enemy in enemies:
+        out += ENEMY.pack(*enemy)
+    for power_up in power_ups:
+        out += POWER_UP.pack(*power_up)
+    entry = 0
+    for (cx, cy), ids in cells:
+        out += GRID_CELL.pack(cx, cy, entry, len(ids))
+        entry += len(ids)
+    for _, ids in cells:
+        for i in ids:
+            out += GRID_ENTRY.pack(i)
+    return bytes(out)
+
+def compiled_path(source):
+    return os.path.splitext(source)[0] + ".lvl"
+
+def write_compiled(target, data):
+    """Write a .lvl file so that readers only ever see the old file or the complete new one"""
+    # Every process writes its own file in the same folder, then renames it into place
+    temp = f"{target}.{os.getpid()}.tmp"
+    try:
+        with open(temp, "wb") as f:
+            f.write(data)
+        os.replace(temp, target)
+    except BaseException:
+        if os.path.exists(temp):
+            os.unlink(temp)
+        raise
+
+def compile_if_stale(source, cell_size):
+    """Compile source unless its .lvl is already newer; returns the .lvl path"""
+    target = compiled_path(source)
+    if not os.path.exists(target) or os.path.getmtime(target) < os.path.getmtime(source) or read_cell_size(target) != cell_size:
+        write_compiled(target, compile_level(source, cell_size))
+    return target
+
+def open_level(source, cell_size):
+    """The LevelData of a level JSON file, memory-mapped from its compiled .lvl file.
+    
+    Where the .lvl file cannot be written, such as in a read-only install,
+    the level is compiled in memory instead.
+    """
+    try:
+        target = compile_if_stale(source, cell_size)
+    except OSError:
+        return unpack_level(compile_level(source, cell_size), source)
+    return load_level(target)
+
+def read_cell_size(path):
+    with open(path, "rb") as f:
+        header = f.read(HEADER.size)
+    if len(header) < HEADER.size:
+        return None
+    magic, version, cell_size = HEADER.unpack(header)
+    return cell_size if magic == MAGIC and version == VERSION else None
+
+def load_level(path):
+    """Memory-map a compiled level file and unpack it into a LevelData"""
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+        return unpack_level(mapped, path)
+
+def unpack_level(buffer, path):
+    """Unpack the bytes of a compiled level file into a LevelData"""
+    level = LevelData()
+    view = memoryview(buffer)
+    try:
+        magic, version, level.cell_size = HEADER.unpack_from(view)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path} is not a version {VERSION} level file")
+        offset = HEADER.size
+        strings = []
+        for _ in range(2):
+            length = view[offset]
+            strings.append(bytes(view[offset + 1:offset + 1 + length]).decode("utf-8"))
+            offset += 1 + length
+        level.name, level.difficulty = strings
+
+        meta = META.unpack_from(view, offset)
+        offset += META.size
+        level.difficulty_color = meta[0:3]
+        level.background = meta[3:6]
+        level.player_start = meta[6:8]
+        level.bounds = meta[8:12]
+        clouds, platforms, moving, coins, enemies, power_ups, cells, entries = meta[12:20]
+
+        def section(record, count):
+            nonlocal offset
+            end = offset + record.size * count
+            rows = list(record.iter_unpack(view[offset:end])) if count else []
+            offset = end
+            return rows
+
+        level.clouds = section(CLOUD, clouds)
+        level.platforms = [(x, y, w, h, (r, g, b)) for x, y, w, h, r, g, b in section(PLATFORM, platforms)]
+        level.moving_platforms = section(MOVING_PLATFORM, moving)
+        level.coins = section(COIN, coins)
+        level.enemies = [(x, y, speed, ENEMY_TYPES[kind]) for x, y, speed, kind in section(ENEMY, enemies)]
+        level.power_ups = [(x, y, POWER_UP_TYPES[kind]) for x, y, kind in section(POWER_UP, power_ups)]
+        grid = section(GRID_CELL, cells)
+        ids = [i for (i,) in section(GRID_ENTRY, entries)]
+        level.platform_cells = {(cx, cy): ids[first:first + count] for cx, cy, first, count in grid}
+    finally:
+        view.release()
+    return level
+
+if __name__ == "__main__":
+    # Compile the given level files, or every level in the levels folder
+    from mario_game import CELL_SIZE
+    for source in sys.argv[1:] or find_levels():
+        target = compiled_path(source)
+        write_compiled(target, compile_level(source, CELL_SIZE))
+        print(f"{source} -> {target} ({os.path.getsize(target)} bytes)")
@@ -0,0 +1,297 @@
+import multiprocessing
+import os
+import random
+from multiprocessing import shared_memory
+
+import numpy as np
+import pygame
+
+from mario_game import Game, InputFrame, SCREEN_WIDTH, SCREEN_HEIGHT
+from rasterizer import Rasterizer
+
+# Discrete actions as (left, right, jump)
+ACTIONS = [
+    (False, False, False),  # 0: nothing
+    (True, False, False),  # 1: left
+    (False, True, False),  # 2: right
+    (False, False, True),  # 3: jump
+    (True, False, True),  # 4: left + jump
+    (False, True, True),  # 5: right + jump
+]
+
+# Feature observation: the player, then the nearest few of each kind of object
+# relative to the player, each slot starting with a present flag
+PLAYER_FEATURES = 8
+OBS_ENEMIES, ENEMY_FEATURES = 4, 5
+OBS_COINS, COIN_FEATURES = 4, 3
+OBS_POWER_UPS, POWER_UP_FEATURES = 2, 4
+OBS_PLATFORMS, PLATFORM_FEATURES = 6, 5
+OBSERVATION_SIZE = (PLAYER_FEATURES + OBS_ENEMIES * ENEMY_FEATURES + OBS_COINS * COIN_FEATURES
+                    + OBS_POWER_UPS * POWER_UP_FEATURES + OBS_PLATFORMS * PLATFORM_FEATURES)
+ENEMY_TYPES = ["basic", "fast", "jumper"]
+POWER_UP_TYPES = ["speed", "jump"]
+
+# Reward: points scored, new ground covered to the right, lives lost, levels finished
+SCORE_REWARD = 0.01
+PROGRESS_REWARD = 0.01
+DEATH_PENALTY = 1.0
+LEVEL_REWARD = 10.0
+
+def observation_spec(observation, downsample=4):
+    """(shape, dtype) of one observation of the given kind"""
+    if observation == "features":
+        return (OBSERVATION_SIZE,), np.float32
+    if observation == "grid":
+        return Rasterizer(downsample).shape, np.uint8
+    raise ValueError(f"unknown observation kind {observation!r}")
+
+def nearest(objects, x, y, count):
+    """The count objects closest to (x, y)"""
+    return sorted(objects, key=lambda obj: (obj.x - x) ** 2 + (obj.y - y) ** 2)[:count]
+
+def observe(game, out):
+    """Write the feature observation of player 1 into the float32 array out"""
+    out[:] = 0
+    player = game.player
+    x, y = player.x, player.y
+    out[0:PLAYER_FEATURES] = (
+        x / game.world_width, y / SCREEN_HEIGHT, player.vel_x / 10, player.vel_y / 15,
+        player.on_ground, player.invincible, game.speed_boost_timer / 300, game.jump_boost_timer / 300,
+    )
+    i = PLAYER_FEATURES
+    for enemy in nearest(game.active_enemies, x, y, OBS_ENEMIES):
+        out[i:i + ENEMY_FEATURES] = (
+            1, (enemy.x - x) / SCREEN_WIDTH, (enemy.y - y) / SCREEN_HEIGHT,
+            enemy.speed * enemy.direction / 10, ENEMY_TYPES.index(enemy.enemy_type) / 2,
+        )
+        i += ENEMY_FEATURES
+    i = PLAYER_FEATURES + OBS_ENEMIES * ENEMY_FEATURES
+    for coin in nearest(game.active_coins, x, y, OBS_COINS):
+        out[i:i + COIN_FEATURES] = (1, (coin.x - x) / SCREEN_WIDTH, (coin.y - y) / SCREEN_HEIGHT)
+        i += COIN_FEATURES
+    i = PLAYER_FEATURES + OBS_ENEMIES * ENEMY_FEATURES + OBS_COINS * COIN_FEATURES
+    for power_up in nearest(game.active_power_ups, x, y, OBS_POWER_UPS):
+        out[i:i + POWER_UP_FEATURES] = (
+            1, (power_up.x - x) / SCREEN_WIDTH, (power_up.y - y) / SCREEN_HEIGHT,
+            POWER_UP_TYPES.index(power_up.power_type),
+        )
+        i += POWER_UP_FEATURES
+    i = OBSERVATION_SIZE - OBS_PLATFORMS * PLATFORM_FEATURES
+    view = pygame.Rect(x - SCREEN_WIDTH // 2, 0, SCREEN_WIDTH, SCREEN_HEIGHT)
+    for platform in nearest(game.collision_index.platforms_near(view), x, y, OBS_PLATFORMS):
+        out[i:i + PLATFORM_FEATURES] = (
+            1, (platform.x - x) / SCREEN_WIDTH, (platform.y - y) / SCREEN_HEIGHT,
+            platform.width / SCREEN_WIDTH, hasattr(platform, "direction"),
+        )
+        i += PLATFORM_FEATURES
+    return out
+
+class MarioEnv:
+    """Gym-style wrapper around one Game for training agents.
+
+    step() applies one of ACTIONS for frame_skip game frames: the action is
+    held for the first action_repeat of them (all of them by default) and
+    released after that. With sticky_prob, each frame keeps the previous
+    frame's action with that probability instead, as in the Arcade Learning
+    Environment. Rendering is off unless render_mode is "rgb_array" or
+    "human".
+
+    observation is "features" for a float32 vector of the player and nearby
+    objects, or "grid" for a uint8 (channels, height, width) rasterizer.Rasterizer
+    grid of the view at 1/downsample resolution.
+    """
+    def __init__(self, frame_skip=4, action_repeat=None, sticky_prob=0.0, max_steps=5000,
+                 start_level=1, noop_max=0, render_mode=None, observation="features", downsample=4):
+        self.frame_skip = frame_skip
+        self.action_repeat = frame_skip if action_repeat is None else action_repeat
+        self.sticky_prob = sticky_prob
+        self.max_steps = max_steps
+        self.start_level = start_level
+        self.noop_max = noop_max
+        self.render_mode = render_mode
+        self.action_count = len(ACTIONS)
+        self.observation_shape, self.observation_dtype = observation_spec(observation, downsample)
+        self.rasterizer = Rasterizer(downsample) if observation == "grid" else None
+
+        self.game = Game(headless=render_mode != "human")
+        self.rng = random.Random()
+        self.observation = np.zeros(self.observation_shape, dtype=self.observation_dtype)
+        self.last_action = 0
+        self.steps = 0
+        self.best_x = 0
+
+    def reset(self, seed=None):
+        """Start a new episode; returns the first observation"""
+        if seed is not None:
+            self.rng.seed(seed)
+        game = self.game
+        game.restart_game()
+        if self.start_level != 1:
+            game.current_level = self.start_level
+            game.setup_level()
+        game.frame_count = 0
+        self.last_action = 0
+        self.steps = 0
+        for _ in range(self.rng.randint(0, self.noop_max)):
+            game.step(InputFrame())
+        self.best_x = game.player.x
+        return self.observe()
+
+    def step(self, action):
+        """Returns (observation, reward, done, info)"""
+        game = self.game
+        score, lives, level = game.score, game.lives, game.current_level
+        jumping = ACTIONS[self.last_action][2]
+        for frame in range(self.frame_skip):
+            if game.game_over or game.game_won:
+                break
+            if frame >= self.action_repeat:
+                current = 0
+            elif self.sticky_prob and self.rng.random() < self.sticky_prob:
+                current = self.last_action
+            else:
+                current = action
+            left, right, jump = ACTIONS[current]
+            game.step(InputFrame(left=left, right=right, jump=jump, jump_pressed=jump and not jumping))
+            self.last_action = current
+            jumping = jump
+        self.steps += 1
+
+        reward = (game.score - score) * SCORE_REWARD
+        if game.current_level != level or game.game_won:
+            reward += LEVEL_REWARD
+            self.best_x = game.player.x
+        elif game.player.x > self.best_x:
+            reward += (game.player.x - self.best_x) * PROGRESS_REWARD
+            self.best_x = game.player.x
+        reward -= (lives - game.lives) * DEATH_PENALTY
+
+        truncated = self.steps >= self.max_steps
+        done = game.game_over or game.game_won or truncated
+        info = {"score": game.score, "lives": game.lives, "level": game.current_level,
+                "frame": game.frame_count, "truncated": truncated and not (game.game_over or game.game_won)}
+        if self.render_mode == "human":
+            self.render()
+        return self.observe(), reward, done, info
+
+    def observe(self):
+        if self.rasterizer is not None:
+            return self.rasterizer.render(self.game, self.observation)
+        return observe(self.game, self.observation)
+
+    def render(self):
+        """Draw the game; returns an (H, W, 3) array for "rgb_array", shows the window for "human" """
+        self.game.draw()
+        if self.render_mode == "human":
+            pygame.event.pump()
+            pygame.display.flip()
+            return None
+        return pygame.surfarray.array3d(self.game.screen).transpose(1, 0, 2)
+
+    def close(self):
+        pass
+
+# Per-environment columns of the shared info array
+INFO_FIELDS = ["score", "lives", "level", "frame", "truncated"]
+
+def vector_worker(connection, shared_names, num_envs, first, count, env_kwargs):
+    """Run environments first .. first + count - 1 of a VectorMarioEnv"""
+    blocks = [shared_memory.SharedMemory(name=name) for name in shared_names]
+    shape, dtype = observation_spec(env_kwargs.get("observation", "features"), env_kwargs.get("downsample", 4))
+    observations, rewards, dones, infos, actions = vector_arrays(blocks, num_envs, shape, dtype)
+    envs = [MarioEnv(**env_kwargs) for _ in range(count)]
+    rows = range(first, first + count)
+    try:
+        while True:
+            command, argument = connection.recv()
+            if command == "reset":
+                for env, row in zip(envs, rows):
+                    observations[row] = env.reset(None if argument is None else argument + row)
+                    dones[row] = False
+            elif command == "step":
+                for env, row in zip(envs, rows):
+                    observation, rewards[row], dones[row], info = env.step(int(actions[row]))
+                    infos[row] = [info[field] for field in INFO_FIELDS]
+                    if dones[row]:
+                        # Start over right away; the final observation is not kept
+                        observation = env.reset()
+                    observations[row] = observation
+            elif command == "close":
+                break
+            connection.send(None)
+    finally:
+        for block in blocks:
+            block.close()
+
+def vector_arrays(blocks, num_envs, shape, dtype):
+    """NumPy views of the shared memory blocks of a VectorMarioEnv"""
+    observations = np.ndarray((num_envs,) + shape, dtype=dtype, buffer=blocks[0].buf)
+    rewards = np.ndarray(num_envs, dtype=np.float32, buffer=blocks[1].buf)
+    dones = np.ndarray(num_envs, dtype=np.bool_, buffer=blocks[2].buf)
+    infos = np.ndarray((num_envs, len(INFO_FIELDS)), dtype=np.int64, buffer=blocks[3].buf)
+    actions = np.ndarray(num_envs, dtype=np.int32, buffer=blocks[4].buf)
+    return observations, rewards, dones, infos, actions
+
+class VectorMarioEnv:
+    """num_envs MarioEnvs stepped together in worker processes.
+
+    Observations, rewards, done flags, infos and actions live in shared memory,
+    so a step only sends a one-word command to each worker. Environments
+    reset themselves when done. The arrays returned by reset() and step() are
+    views of the shared buffers and are overwritten by the next call.
+    """
+    def __init__(self, num_envs, workers=None, **env_kwargs):
+        self.num_envs = num_envs
+        self.action_count = len(ACTIONS)
+        shape, dtype = observation_spec(env_kwargs.get("observation", "features"), env_kwargs.get("downsample", 4))
+        self.observation_shape, self.observation_dtype = shape, dtype
+        observation_bytes = num_envs * int(np.prod(shape)) * np.dtype(dtype).itemsize
+        sizes = [observation_bytes, num_envs * 4, num_envs, num_envs * len(INFO_FIELDS) * 8, num_envs * 4]
+        self.blocks = [shared_memory.SharedMemory(create=True, size=size) for size in sizes]
+        self.observations, self.rewards, self.dones, self.infos, self.actions = vector_arrays(
+            self.blocks, num_envs, shape, dtype
+        )
+
+        workers = min(num_envs, workers or os.cpu_count())
+        self.connections = []
+        self.processes = []
+        first = 0
+        for i in range(workers):
+            count = num_envs // workers + (i < num_envs % workers)
+            parent, child = multiprocessing.Pipe()
+            process = multiprocessing.Process(
+                target=vector_worker,
+                args=(child, [block.name for block in self.blocks], num_envs, first, count, env_kwargs),
+                daemon=True,
+            )
+            process.start()
+            self.connections.append(parent)
+            self.processes.append(process)
+            first += count
+
+    def command(self, command, argument=None):
+        for connection in self.connections:
+            connection.send((command, argument))
+        for connection in self.connections:
+            connection.recv()
+
+    def reset(self, seed=None):
+        """Reset every environment; environment i gets seed + i. Returns the observations"""
+        self.command("reset", seed)
+        return self.observations
+
+    def step(self, actions):
+        """Returns (observations, rewards, dones, infos); infos maps INFO_FIELDS to arrays"""
+        self.actions[:] = actions
+        self.command("step")
+        infos = {field: self.infos[:, i] for i, field in enumerate(INFO_FIELDS)}
+        return self.observations, self.rewards, self.dones, infos
+
+    def close(self):
+        for connection in self.connections:
+            connection.send(("close", None))
+        for process in self.processes:
+            process.join()
+        for block in self.blocks:
+            block.close()
+            block.unlink()
@@ -1,863 +1,1910 @@
-import pygame
-import sys
-import random
-import math
-
-# Initialize Pygame
-pygame.init()
-
-# Game Constants
-SCREEN_WIDTH = 1000
-SCREEN_HEIGHT = 700
-FPS = 60
-
-# Colors (RGB values)
-WHITE = (255, 255, 255)
-BLACK = (0, 0, 0)
-RED = (255, 0, 0)
-GREEN = (0, 255, 0)
-BLUE = (0, 0, 255)
-YELLOW = (255, 255, 0)
-BROWN = (139, 69, 19)
-SKY_BLUE = (135, 206, 235)
-ORANGE = (255, 165, 0)
-PURPLE = (128, 0, 128)
-GRAY = (128, 128, 128)
-DARK_GREEN = (0, 128, 0)
-PINK = (255, 192, 203)
-
-# Physics
-GRAVITY = 0.8
-JUMP_STRENGTH = -15
-
-class Player:
-    def __init__(self, x, y):
-        self.start_x = x
-        self.start_y = y
-        self.x = x
-        self.y = y
-        self.width = 40
-        self.height = 60
-        self.vel_x = 0
-        self.vel_y = 0
-        self.speed = 6
-        self.on_ground = False
-        self.color = RED
-        self.invincible = False
-        self.invincible_timer = 0
-        
-    def update(self):
-        # Handle invincibility
-        if self.invincible:
-            self.invincible_timer -= 1
-            if self.invincible_timer <= 0:
-                self.invincible = False
-        
-        # Handle input
-        keys = pygame.key.get_pressed()
-        
-        # Reset horizontal velocity
-        self.vel_x = 0
-        
-        # Move left and right
-        if keys[pygame.K_LEFT] or keys[pygame.K_a]:
-            self.vel_x = -self.speed
-        if keys[pygame.K_RIGHT] or keys[pygame.K_d]:
-            self.vel_x = self.speed
-            
-        # Jump (only if on ground)
-        if (keys[pygame.K_SPACE] or keys[pygame.K_UP] or keys[pygame.K_w]) and self.on_ground:
-            self.vel_y = JUMP_STRENGTH
-            self.on_ground = False
-        
-        # Apply gravity
-        self.vel_y += GRAVITY
-        
-        # Update position
-        self.x += self.vel_x
-        self.y += self.vel_y
-        
-        # Keep player on screen (horizontal boundaries)
-        if self.x < 0:
-            self.x = 0
-        elif self.x > SCREEN_WIDTH - self.width:
-            self.x = SCREEN_WIDTH - self.width
-            
-        # Death pit (bottom of screen)
-        if self.y > SCREEN_HEIGHT:
-            return True  # Player died
-            
-        return False  # Player alive
-    
-    def reset_position(self):
-        self.x = self.start_x
-        self.y = self.start_y
-        self.vel_x = 0
-        self.vel_y = 0
-        self.invincible = True
-        self.invincible_timer = 120  # 2 seconds of invincibility
-    
-    def get_rect(self):
-        return pygame.Rect(self.x, self.y, self.width, self.height)
-    
-    def draw(self, screen):
-        # Flicker effect when invincible
-        if self.invincible and self.invincible_timer % 10 < 5:
-            return
-            
-        # Draw Mario with more details
-        # Main body
-        pygame.draw.rect(screen, self.color, (self.x, self.y + 15, self.width, self.height - 15))
-        # Hat
-        pygame.draw.rect(screen, BLACK, (self.x + 5, self.y, self.width - 10, 20))
-        # Hat logo
-        pygame.draw.circle(screen, WHITE, (self.x + 20, self.y + 10), 6)
-        pygame.draw.circle(screen, self.color, (self.x + 20, self.y + 10), 4)
-        # Eyes
-        pygame.draw.circle(screen, WHITE, (self.x + 12, self.y + 25), 5)
-        pygame.draw.circle(screen, WHITE, (self.x + 28, self.y + 25), 5)
-        pygame.draw.circle(screen, BLACK, (self.x + 14, self.y + 25), 2)
-        pygame.draw.circle(screen, BLACK, (self.x + 30, self.y + 25), 2)
-        # Mustache
-        pygame.draw.ellipse(screen, BLACK, (self.x + 15, self.y + 32, 10, 6))
-        # Buttons
-        pygame.draw.circle(screen, YELLOW, (self.x + 20, self.y + 45), 3)
-
-class Platform:
-    def __init__(self, x, y, width, height, color=BROWN):
-        self.x = x
-        self.y = y
-        self.width = width
-        self.height = height
-        self.color = color
-    
-    def get_rect(self):
-        return pygame.Rect(self.x, self.y, self.width, self.height)
-    
-    def draw(self, screen):
-        pygame.draw.rect(screen, self.color, (self.x, self.y, self.width, self.height))
-        # Add texture based on color
-        if self.color == BROWN:
-            for i in range(0, self.width, 20):
-                pygame.draw.line(screen, BLACK, (self.x + i, self.y), (self.x + i, self.y + self.height), 2)
-        elif self.color == GRAY:
-            for i in range(0, self.width, 15):
-                for j in range(0, self.height, 15):
-                    pygame.draw.rect(screen, BLACK, (self.x + i, self.y + j, 2, 2))
-
-class MovingPlatform(Platform):
-    def __init__(self, x, y, width, height, speed, min_x, max_x):
-        super().__init__(x, y, width, height, PURPLE)
-        self.speed = speed
-        self.min_x = min_x
-        self.max_x = max_x
-        self.direction = 1
-    
-    def update(self):
-        self.x += self.speed * self.direction
-        if self.x <= self.min_x or self.x >= self.max_x:
-            self.direction *= -1
-
-class Coin:
-    def __init__(self, x, y, value=10):
-        self.x = x
-        self.y = y
-        self.width = 25
-        self.height = 25
-        self.collected = False
-        self.rotation = 0
-        self.value = value
-        self.bob_offset = 0
-        self.start_y = y
-    
-    def update(self):
-        self.rotation += 8
-        self.bob_offset = math.sin(pygame.time.get_ticks() * 0.01) * 5
-    
-    def get_rect(self):
-        return pygame.Rect(self.x, self.y + self.bob_offset, self.width, self.height)
-    
-    def draw(self, screen):
-        if not self.collected:
-            y_pos = self.y + self.bob_offset
-            # Draw spinning coin with glow effect
-            pygame.draw.ellipse(screen, YELLOW, (self.x - 2, y_pos - 2, self.width + 4, self.height + 4))
-            pygame.draw.ellipse(screen, ORANGE, (self.x, y_pos, self.width, self.height))
-            pygame.draw.ellipse(screen, BLACK, (self.x + 3, y_pos + 3, self.width - 6, self.height - 6), 3)
-            # Value indicator for special coins
-            if self.value > 10:
-                font = pygame.font.Font(None, 20)
-                text = font.render(str(self.value), True, BLACK)
-                screen.blit(text, (self.x + 5, y_pos + 5))
-
-class Enemy:
-    def __init__(self, x, y, speed=2, enemy_type="basic"):
-        self.x = x
-        self.y = y
-        self.width = 35
-        self.height = 35
-        self.speed = speed
-        self.direction = 1
-        self.enemy_type = enemy_type
-        self.patrol_distance = 100
-        self.start_x = x
-        
-        if enemy_type == "basic":
-            self.color = DARK_GREEN
-        elif enemy_type == "fast":
-            self.color = RED
-            self.speed *= 1.5
-            self.width = 30
-            self.height = 30
-        elif enemy_type == "jumper":
-            self.color = BLUE
-            self.vel_y = 0
-            self.jump_timer = 0
-    
-    def update(self, platforms):
-        if self.enemy_type == "jumper":
-            # Jumping enemy logic
-            self.vel_y += GRAVITY * 0.5
-            self.y += self.vel_y
-            
-            # Jump occasionally
-            self.jump_timer += 1
-            if self.jump_timer > 120 and abs(self.vel_y) < 1:  # Jump every 2 seconds when on ground
-                self.vel_y = -12
-                self.jump_timer = 0
-            
-            # Ground collision for jumper
-            for platform in platforms:
-                if self.get_rect().colliderect(platform.get_rect()):
-                    if self.vel_y > 0 and self.y < platform.y:
-                        self.y = platform.y - self.height
-                        self.vel_y = 0
-        
-        # Horizontal movement
-        self.x += self.speed * self.direction
-        
-        # Patrol behavior - turn around after certain distance
-        if abs(self.x - self.start_x) > self.patrol_distance:
-            self.direction *= -1
-        
-        # Screen boundary collision
-        if self.x <= 0 or self.x >= SCREEN_WIDTH - self.width:
-            self.direction *= -1
-    
-    def get_rect(self):
-        return pygame.Rect(self.x, self.y, self.width, self.height)
-    
-    def draw(self, screen):
-        pygame.draw.rect(screen, self.color, (self.x, self.y, self.width, self.height))
-        
-        # Different appearance based on type
-        if self.enemy_type == "basic":
-            # Basic enemy face
-            pygame.draw.circle(screen, BLACK, (self.x + 10, self.y + 12), 3)
-            pygame.draw.circle(screen, BLACK, (self.x + 25, self.y + 12), 3)
-            pygame.draw.rect(screen, BLACK, (self.x + 12, self.y + 22, 10, 3))
-        elif self.enemy_type == "fast":
-            # Fast enemy with angry face
-            pygame.draw.polygon(screen, BLACK, [(self.x + 8, self.y + 15), (self.x + 12, self.y + 8), (self.x + 16, self.y + 15)])
-            pygame.draw.polygon(screen, BLACK, [(self.x + 18, self.y + 15), (self.x + 22, self.y + 8), (self.x + 26, self.y + 15)])
-            pygame.draw.rect(screen, WHITE, (self.x + 10, self.y + 20, 12, 4))
-        elif self.enemy_type == "jumper":
-            # Jumper with spring-like appearance
-            pygame.draw.circle(screen, WHITE, (self.x + 12, self.y + 12), 4)
-            pygame.draw.circle(screen, WHITE, (self.x + 23, self.y + 12), 4)
-            pygame.draw.circle(screen, BLACK, (self.x + 12, self.y + 12), 2)
-            pygame.draw.circle(screen, BLACK, (self.x + 23, self.y + 12), 2)
-            # Spring coils
-            for i in range(3):
-                y_offset = self.y + 25 + i * 3
-                pygame.draw.line(screen, BLACK, (self.x + 5, y_offset), (self.x + 30, y_offset), 2)
-
-class PowerUp:
-    def __init__(self, x, y, power_type="speed"):
-        self.x = x
-        self.y = y
-        self.width = 30
-        self.height = 30
-        self.collected = False
-        self.power_type = power_type
-        self.bob_offset = 0
-        
-    def update(self):
-        self.bob_offset = math.sin(pygame.time.get_ticks() * 0.015) * 3
-    
-    def get_rect(self):
-        return pygame.Rect(self.x, self.y + self.bob_offset, self.width, self.height)
-    
-    def draw(self, screen):
-        if not self.collected:
-            y_pos = self.y + self.bob_offset
-            if self.power_type == "speed":
-                pygame.draw.rect(screen, BLUE, (self.x, y_pos, self.width, self.height))
-                pygame.draw.polygon(screen, WHITE, [(self.x + 10, y_pos + 15), (self.x + 20, y_pos + 10), (self.x + 20, y_pos + 20)])
-            elif self.power_type == "jump":
-                pygame.draw.rect(screen, GREEN, (self.x, y_pos, self.width, self.height))
-                pygame.draw.polygon(screen, WHITE, [(self.x + 15, y_pos + 5), (self.x + 10, y_pos + 20), (self.x + 20, y_pos + 20)])
-
-class Game:
-    def __init__(self):
-        self.screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
-        pygame.display.set_caption("Super Mario Bros - 3 Levels")
-        self.clock = pygame.time.Clock()
-        self.running = True
-        
-        # Game state
-        self.score = 0
-        self.lives = 5
-        self.current_level = 1
-        self.game_over = False
-        self.level_complete = False
-        self.game_won = False
-        
-        # Fonts
-        self.font_large = pygame.font.Font(None, 48)
-        self.font_medium = pygame.font.Font(None, 36)
-        self.font_small = pygame.font.Font(None, 24)
-        
-        # Power-up effects
-        self.speed_boost_timer = 0
-        self.jump_boost_timer = 0
-        
-        self.setup_level()
-    
-    def setup_level(self):
-        """Setup the current level with appropriate difficulty"""
-        # Create player at start position
-        if self.current_level == 1:
-            self.player = Player(50, SCREEN_HEIGHT - 150)
-        else:
-            self.player = Player(50, SCREEN_HEIGHT - 200)
-        
-        # Clear existing objects
-        self.platforms = []
-        self.moving_platforms = []
-        self.coins = []
-        self.enemies = []
-        self.power_ups = []
-        
-        if self.current_level == 1:
-            self.setup_level_1()  # Easy
-        elif self.current_level == 2:
-            self.setup_level_2()  # Medium
-        elif self.current_level == 3:
-            self.setup_level_3()  # Hard
-    
-    def setup_level_1(self):
-        """Easy Level - Simple platforms and few enemies"""
-        # Ground and basic platforms
-        self.platforms = [
-            Platform(0, SCREEN_HEIGHT - 50, SCREEN_WIDTH, 50),  # Ground
-            Platform(200, 550, 150, 20),
-            Platform(450, 450, 150, 20),
-            Platform(700, 350, 150, 20),
-            Platform(300, 250, 100, 20),
-            Platform(600, 150, 150, 20),
-            Platform(850, 100, 100, 30),  # Final platform
-        ]
-        
-        # Easy coins
-        self.coins = [
-            Coin(250, 520),
-            Coin(500, 420),
-            Coin(750, 320),
-            Coin(330, 220),
-            Coin(650, 120),
-            Coin(880, 70),  # Bonus coin
-            Coin(100, 500),
-            Coin(570, 400),
-        ]
-        
-        # Few basic enemies
-        self.enemies = [
-            Enemy(250, 530, 1.5, "basic"),
-            Enemy(500, 430, 1, "basic"),
-            Enemy(350, 230, 1, "basic"),
-        ]
-        
-        # Power-ups
-        self.power_ups = [
-            PowerUp(750, 320, "speed"),
-            PowerUp(650, 120, "jump"),
-        ]
-    
-    def setup_level_2(self):
-        """Medium Level - More complex layout with moving platforms"""
-        # More complex platforms
-        self.platforms = [
-            Platform(0, SCREEN_HEIGHT - 50, 200, 50),  # Partial ground
-            Platform(300, SCREEN_HEIGHT - 50, 400, 50),  # Partial ground
-            Platform(800, SCREEN_HEIGHT - 50, 200, 50),  # Partial ground
-            Platform(150, 550, 100, 20),
-            Platform(400, 480, 120, 20),
-            Platform(650, 400, 100, 20),
-            Platform(200, 320, 80, 20),
-            Platform(500, 250, 100, 20),
-            Platform(750, 180, 120, 20),
-            Platform(350, 100, 100, 20),
-            Platform(850, 50, 100, 30, GRAY),  # Stone platform
-        ]
-        
-        # Moving platforms
-        self.moving_platforms = [
-            MovingPlatform(250, 450, 80, 15, 1, 250, 350),
-            MovingPlatform(600, 300, 80, 15, 1.5, 550, 700),
-            MovingPlatform(100, 200, 60, 15, 2, 100, 250),
-        ]
-        
-        # More coins with higher values
-        self.coins = [
-            Coin(180, 520),
-            Coin(440, 450),
-            Coin(680, 370),
-            Coin(230, 290),
-            Coin(530, 220),
-            Coin(780, 150),
-            Coin(380, 70),
-            Coin(880, 20, 20),  # Bonus coin
-            Coin(290, 420),  # On moving platform area
-            Coin(640, 270),  # On moving platform area
-        ]
-        
-        # Mix of enemy types
-        self.enemies = [
-            Enemy(180, 530, 2, "basic"),
-            Enemy(440, 460, 2.5, "fast"),
-            Enemy(530, 230, 1.5, "basic"),
-            Enemy(780, 160, 1, "jumper"),
-            Enemy(320, 490, 1.5, "basic"),
-        ]
-        
-        # More power-ups
-        self.power_ups = [
-            PowerUp(680, 370, "speed"),
-            PowerUp(380, 70, "jump"),
-            PowerUp(230, 290, "speed"),
-        ]
-    
-    def setup_level_3(self):
-        """Hard Level - Complex layout with many obstacles"""
-        # Complex platform layout
-        self.platforms = [
-            Platform(0, SCREEN_HEIGHT - 50, 150, 50),  # Small ground sections
-            Platform(250, SCREEN_HEIGHT - 50, 100, 50),
-            Platform(450, SCREEN_HEIGHT - 50, 150, 50),
-            Platform(700, SCREEN_HEIGHT - 50, 100, 50),
-            Platform(900, SCREEN_HEIGHT - 50, 100, 50),
-            Platform(100, 580, 60, 15),
-            Platform(300, 520, 80, 15),
-            Platform(500, 460, 70, 15),
-            Platform(750, 400, 60, 15),
-            Platform(150, 440, 70, 15),
-            Platform(400, 380, 60, 15),
-            Platform(650, 320, 80, 15),
-            Platform(200, 300, 60, 15),
-            Platform(500, 240, 70, 15),
-            Platform(800, 200, 80, 15),
-            Platform(300, 160, 60, 15),
-            Platform(600, 120, 70, 15),
-            Platform(100, 80, 60, 15),
-            Platform(850, 40, 100, 30, GRAY),  # Final platform
-        ]
-        
-        # Multiple moving platforms
-        self.moving_platforms = [
-            MovingPlatform(350, 450, 60, 12, 2, 350, 450),
-            MovingPlatform(550, 350, 60, 12, 2.5, 500, 600),
-            MovingPlatform(250, 250, 60, 12, 1.5, 200, 350),
-            MovingPlatform(700, 160, 60, 12, 2, 650, 750),
-            MovingPlatform(400, 80, 60, 12, 1.8, 350, 500),
-        ]
-        
-        # Many coins including high-value ones
-        self.coins = [
-            Coin(130, 550),
-            Coin(330, 490),
-            Coin(530, 430),
-            Coin(780, 370),
-            Coin(180, 410),
-            Coin(430, 350),
-            Coin(680, 290),
-            Coin(230, 270),
-            Coin(530, 210),
-            Coin(830, 170),
-            Coin(330, 130),
-            Coin(630, 90),
-            Coin(130, 50),
-            Coin(880, 10, 50),  # High value coin
-            Coin(380, 420),  # Moving platform area
-            Coin(580, 320),  # Moving platform area
-            Coin(280, 220),  # Moving platform area
-        ]
-        
-        # Many enemies of all types
-        self.enemies = [
-            Enemy(130, 560, 2, "fast"),
-            Enemy(330, 500, 1.5, "basic"),
-            Enemy(530, 440, 2.5, "fast"),
-            Enemy(180, 420, 1, "jumper"),
-            Enemy(430, 360, 2, "basic"),
-            Enemy(230, 280, 1.5, "jumper"),
-            Enemy(530, 220, 2, "fast"),
-            Enemy(330, 140, 1, "basic"),
-            Enemy(630, 100, 1.5, "jumper"),
-            Enemy(280, 510, 1.8, "basic"),  # Extra enemies
-        ]
-        
-        # Lots of power-ups needed for hard level
-        self.power_ups = [
-            PowerUp(330, 490, "jump"),
-            PowerUp(680, 290, "speed"),
-            PowerUp(330, 130, "jump"),
-            PowerUp(780, 370, "speed"),
-            PowerUp(530, 210, "jump"),
-        ]
-    
-    def handle_collisions(self):
-        player_rect = self.player.get_rect()
-        
-        # Platform collisions (static)
-        for platform in self.platforms:
-            platform_rect = platform.get_rect()
-            if player_rect.colliderect(platform_rect):
-                if self.player.vel_y > 0 and self.player.y < platform.y:
-                    self.player.y = platform.y - self.player.height
-                    self.player.vel_y = 0
-                    self.player.on_ground = True
-        
-        # Moving platform collisions
-        for platform in self.moving_platforms:
-            platform_rect = platform.get_rect()
-            if player_rect.colliderect(platform_rect):
-                if self.player.vel_y > 0 and self.player.y < platform.y:
-                    self.player.y = platform.y - self.player.height
-                    self.player.vel_y = 0
-                    self.player.on_ground = True
-                    # Move player with platform
-                    self.player.x += platform.speed * platform.direction
-        
-        # Coin collection
-        for coin in self.coins:
-            if not coin.collected and player_rect.colliderect(coin.get_rect()):
-                coin.collected = True
-                self.score += coin.value
-        
-        # Power-up collection
-        for power_up in self.power_ups:
-            if not power_up.collected and player_rect.colliderect(power_up.get_rect()):
-                power_up.collected = True
-                self.score += 25
-                if power_up.power_type == "speed":
-                    self.speed_boost_timer = 300  # 5 seconds
-                    self.player.speed = 10
-                elif power_up.power_type == "jump":
-                    self.jump_boost_timer = 300  # 5 seconds
-        
-        # Enemy collisions
-        if not self.player.invincible:
-            for enemy in self.enemies:
-                if player_rect.colliderect(enemy.get_rect()):
-                    self.lose_life()
-                    return
-        
-        # Check level completion (reach right side)
-        if self.player.x > SCREEN_WIDTH - 100:
-            self.level_complete = True
-    
-    def lose_life(self):
-        self.lives -= 1
-        if self.lives <= 0:
-            self.game_over = True
-        else:
-            self.player.reset_position()
-    
-    def next_level(self):
-        if self.current_level < 3:
-            self.current_level += 1
-            self.level_complete = False
-            self.setup_level()
-        else:
-            self.game_won = True
-    
-    def update(self):
-        if self.game_over or self.game_won:
-            return
-        
-        # Update power-up timers
-        if self.speed_boost_timer > 0:
-            self.speed_boost_timer -= 1
-            if self.speed_boost_timer == 0:
-                self.player.speed = 6
-        
-        if self.jump_boost_timer > 0:
-            self.jump_boost_timer -= 1
-        
-        # Update game objects
-        if self.player.update():  # Returns True if player died
-            self.lose_life()
-            return
-        
-        for platform in self.moving_platforms:
-            platform.update()
-        
-        for coin in self.coins:
-            coin.update()
-        
-        for power_up in self.power_ups:
-            power_up.update()
-        
-        for enemy in self.enemies:
-            enemy.update(self.platforms + self.moving_platforms)
-        
-        # Handle collisions
-        self.handle_collisions()
-        
-        # Check level completion
-        if self.level_complete:
-            self.next_level()
-    
-    def draw_hud(self):
-        # Background for HUD
-        pygame.draw.rect(self.screen, BLACK, (0, 0, SCREEN_WIDTH, 80))
-        pygame.draw.rect(self.screen, WHITE, (0, 0, SCREEN_WIDTH, 80), 2)
-        
-        # Score
-        score_text = self.font_medium.render(f"Score: {self.score}", True, WHITE)
-        self.screen.blit(score_text, (20, 20))
-        
-        # Lives with heart symbols
-        lives_text = self.font_medium.render(f"Lives: ", True, WHITE)
-        self.screen.blit(lives_text, (20, 45))
-        for i in range(self.lives):
-            pygame.draw.polygon(self.screen, RED, [
-                (120 + i*25, 55), (125 + i*25, 50), (130 + i*25, 50),
-                (135 + i*25, 55), (132 + i*25, 65), (127 + i*25, 60),
-                (122 + i*25, 65)
-            ])
-        
-        # Level
-        level_text = self.font_medium.render(f"Level: {self.current_level}", True, WHITE)
-        self.screen.blit(level_text, (400, 20))
-        
-        # Level difficulty indicator
-        difficulties = ["", "EASY", "MEDIUM", "HARD"]
-        diff_colors = [WHITE, GREEN, YELLOW, RED]
-        diff_text = self.font_small.render(difficulties[self.current_level], True, diff_colors[self.current_level])
-        self.screen.blit(diff_text, (400, 45))
-        
-        # Power-up status
-        if self.speed_boost_timer > 0:
-            speed_text = self.font_small.render("SPEED BOOST!", True, BLUE)
-            self.screen.blit(speed_text, (600, 20))
-        
-        if self.jump_boost_timer > 0:
-            jump_text = self.font_small.render("JUMP BOOST!", True, GREEN)
-            self.screen.blit(jump_text, (600, 45))
-        
-        # Instructions
-        inst_text = self.font_small.render("Arrow Keys/WASD: Move | Space/Up/W: Jump | ESC: Quit", True, WHITE)
-        self.screen.blit(inst_text, (20, 680))
-    
-    def draw(self):
-        # Clear screen with appropriate background
-        if self.current_level == 1:
-            self.screen.fill(SKY_BLUE)
-        elif self.current_level == 2:
-            self.screen.fill((100, 150, 200))  # Darker blue
-        else:
-            self.screen.fill((80, 80, 120))  # Dark purple-blue
-        
-        # Draw clouds (more in easier levels)
-        if self.current_level <= 2:
-            cloud_positions = [(100, 120), (300, 100), (500, 130), (700, 110), (850, 140)]
-            for i, (x, y) in enumerate(cloud_positions[:4 - self.current_level + 2]):
-                pygame.draw.ellipse(self.screen, WHITE, (x, y, 60, 40))
-                pygame.draw.ellipse(self.screen, WHITE, (x + 30, y - 10, 80, 50))
-        
-        # Draw platforms
-        for platform in self.platforms:
-            platform.draw(self.screen)
-        
-        for platform in self.moving_platforms:
-            platform.draw(self.screen)
-        
-        # Draw coins
-        for coin in self.coins:
-            coin.draw(self.screen)
-        
-        # Draw power-ups
-        for power_up in self.power_ups:
-            power_up.draw(self.screen)
-        
-        # Draw enemies
-        for enemy in self.enemies:
-            enemy.draw(self.screen)
-        
-        # Draw player
-        self.player.draw(self.screen)
-        
-        # Draw HUD
-        self.draw_hud()
-        
-        # Draw game over or win screen
-        if self.game_over:
-            self.draw_game_over()
-        elif self.game_won:
-            self.draw_victory()
-        elif self.level_complete:
-            self.draw_level_complete()
-    
-    def draw_game_over(self):
-        # Semi-transparent overlay
-        overlay = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT))
-        overlay.set_alpha(180)
-        overlay.fill(BLACK)
-        self.screen.blit(overlay, (0, 0))
-        
-        # Game Over text
-        game_over_text = self.font_large.render("GAME OVER", True, RED)
-        text_rect = game_over_text.get_rect(center=(SCREEN_WIDTH//2, SCREEN_HEIGHT//2 - 100))
-        self.screen.blit(game_over_text, text_rect)
-        
-        # Final score
-        score_text = self.font_medium.render(f"Final Score: {self.score}", True, WHITE)
-        score_rect = score_text.get_rect(center=(SCREEN_WIDTH//2, SCREEN_HEIGHT//2 - 50))
-        self.screen.blit(score_text, score_rect)
-        
-        # Level reached
-        level_text = self.font_medium.render(f"Level Reached: {self.current_level}", True, WHITE)
-        level_rect = level_text.get_rect(center=(SCREEN_WIDTH//2, SCREEN_HEIGHT//2))
-        self.screen.blit(level_text, level_rect)
-        
-        # Restart instruction
-        restart_text = self.font_small.render("Press R to Restart or ESC to Quit", True, YELLOW)
-        restart_rect = restart_text.get_rect(center=(SCREEN_WIDTH//2, SCREEN_HEIGHT//2 + 100))
-        self.screen.blit(restart_text, restart_rect)
-    
-    def draw_victory(self):
-        # Semi-transparent overlay
-        overlay = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT))
-        overlay.set_alpha(180)
-        overlay.fill(BLACK)
-        self.screen.blit(overlay, (0, 0))
-        
-        # Victory text with rainbow effect
-        colors = [RED, ORANGE, YELLOW, GREEN, BLUE, PURPLE]
-        victory_text = "CONGRATULATIONS!"
-        for i, letter in enumerate(victory_text):
-            color = colors[i % len(colors)]
-            letter_surface = self.font_large.render(letter, True, color)
-            x_offset = i * 35
-            self.screen.blit(letter_surface, (SCREEN_WIDTH//2 - 250 + x_offset, SCREEN_HEIGHT//2 - 150))
-        
-        # You Won text
-        won_text = self.font_large.render("YOU WON!", True, YELLOW)
-        won_rect = won_text.get_rect(center=(SCREEN_WIDTH//2, SCREEN_HEIGHT//2 - 50))
-        self.screen.blit(won_text, won_rect)
-        
-        # Final score
-        score_text = self.font_medium.render(f"Final Score: {self.score}", True, WHITE)
-        score_rect = score_text.get_rect(center=(SCREEN_WIDTH//2, SCREEN_HEIGHT//2))
-        self.screen.blit(score_text, score_rect)
-        
-        # Completion message
-        complete_text = self.font_medium.render("All 3 Levels Completed!", True, GREEN)
-        complete_rect = complete_text.get_rect(center=(SCREEN_WIDTH//2, SCREEN_HEIGHT//2 + 50))
-        self.screen.blit(complete_text, complete_rect)
-        
-        # Restart instruction
-        restart_text = self.font_small.render("Press R to Play Again or ESC to Quit", True, YELLOW)
-        restart_rect = restart_text.get_rect(center=(SCREEN_WIDTH//2, SCREEN_HEIGHT//2 + 150))
-        self.screen.blit(restart_text, restart_rect)
-    
-    def draw_level_complete(self):
-        # Semi-transparent overlay
-        overlay = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT))
-        overlay.set_alpha(150)
-        overlay.fill(BLACK)
-        self.screen.blit(overlay, (0, 0))
-        
-        # Level Complete text
-        complete_text = self.font_large.render(f"LEVEL {self.current_level - 1} COMPLETE!", True, GREEN)
-        complete_rect = complete_text.get_rect(center=(SCREEN_WIDTH//2, SCREEN_HEIGHT//2 - 50))
-        self.screen.blit(complete_text, complete_rect)
-        
-        # Next level preview
-        if self.current_level <= 3:
-            next_text = self.font_medium.render(f"Get ready for Level {self.current_level}!", True, WHITE)
-            next_rect = next_text.get_rect(center=(SCREEN_WIDTH//2, SCREEN_HEIGHT//2))
-            self.screen.blit(next_text, next_rect)
-        
-        # Continue instruction
-        continue_text = self.font_small.render("Press SPACE to Continue", True, YELLOW)
-        continue_rect = continue_text.get_rect(center=(SCREEN_WIDTH//2, SCREEN_HEIGHT//2 + 100))
-        self.screen.blit(continue_text, continue_rect)
-    
-    def restart_game(self):
-        self.score = 0
-        self.lives = 5
-        self.current_level = 1
-        self.game_over = False
-        self.level_complete = False
-        self.game_won = False
-        self.speed_boost_timer = 0
-        self.jump_boost_timer = 0
-        self.setup_level()
-    
-    def run(self):
-        while self.running:
-            # Handle events
-            for event in pygame.event.get():
-                if event.type == pygame.QUIT:
-                    self.running = False
-                elif event.type == pygame.KEYDOWN:
-                    if event.key == pygame.K_ESCAPE:
-                        self.running = False
-                    elif event.key == pygame.K_r and (self.game_over or self.game_won):
-                        self.restart_game()
-                    elif event.key == pygame.K_SPACE and self.level_complete:
-                        self.level_complete = False
-                    # Special jump boost handling
-                    elif (event.key == pygame.K_SPACE or event.key == pygame.K_UP or event.key == pygame.K_w):
-                        if self.jump_boost_timer > 0 and self.player.on_ground:
-                            self.player.vel_y = JUMP_STRENGTH * 1.3  # Enhanced jump
-            
-            # Update game
-            self.update()
-            
-            # Draw everything
-            self.draw()
-            
-            # Update display
-            pygame.display.flip()
-            self.clock.tick(FPS)
-        
-        pygame.quit()
-        sys.exit()
-
-# Run the game
-if __name__ == "__main__":
-    print("=== SUPER MARIO BROS - 3 LEVELS ===")
-    print("CONTROLS:")
-    print("- Arrow Keys or WASD: Move Mario")
-    print("- Space/Up/W: Jump (hold for higher jumps with power-up)")
-    print("- ESC: Quit game")
-    print("- R: Restart (when game over)")
-    print()
-    print("LEVELS:")
-    print("- Level 1 (Easy): Basic platforms, few enemies")
-    print("- Level 2 (Medium): Moving platforms, mixed enemies") 
-    print("- Level 3 (Hard): Complex layout, many obstacles")
-    print()
-    print("ITEMS:")
-    print("- Yellow Coins: 10-50 points")
-    print("- Blue Power-up: Speed boost")
-    print("- Green Power-up: Jump boost")
-    print()
-    print("Starting game...")
-    
-    game = Game()
+import pygame
+import sys
+import random
+import math
+import struct
+import time
+import heapq
+from collections import OrderedDict
+
+from level_format import find_levels, open_level
+
+# Game Constants
+SCREEN_WIDTH = 1000
+SCREEN_HEIGHT = 700
+FPS = 60  # Frames of physics per second; the per-frame constants below are tuned for it
+
+# Game.run simulates TICK_RATE steps a second of FPS // TICK_RATE frames each,
+# and draws up to RENDER_FPS times a second (0 for as often as possible),
+# interpolating between the last two steps. When drawing falls behind, at most
+# MAX_CATCH_UP_STEPS steps run per drawn frame and the game slows down instead.
+TICK_RATE = FPS
+RENDER_FPS = FPS
+MAX_CATCH_UP_STEPS = 5
+
+# Colors (RGB values)
+WHITE = (255, 255, 255)
+BLACK = (0, 0, 0)
+RED = (255, 0, 0)
+GREEN = (0, 255, 0)
+BLUE = (0, 0, 255)
+YELLOW = (255, 255, 0)
+BROWN = (139, 69, 19)
+SKY_BLUE = (135, 206, 235)
+ORANGE = (255, 165, 0)
+PURPLE = (128, 0, 128)
+GRAY = (128, 128, 128)
+DARK_GREEN = (0, 128, 0)
+PINK = (255, 192, 203)
+
+# Physics
+GRAVITY = 0.8
+JUMP_STRENGTH = -15
+JUMP_BOOST = 1.3  # Jump strength multiplier while the jump power-up lasts
+PLAYER_SPEED = 6
+BOOSTED_SPEED = 10  # Player speed while the speed power-up lasts
+
+# Lengths of timed effects in frames
+BOOST_FRAMES = 300  # Either power-up lasts 5 seconds
+INVINCIBLE_FRAMES = 120  # 2 seconds of invincibility after losing a life
+ENEMY_JUMP_FRAMES = 121  # Jumpers jump once more than 2 seconds have passed and they are on the ground
+
+# A level is complete once player 1, whom the camera follows, is this close to its right edge
+LEVEL_END_MARGIN = 100
+
+# Input bits used when a frame of controls is packed into a single byte
+INPUT_LEFT = 1
+INPUT_RIGHT = 2
+INPUT_JUMP = 4
+INPUT_JUMP_PRESSED = 8
+INPUT_RESTART = 16
+
+# Size of a broadphase grid cell in pixels
+CELL_SIZE = 100
+
+# Levels wider than the screen are split into chunks. Only chunks near a
+# player are simulated, and static scenery is pre-rendered per chunk on demand.
+CHUNK_WIDTH = 1000
+ACTIVE_CHUNK_RADIUS = 2
+STATIC_CHUNK_CACHE = 4
+
+# Debug keys: toggle the profiler overlay, and dump its frames as a Chrome trace
+PROFILER_KEY = pygame.K_F3
+TRACE_KEY = pygame.K_F4
+
+# Present only the changed parts of the screen instead of flipping all of it
+DIRTY_RECTS = False
+
+# Platforms are one-way by default: the player jumps up through them and only
+# lands on top. Solid platforms also stop the player at their sides and bottom.
+SOLID_PLATFORMS = False
+
+# Save-state header: level, frame count, score, lives and game flags
+STATE_HEADER = struct.Struct("<iqqiB")
+# Per player: x, y, vel_x, vel_y, speed and player flags
+PLAYER_STATE = struct.Struct("<dddddB")
+# Per scheduler: its clock and the number of running and paused timers, then
+# each timer's event, argument and frames left
+SCHEDULER_STATE = struct.Struct("<qII")
+TIMER_STATE = struct.Struct("<Biq")
+
+class InputFrame:
+    """Buttons for a single frame: held movement keys plus key presses"""
+    def __init__(self, left=False, right=False, jump=False, jump_pressed=False, restart=False):
+        self.left = left
+        self.right = right
+        self.jump = jump  # Jump key held down
+        self.jump_pressed = jump_pressed  # Jump key went down this frame
+        self.restart = restart
+    
+    def to_bits(self):
+        """Pack the buttons into a single INPUT_* bitmask"""
+        bits = 0
+        if self.left:
+            bits |= INPUT_LEFT
+        if self.right:
+            bits |= INPUT_RIGHT
+        if self.jump:
+            bits |= INPUT_JUMP
+        if self.jump_pressed:
+            bits |= INPUT_JUMP_PRESSED
+        if self.restart:
+            bits |= INPUT_RESTART
+        return bits
+    
+    @classmethod
+    def from_bits(cls, bits):
+        """Unpack an INPUT_* bitmask made by to_bits()"""
+        return cls(
+            left=bool(bits & INPUT_LEFT),
+            right=bool(bits & INPUT_RIGHT),
+            jump=bool(bits & INPUT_JUMP),
+            jump_pressed=bool(bits & INPUT_JUMP_PRESSED),
+            restart=bool(bits & INPUT_RESTART),
+        )
+
+class SpriteCache:
+    """Renders each distinct look of an entity once and reuses the surface.
+    
+    Sprites are keyed by everything that affects their appearance, and the
+    paint function draws the look at the origin of a transparent surface.
+    """
+    def __init__(self):
+        self.sprites = {}
+    
+    def get(self, key, size, paint):
+        sprite = self.sprites.get(key)
+        if sprite is None:
+            sprite = pygame.Surface(size, pygame.SRCALPHA)
+            paint(sprite)
+            if pygame.display.get_surface() is not None:
+                sprite = sprite.convert_alpha()
+            self.sprites[key] = sprite
+        return sprite
+
+sprite_cache = SpriteCache()
+
+def blit_sprite(screen, sprite, paint, x, y):
+    """Blit a cached sprite at (x, y), or paint its shapes there directly past the top or left edge.
+    
+    pygame truncates fractional coordinates towards zero, so at a negative
+    position each shape of a sprite can land a pixel away from where the
+    sprite as a whole is blitted. Returns the screen area drawn on.
+    """
+    if x >= 0 and y >= 0:
+        return screen.blit(sprite, (x, y))
+    paint(screen, x, y)
+    width, height = sprite.get_size()
+    return pygame.Rect(math.floor(x), math.floor(y), width + 1, height + 1).clip(screen.get_rect())
+
+class TextCache:
+    """LRU cache of rendered text keyed by font, string and color.
+    
+    Fonts are loaded once per (name, size) and kept for the whole run.
+    """
+    def __init__(self, capacity=256):
+        self.capacity = capacity
+        self.fonts = {}
+        self.surfaces = OrderedDict()
+    
+    def font(self, name, size):
+        font = self.fonts.get((name, size))
+        if font is None:
+            if not pygame.font.get_init():
+                pygame.font.init()
+            font = pygame.font.Font(name, size)
+            self.fonts[(name, size)] = font
+        return font
+    
+    def render(self, font, text, color):
+        key = (font, text, color)
+        surface = self.surfaces.get(key)
+        if surface is not None:
+            self.surfaces.move_to_end(key)
+            return surface
+        surface = font.render(text, True, color)
+        self.surfaces[key] = surface
+        if len(self.surfaces) > self.capacity:
+            self.surfaces.popitem(last=False)  # Evict the least recently used
+        return surface
+
+text_cache = TextCache()
+
+def read_keyboard(events):
+    """Build an InputFrame from the live keyboard and this frame's KEYDOWN events"""
+    keys = pygame.key.get_pressed()
+    controls = InputFrame(
+        left=keys[pygame.K_LEFT] or keys[pygame.K_a],
+        right=keys[pygame.K_RIGHT] or keys[pygame.K_d],
+        jump=keys[pygame.K_SPACE] or keys[pygame.K_UP] or keys[pygame.K_w],
+    )
+    for event in events:
+        if event.type == pygame.KEYDOWN:
+            if event.key == pygame.K_r:
+                controls.restart = True
+            elif event.key in (pygame.K_SPACE, pygame.K_UP, pygame.K_w):
+                controls.jump_pressed = True
+    return controls
+
+class EntityPool:
+    """Free list of entity objects so a new level reuses the last one's instead of allocating"""
+    def __init__(self, cls):
+        self.cls = cls
+        self.free = []
+    
+    def acquire(self, *args):
+        if self.free:
+            obj = self.free.pop()
+            obj.__init__(*args)
+            return obj
+        return self.cls(*args)
+    
+    def release(self, objects):
+        self.free.extend(objects)
+
+def swap_remove(items, item):
+    """Remove item from an unordered list of entities in O(1) using its live_index"""
+    last = items.pop()
+    if last is not item:
+        items[item.live_index] = last
+        last.live_index = item.live_index
+
+class Scheduler:
+    """Frame-based timers that cost nothing per frame until they fire.
+    
+    Timers sit in a min-heap by the frame they are due, so advance() only
+    looks at the top of the heap however many are running. A timer is keyed
+    by (event, arg): starting a key that is already running restarts it, and
+    when it fires the callback registered for the event is called with arg.
+    Cancelled timers stay in the heap, skipped, until it is more than half
+    stale. Paused timers keep their frames left until resumed. Keys are
+    plain values, so the timers go into save states.
+    """
+    def __init__(self):
+        self.now = 0  # Frames advanced so far
+        self.heap = []  # [due, sequence, key] entries; the key is None once cancelled
+        self.entries = {}  # key -> its live heap entry
+        self.paused = {}  # key -> frames left
+        self.sequence = 0  # Timers due on the same frame fire in the order they were started
+        self.stale = 0  # Cancelled entries still in the heap
+        self.events = []
+        self.callbacks = {}
+    
+    def register(self, event, callback):
+        """Call callback(arg) when an (event, arg) timer fires; None just lets it expire"""
+        self.events.append(event)
+        self.callbacks[event] = callback
+    
+    def start(self, key, frames, paused=False):
+        """(Re)start the timer key to fire frames from now, or hold it paused with that many left"""
+        self.cancel(key)
+        if paused:
+            self.paused[key] = frames
+            return
+        entry = [self.now + frames, self.sequence, key]
+        self.sequence += 1
+        self.entries[key] = entry
+        heapq.heappush(self.heap, entry)
+    
+    def cancel(self, key):
+        entry = self.entries.pop(key, None)
+        if entry is not None:
+            entry[2] = None
+            self.stale += 1
+            if self.stale * 2 > len(self.heap):
+                self.heap[:] = [entry for entry in self.heap if entry[2] is not None]  # In place, as advance() may be running
+                heapq.heapify(self.heap)
+                self.stale = 0
+        self.paused.pop(key, None)
+    
+    def pause(self, key):
+        entry = self.entries.get(key)
+        if entry is not None:
+            self.start(key, entry[0] - self.now, paused=True)
+    
+    def resume(self, key):
+        frames = self.paused.pop(key, None)
+        if frames is not None:
+            self.start(key, frames)
+    
+    def remaining(self, key):
+        """Frames until key fires, or 0 if it is not running"""
+        entry = self.entries.get(key)
+        if entry is not None:
+            return entry[0] - self.now
+        return self.paused.get(key, 0)
+    
+    def clear(self):
+        self.heap = []
+        self.entries = {}
+        self.paused = {}
+        self.stale = 0
+    
+    def advance(self, frames=1):
+        """Move the clock on and fire every timer now due, earliest first"""
+        self.now += frames
+        heap = self.heap
+        while heap and heap[0][0] <= self.now:
+            key = heapq.heappop(heap)[2]
+            if key is None:
+                self.stale -= 1
+                continue
+            del self.entries[key]
+            callback = self.callbacks[key[0]]
+            if callback is not None:
+                callback(key[1])
+    
+    def state_size(self):
+        return SCHEDULER_STATE.size + TIMER_STATE.size * (len(self.entries) + len(self.paused))
+    
+    def save_into(self, buffer, offset):
+        """Pack the clock and timers at offset; returns the offset after them"""
+        SCHEDULER_STATE.pack_into(buffer, offset, self.now, len(self.entries), len(self.paused))
+        offset += SCHEDULER_STATE.size
+        timers = [(key, due - self.now) for due, _, key in sorted(self.entries.values())]
+        timers += sorted(self.paused.items())
+        for (event, arg), frames in timers:
+            TIMER_STATE.pack_into(buffer, offset, self.events.index(event), arg, frames)
+            offset += TIMER_STATE.size
+        return offset
+    
+    def load_from(self, buffer, offset):
+        """Replace the clock and timers with the ones packed at offset; returns the offset after them"""
+        self.clear()
+        self.now, running, paused = SCHEDULER_STATE.unpack_from(buffer, offset)
+        offset += SCHEDULER_STATE.size
+        for i in range(running + paused):
+            event, arg, frames = TIMER_STATE.unpack_from(buffer, offset)
+            self.start((self.events[event], arg), frames, paused=i >= running)
+            offset += TIMER_STATE.size
+        return offset
+
+def sweep_aabb(x, y, width, height, dx, dy, left, top, right, bottom):
+    """Swept AABB test of a box moving by (dx, dy) against the box left, top, right, bottom.
+    
+    Returns (time, normal_x, normal_y) for the first contact, time being the
+    fraction of the move at impact and the normal pointing out of the face
+    that was hit, or None if the boxes never touch or already overlap.
+    """
+    if dx > 0:
+        x_entry, x_exit = (left - x - width) / dx, (right - x) / dx
+    elif dx < 0:
+        x_entry, x_exit = (right - x) / dx, (left - x - width) / dx
+    elif x + width <= left or x >= right:
+        return None
+    else:
+        x_entry, x_exit = -math.inf, math.inf
+    if dy > 0:
+        y_entry, y_exit = (top - y - height) / dy, (bottom - y) / dy
+    elif dy < 0:
+        y_entry, y_exit = (bottom - y) / dy, (top - y - height) / dy
+    elif y + height <= top or y >= bottom:
+        return None
+    else:
+        y_entry, y_exit = -math.inf, math.inf
+    
+    entry = max(x_entry, y_entry)
+    if entry < 0 or entry > 1 or entry >= min(x_exit, y_exit):
+        return None
+    if x_entry > y_entry:
+        return entry, (-1 if dx > 0 else 1), 0
+    return entry, 0, (-1 if dy > 0 else 1)
+
+def boxes_overlap(x, y, width, height, other):
+    """Whether the box at x, y overlaps other (anything with x, y, width and height) by more than an edge"""
+    return x < other.x + other.width and other.x < x + width and y < other.y + other.height and other.y < y + height
+
+def swept_landing(collision_index, x, y, width, height, dx, dy):
+    """The first platform top a box moving by (dx, dy) went right past, as (time, platform), or None.
+    
+    Works on whole-pixel rects like the overlap test at the end of a frame,
+    which only sees a platform while the box's rect still reaches into it.
+    A fall longer than the box is tall can take it from above a platform's
+    top to below it in one frame.
+    """
+    if dy <= height - 1:  # Whole-pixel rects move less than a pixel further than dy
+        return None
+    start = pygame.Rect(x, y, width, height)
+    end = pygame.Rect(x + dx, y + dy, width, height)
+    move_x, move_y = end.x - start.x, end.y - start.y
+    if move_y < height:
+        return None
+    first = None
+    for platform in collision_index.platforms_near(start.union(end)):
+        platform_rect = platform.get_rect()
+        if start.bottom <= platform_rect.top <= end.top:
+            contact = sweep_aabb(start.x, start.y, width, height, move_x, move_y, platform_rect.left,
+                                 platform_rect.top, platform_rect.right, platform_rect.bottom)
+            if contact is not None and contact[2] < 0 and (first is None or contact[0] < first[0]):
+                first = (contact[0], platform)
+    return first
+
+class Player:
+    __slots__ = ("start_x", "start_y", "x", "y", "width", "height", "vel_x", "vel_y", "speed",
+                 "on_ground", "color", "invincible", "prev_x", "prev_y")
+    
+    def __init__(self, x, y, color=RED):
+        self.start_x = x
+        self.start_y = y
+        self.x = x
+        self.y = y
+        self.width = 40
+        self.height = 60
+        self.vel_x = 0
+        self.vel_y = 0
+        self.speed = PLAYER_SPEED
+        self.on_ground = False
+        self.color = color
+        self.invincible = False  # Until Game's invincibility timer for this player fires
+        self.prev_x = x  # Position before the last update, for swept collisions and drawing
+        self.prev_y = y
+        
+    def update(self, controls, world_width=SCREEN_WIDTH):
+        """Move for one frame; returns True if the player fell in the pit"""
+        self.prev_x = self.x
+        self.prev_y = self.y
+        
+        # Reset horizontal velocity
+        self.vel_x = 0
+        
+        # Move left and right
+        if controls.left:
+            self.vel_x = -self.speed
+        if controls.right:
+            self.vel_x = self.speed
+            
+        # Jump (only if on ground)
+        if controls.jump and self.on_ground:
+            self.vel_y = JUMP_STRENGTH
+            self.on_ground = False
+        
+        # Apply gravity
+        self.vel_y += GRAVITY
+        
+        # Update position
+        self.x += self.vel_x
+        self.y += self.vel_y
+        
+        # Keep player inside the level (horizontal boundaries)
+        if self.x < 0:
+            self.x = 0
+        elif self.x > world_width - self.width:
+            self.x = world_width - self.width
+            
+        # Death pit (bottom of screen)
+        if self.y > SCREEN_HEIGHT:
+            return True  # Player died
+            
+        return False  # Player alive
+    
+    def reset_position(self):
+        self.x = self.prev_x = self.start_x
+        self.y = self.prev_y = self.start_y
+        self.vel_x = 0
+        self.vel_y = 0
+        self.invincible = True
+    
+    def get_rect(self):
+        return pygame.Rect(self.x, self.y, self.width, self.height)
+    
+    def draw(self, screen, camera_x=0, invincible_frames=0):
+        # Flicker effect when invincible
+        if self.invincible and invincible_frames % 10 < 5:
+            return
+        
+        sprite = sprite_cache.get(("player", self.color, self.width, self.height), (self.width, self.height), self.paint)
+        return blit_sprite(screen, sprite, self.paint, self.x - camera_x, self.y)
+    
+    def paint(self, surface, x=0, y=0):
+        # Draw Mario with more details
+        # Main body
+        pygame.draw.rect(surface, self.color, (x, y + 15, self.width, self.height - 15))
+        # Hat
+        pygame.draw.rect(surface, BLACK, (x + 5, y, self.width - 10, 20))
+        # Hat logo
+        pygame.draw.circle(surface, WHITE, (x + 20, y + 10), 6)
+        pygame.draw.circle(surface, self.color, (x + 20, y + 10), 4)
+        # Eyes
+        pygame.draw.circle(surface, WHITE, (x + 12, y + 25), 5)
+        pygame.draw.circle(surface, WHITE, (x + 28, y + 25), 5)
+        pygame.draw.circle(surface, BLACK, (x + 14, y + 25), 2)
+        pygame.draw.circle(surface, BLACK, (x + 30, y + 25), 2)
+        # Mustache
+        pygame.draw.ellipse(surface, BLACK, (x + 15, y + 32, 10, 6))
+        # Buttons
+        pygame.draw.circle(surface, YELLOW, (x + 20, y + 45), 3)
+
+class Platform:
+    __slots__ = ("x", "y", "width", "height", "color")
+    
+    def __init__(self, x, y, width, height, color=BROWN):
+        self.x = x
+        self.y = y
+        self.width = width
+        self.height = height
+        self.color = color
+    
+    def get_rect(self):
+        return pygame.Rect(self.x, self.y, self.width, self.height)
+    
+    def draw(self, screen, camera_x=0):
+        x = self.x - camera_x
+        rect = pygame.draw.rect(screen, self.color, (x, self.y, self.width, self.height))
+        # Add texture based on color
+        if self.color == BROWN:
+            for i in range(0, self.width, 20):
+                pygame.draw.line(screen, BLACK, (x + i, self.y), (x + i, self.y + self.height), 2)
+        elif self.color == GRAY:
+            for i in range(0, self.width, 15):
+                for j in range(0, self.height, 15):
+                    pygame.draw.rect(screen, BLACK, (x + i, self.y + j, 2, 2))
+        return rect
+
+class MovingPlatform(Platform):
+    __slots__ = ("speed", "min_x", "max_x", "direction", "prev_x", "prev_y")
+    
+    def __init__(self, x, y, width, height, speed, min_x, max_x):
+        super().__init__(x, y, width, height, PURPLE)
+        self.speed = speed
+        self.min_x = min_x
+        self.max_x = max_x
+        self.direction = 1
+        self.prev_x = x
+        self.prev_y = y
+    
+    def update(self):
+        self.prev_x = self.x
+        self.x += self.speed * self.direction
+        if self.x <= self.min_x or self.x >= self.max_x:
+            self.direction *= -1
+
+class Coin:
+    __slots__ = ("x", "y", "collected", "rotation", "value", "bob_offset", "start_y", "live_index")
+    width = 25
+    height = 25
+    
+    def __init__(self, x, y, value=10):
+        self.x = x
+        self.y = y
+        self.collected = False
+        self.rotation = 0
+        self.value = value
+        self.bob_offset = 0
+        self.start_y = y
+        self.live_index = 0  # Position in Game.active_coins
+    
+    def update(self, ticks):
+        self.rotation += 8
+        self.bob_offset = math.sin(ticks * 0.01) * 5
+    
+    def get_rect(self):
+        return pygame.Rect(self.x, self.y + self.bob_offset, self.width, self.height)
+    
+    def draw(self, screen, camera_x=0):
+        if not self.collected:
+            # The sprite has a 2px margin for the glow
+            size = (self.width + 4, self.height + 4)
+            sprite = sprite_cache.get(("coin", self.value, self.width, self.height), size, self.paint)
+            return blit_sprite(screen, sprite, self.paint, self.x - camera_x - 2, self.y + self.bob_offset - 2)
+    
+    def paint(self, surface, x=0, y=0):
+        # Draw spinning coin with glow effect
+        pygame.draw.ellipse(surface, YELLOW, (x, y, self.width + 4, self.height + 4))
+        pygame.draw.ellipse(surface, ORANGE, (x + 2, y + 2, self.width, self.height))
+        pygame.draw.ellipse(surface, BLACK, (x + 5, y + 5, self.width - 6, self.height - 6), 3)
+        # Value indicator for special coins
+        if self.value > 10:
+            text = text_cache.render(text_cache.font(None, 20), str(self.value), BLACK)
+            surface.blit(text, (x + 7, y + 7))
+
+class Enemy:
+    __slots__ = ("x", "y", "width", "height", "speed", "direction", "enemy_type", "patrol_distance",
+                 "start_x", "color", "vel_y", "jump_ready", "prev_x", "prev_y")
+    
+    def __init__(self, x, y, speed=2, enemy_type="basic"):
+        self.x = x
+        self.y = y
+        self.prev_x = x  # Position before the last update, for swept collisions and drawing
+        self.prev_y = y
+        self.width = 35
+        self.height = 35
+        self.speed = speed
+        self.direction = 1
+        self.enemy_type = enemy_type
+        self.patrol_distance = 100
+        self.start_x = x
+        
+        if enemy_type == "basic":
+            self.color = DARK_GREEN
+        elif enemy_type == "fast":
+            self.color = RED
+            self.speed *= 1.5
+            self.width = 30
+            self.height = 30
+        elif enemy_type == "jumper":
+            self.color = BLUE
+            self.vel_y = 0
+            self.jump_ready = False  # Set when Game's jump timer for this enemy fires
+    
+    def update(self, collision_index, world_width=SCREEN_WIDTH):
+        """Move for one frame; returns True if a jumper jumped, so its next jump can be timed"""
+        self.prev_x = self.x
+        self.prev_y = self.y
+        jumped = False
+        if self.enemy_type == "jumper":
+            # Jumping enemy logic
+            self.vel_y += GRAVITY * 0.5
+            self.y += self.vel_y
+            
+            # Jump every 2 seconds, waiting until on the ground
+            if self.jump_ready and abs(self.vel_y) < 1:
+                self.vel_y = -12
+                self.jump_ready = False
+                jumped = True
+            
+            # Ground collision for jumper
+            for platform in collision_index.platforms_near(self.get_rect()):
+                if self.get_rect().colliderect(platform.get_rect()):
+                    if self.vel_y > 0 and self.y < platform.y:
+                        self.y = platform.y - self.height
+                        self.vel_y = 0
+        
+        # Horizontal movement
+        self.x += self.speed * self.direction
+        
+        # Patrol behavior - turn around after certain distance
+        if abs(self.x - self.start_x) > self.patrol_distance:
+            self.direction *= -1
+        
+        # Level boundary collision
+        if self.x <= 0 or self.x >= world_width - self.width:
+            self.direction *= -1
+        return jumped
+    
+    def get_rect(self):
+        return pygame.Rect(self.x, self.y, self.width, self.height)
+    
+    def draw(self, screen, camera_x=0):
+        key = ("enemy", self.enemy_type, self.color, self.width, self.height)
+        sprite = sprite_cache.get(key, (self.width, self.height), self.paint)
+        return blit_sprite(screen, sprite, self.paint, self.x - camera_x, self.y)
+    
+    def paint(self, surface, x=0, y=0):
+        pygame.draw.rect(surface, self.color, (x, y, self.width, self.height))
+        
+        # Different appearance based on type
+        if self.enemy_type == "basic":
+            # Basic enemy face
+            pygame.draw.circle(surface, BLACK, (x + 10, y + 12), 3)
+            pygame.draw.circle(surface, BLACK, (x + 25, y + 12), 3)
+            pygame.draw.rect(surface, BLACK, (x + 12, y + 22, 10, 3))
+        elif self.enemy_type == "fast":
+            # Fast enemy with angry face
+            pygame.draw.polygon(surface, BLACK, [(x + 8, y + 15), (x + 12, y + 8), (x + 16, y + 15)])
+            pygame.draw.polygon(surface, BLACK, [(x + 18, y + 15), (x + 22, y + 8), (x + 26, y + 15)])
+            pygame.draw.rect(surface, WHITE, (x + 10, y + 20, 12, 4))
+        elif self.enemy_type == "jumper":
+            # Jumper with spring-like appearance
+            pygame.draw.circle(surface, WHITE, (x + 12, y + 12), 4)
+            pygame.draw.circle(surface, WHITE, (x + 23, y + 12), 4)
+            pygame.draw.circle(surface, BLACK, (x + 12, y + 12), 2)
+            pygame.draw.circle(surface, BLACK, (x + 23, y + 12), 2)
+            # Spring coils
+            for i in range(3):
+                y_offset = y + 25 + i * 3
+                pygame.draw.line(surface, BLACK, (x + 5, y_offset), (x + 30, y_offset), 2)
+
+class PowerUp:
+    __slots__ = ("x", "y", "collected", "power_type", "bob_offset", "live_index")
+    width = 30
+    height = 30
+    
+    def __init__(self, x, y, power_type="speed"):
+        self.x = x
+        self.y = y
+        self.collected = False
+        self.power_type = power_type
+        self.bob_offset = 0
+        self.live_index = 0  # Position in Game.active_power_ups
+        
+    def update(self, ticks):
+        self.bob_offset = math.sin(ticks * 0.015) * 3
+    
+    def get_rect(self):
+        return pygame.Rect(self.x, self.y + self.bob_offset, self.width, self.height)
+    
+    def draw(self, screen, camera_x=0):
+        if not self.collected:
+            key = ("power_up", self.power_type, self.width, self.height)
+            sprite = sprite_cache.get(key, (self.width, self.height), self.paint)
+            return blit_sprite(screen, sprite, self.paint, self.x - camera_x, self.y + self.bob_offset)
+    
+    def paint(self, surface, x=0, y=0):
+        if self.power_type == "speed":
+            pygame.draw.rect(surface, BLUE, (x, y, self.width, self.height))
+            pygame.draw.polygon(surface, WHITE, [(x + 10, y + 15), (x + 20, y + 10), (x + 20, y + 20)])
+        elif self.power_type == "jump":
+            pygame.draw.rect(surface, GREEN, (x, y, self.width, self.height))
+            pygame.draw.polygon(surface, WHITE, [(x + 15, y + 5), (x + 10, y + 20), (x + 20, y + 20)])
+
+class SpatialHash:
+    """Uniform grid that maps each cell to the indices of the rects touching it"""
+    def __init__(self, cell_size=CELL_SIZE):
+        self.cell_size = cell_size
+        self.cells = {}
+        self.ranges = {}  # index -> (left, top, right, bottom) cells it is bucketed in
+    
+    def cell_range(self, rect):
+        size = self.cell_size
+        return (rect.left // size, rect.top // size, (rect.right - 1) // size, (rect.bottom - 1) // size)
+    
+    def insert(self, index, rect):
+        cell_range = self.cell_range(rect)
+        self.ranges[index] = cell_range
+        left, top, right, bottom = cell_range
+        for cx in range(left, right + 1):
+            for cy in range(top, bottom + 1):
+                self.cells.setdefault((cx, cy), []).append(index)
+    
+    def remove(self, index):
+        left, top, right, bottom = self.ranges.pop(index)
+        for cx in range(left, right + 1):
+            for cy in range(top, bottom + 1):
+                self.cells[(cx, cy)].remove(index)
+    
+    def move(self, index, rect):
+        """Re-bucket an index, doing nothing while it stays in the same cells"""
+        if self.ranges[index] != self.cell_range(rect):
+            self.remove(index)
+            self.insert(index, rect)
+    
+    def query(self, rect):
+        """Sorted indices of everything bucketed in the cells under rect"""
+        left, top, right, bottom = self.cell_range(rect)
+        if left == right and top == bottom:
+            return sorted(self.cells.get((left, top), ()))
+        found = set()
+        for cx in range(left, right + 1):
+            for cy in range(top, bottom + 1):
+                bucket = self.cells.get((cx, cy))
+                if bucket:
+                    found.update(bucket)
+        return sorted(found)
+
+class CollisionIndex:
+    """Broadphase for one level.
+    
+    Static platforms, coins and power-ups are bucketed once, and coins and
+    power-ups leave the grid when collected. Moving platforms and enemies are
+    re-bucketed every frame, which only touches the grid when they cross into
+    a new cell. Queries return objects in the same order as
+    the level lists, so the first match is the same as a full scan.
+    """
+    def __init__(self, platforms, moving_platforms, coins, power_ups, enemies, platform_cells=None):
+        self.platforms = platforms
+        self.moving_platforms = moving_platforms
+        self.coins = coins
+        self.power_ups = power_ups
+        self.enemies = enemies
+        
+        # Static platforms may come pre-bucketed from the compiled level file
+        self.platform_grid = SpatialHash()
+        if platform_cells is not None:
+            self.platform_grid.cells = platform_cells
+        else:
+            for i, platform in enumerate(platforms):
+                self.platform_grid.insert(i, platform.get_rect())
+        
+        self.coin_grid = SpatialHash()
+        self.power_up_grid = SpatialHash()
+        self.sync_collected()
+        
+        self.moving_grid = SpatialHash()
+        for i, platform in enumerate(moving_platforms):
+            self.moving_grid.insert(i, platform.get_rect())
+        self.enemy_grid = SpatialHash()
+        for i, enemy in enumerate(enemies):
+            self.enemy_grid.insert(i, enemy.get_rect())
+    
+    def sync_collected(self):
+        """Bucket exactly the coins and power-ups that are not collected, e.g. after a state load"""
+        # Coins and power-ups bob up and down, so bucket their whole bob range
+        for i, coin in enumerate(self.coins):
+            if i in self.coin_grid.ranges:
+                if coin.collected:
+                    self.coin_grid.remove(i)
+            elif not coin.collected:
+                self.coin_grid.insert(i, pygame.Rect(coin.x, coin.y - 5, coin.width, coin.height + 10))
+        for i, power_up in enumerate(self.power_ups):
+            if i in self.power_up_grid.ranges:
+                if power_up.collected:
+                    self.power_up_grid.remove(i)
+            elif not power_up.collected:
+                self.power_up_grid.insert(i, pygame.Rect(power_up.x, power_up.y - 3, power_up.width, power_up.height + 6))
+    
+    def update_moving_platforms(self, indices=None):
+        """Re-bucket the given moving platforms (all of them by default)"""
+        if indices is None:
+            indices = range(len(self.moving_platforms))
+        for i in indices:
+            self.moving_grid.move(i, self.moving_platforms[i].get_rect())
+    
+    def update_enemies(self, indices=None):
+        """Re-bucket the given enemies (all of them by default)"""
+        if indices is None:
+            indices = range(len(self.enemies))
+        for i in indices:
+            self.enemy_grid.move(i, self.enemies[i].get_rect())
+    
+    def platforms_near(self, rect):
+        """Static platforms then moving platforms near rect, in level order"""
+        nearby = [self.platforms[i] for i in self.platform_grid.query(rect)]
+        nearby.extend(self.moving_platforms[i] for i in self.moving_grid.query(rect))
+        return nearby
+    
+    def coins_near(self, rect):
+        """(index, coin) pairs of uncollected coins near rect"""
+        return [(i, self.coins[i]) for i in self.coin_grid.query(rect)]
+    
+    def power_ups_near(self, rect):
+        """(index, power-up) pairs of uncollected power-ups near rect"""
+        return [(i, self.power_ups[i]) for i in self.power_up_grid.query(rect)]
+    
+    def enemies_near(self, rect):
+        return [self.enemies[i] for i in self.enemy_grid.query(rect)]
+
+class Game:
+    def __init__(self, headless=False, dirty_rects=DIRTY_RECTS, num_players=1, solid_platforms=SOLID_PLATFORMS,
+                 tick_rate=TICK_RATE, render_fps=RENDER_FPS):
+        # Headless games draw into an off-screen surface and never start the display;
+        # no other pygame subsystem is needed but fonts, which start on first use
+        self.headless = headless
+        if headless:
+            self.screen = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT))
+            self.clock = None
+        else:
+            pygame.display.init()
+            self.screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
+            self.clock = pygame.time.Clock()
+        self.running = True
+        
+        # Dirty-rect rendering: what was drawn last frame and must be erased
+        self.dirty_rects = dirty_rects
+        self.full_redraw = True
+        self.entity_rects = []
+        self.hud_rects = []
+        
+        self.solid_platforms = solid_platforms
+        
+        # Fixed-timestep loop of run(): each step covers tick_frames frames of physics
+        if tick_rate <= 0 or FPS % tick_rate:
+            raise ValueError(f"tick_rate must divide {FPS}, got {tick_rate}")
+        self.tick_rate = tick_rate
+        self.tick_frames = FPS // tick_rate
+        self.render_fps = render_fps
+        
+        # Simulated clock, advanced once per step so animation is reproducible
+        self.frame_count = 0
+        
+        # Optional replay.Recorder that sees the controls of every step
+        self.recorder = None
+        
+        # profiler.FrameProfiler while the profiler overlay is on
+        self.profiler = None
+        
+        # Optional capture.VideoCapture that gets a copy of every drawn frame
+        self.capture = None
+        
+        # Levels are played in file order; any number of them is fine
+        self.level_paths = find_levels()
+        if not headless:
+            pygame.display.set_caption(f"Super Mario Bros - {len(self.level_paths)} Levels")
+        
+        # Game state
+        self.num_players = num_players  # Player 2 shares score and lives with player 1
+        self.score = 0
+        self.lives = 5
+        self.current_level = 1
+        self.game_over = False
+        self.level_complete = False
+        self.game_won = False
+        self.last_death = None  # "pit" or the enemy type behind the last lost life
+        
+        # HUD is redrawn only when one of its values changes
+        self.hud_surface = pygame.Surface((SCREEN_WIDTH, 80))
+        self.hud_state = None
+        
+        # Semi-transparent overlays for the end screens by alpha, allocated on first use
+        self.overlays = {}
+        
+        # True while a static screen is shown and already on the display
+        self.screen_idle = False
+        
+        # Timed effects: power-ups and invincibility run on game frames, enemy
+        # behaviour only on frames the enemy is simulated
+        self.timers = Scheduler()
+        self.timers.register("speed_boost", self.end_speed_boost)
+        self.timers.register("jump_boost", None)
+        self.timers.register("invincible", self.end_invincibility)
+        self.enemy_timers = Scheduler()
+        self.enemy_timers.register("jump", self.ready_enemy_jump)
+        
+        # Entity objects are recycled from one level to the next
+        self.pools = {cls: EntityPool(cls) for cls in (Platform, MovingPlatform, Coin, Enemy, PowerUp)}
+        self.platforms = []
+        self.moving_platforms = []
+        self.coins = []
+        self.enemies = []
+        self.power_ups = []
+        
+        self.setup_level()
+    
+    # Fonts are loaded on first use, so games that never draw text never start the font module
+    @property
+    def font_large(self):
+        return text_cache.font(None, 48)
+    
+    @property
+    def font_medium(self):
+        return text_cache.font(None, 36)
+    
+    @property
+    def font_small(self):
+        return text_cache.font(None, 24)
+    
+    @property
+    def speed_boost_timer(self):
+        """Frames of speed boost left"""
+        return self.timers.remaining(("speed_boost", 0))
+    
+    @property
+    def jump_boost_timer(self):
+        """Frames of jump boost left"""
+        return self.timers.remaining(("jump_boost", 0))
+    
+    def end_speed_boost(self, _):
+        for player in self.players:
+            player.speed = PLAYER_SPEED
+    
+    def end_invincibility(self, player_index):
+        self.players[player_index].invincible = False
+    
+    def ready_enemy_jump(self, enemy_index):
+        self.enemies[enemy_index].jump_ready = True
+    
+    def setup_level(self):
+        """Setup the current level from its level file"""
+        level = open_level(self.level_paths[self.current_level - 1], CELL_SIZE)
+        self.level = level
+        
+        # Create players at start position
+        start_x, start_y = level.player_start
+        self.players = [Player(start_x, start_y)]
+        if self.num_players > 1:
+            self.players.append(Player(start_x + 50, start_y, GREEN))
+        self.player = self.players[0]
+        
+        # Create level objects, reusing the previous level's
+        pools = self.pools
+        pools[Platform].release(self.platforms)
+        pools[MovingPlatform].release(self.moving_platforms)
+        pools[Coin].release(self.coins)
+        pools[Enemy].release(self.enemies)
+        pools[PowerUp].release(self.power_ups)
+        self.platforms = [pools[Platform].acquire(*platform) for platform in level.platforms]
+        self.moving_platforms = [pools[MovingPlatform].acquire(*platform) for platform in level.moving_platforms]
+        self.coins = [pools[Coin].acquire(*coin) for coin in level.coins]
+        self.enemies = [pools[Enemy].acquire(*enemy) for enemy in level.enemies]
+        self.power_ups = [pools[PowerUp].acquire(*power_up) for power_up in level.power_ups]
+        
+        # Index the level once for collision checks
+        platform_cells = level.platform_cells if level.cell_size == CELL_SIZE else None
+        self.collision_index = CollisionIndex(
+            self.platforms, self.moving_platforms, self.coins, self.power_ups, self.enemies, platform_cells
+        )
+        
+        # Split the level into chunks by where each object starts
+        self.world_width = max(SCREEN_WIDTH, math.ceil(level.bounds[2]))
+        self.num_chunks = math.ceil(self.world_width / CHUNK_WIDTH)
+        self.chunk_moving_platforms = self.assign_chunks(self.moving_platforms)
+        self.chunk_coins = self.assign_chunks(self.coins)
+        self.chunk_power_ups = self.assign_chunks(self.power_ups)
+        self.chunk_enemies = self.assign_chunks(self.enemies)
+        
+        # New players start out vulnerable. Every jumper waits a full interval
+        # before its first jump, counting only while it is active.
+        for i in range(len(self.players)):
+            self.timers.cancel(("invincible", i))
+        self.enemy_timers.clear()
+        for i, enemy in enumerate(self.enemies):
+            if enemy.enemy_type == "jumper":
+                self.enemy_timers.start(("jump", i), ENEMY_JUMP_FRAMES, paused=True)
+        self.active_enemy_ids = []
+        self.active_chunks = None
+        self.update_active_chunks()
+        
+        # Static scenery is pre-rendered per chunk the first time it is seen
+        self.static_chunks = OrderedDict()
+        self.camera_x = 0
+        self.update_camera()
+        self.full_redraw = True
+        
+        # Save-state layout for the entities of this level
+        self.state_body = struct.Struct("<" + "dd" * len(self.moving_platforms)
+                                        + "?qd" * len(self.coins)
+                                        + "?d" * len(self.power_ups)
+                                        + "ddd?d" * len(self.enemies))
+    
+    def chunk_of(self, x):
+        return min(max(int(x // CHUNK_WIDTH), 0), self.num_chunks - 1)
+    
+    def assign_chunks(self, objects):
+        """Indices of the objects starting in each chunk"""
+        chunks = [[] for _ in range(self.num_chunks)]
+        for i, obj in enumerate(objects):
+            chunks[self.chunk_of(obj.x)].append(i)
+        return chunks
+    
+    def update_active_chunks(self):
+        """Pick the chunks near any player; objects elsewhere stay frozen"""
+        chunks = set()
+        for player in self.players:
+            home = self.chunk_of(player.x)
+            chunks.update(range(max(home - ACTIVE_CHUNK_RADIUS, 0), min(home + ACTIVE_CHUNK_RADIUS + 1, self.num_chunks)))
+        active_chunks = sorted(chunks)
+        if active_chunks == self.active_chunks:
+            return
+        self.active_chunks = active_chunks
+        
+        def active(chunk_lists):
+            return sorted(i for chunk in active_chunks for i in chunk_lists[chunk])
+        previous_enemy_ids = self.active_enemy_ids
+        self.active_moving_platform_ids = active(self.chunk_moving_platforms)
+        self.active_enemy_ids = active(self.chunk_enemies)
+        self.active_moving_platforms = [self.moving_platforms[i] for i in self.active_moving_platform_ids]
+        self.active_enemies = [self.enemies[i] for i in self.active_enemy_ids]
+        
+        # Frozen enemies' timers are paused with them
+        previous, current = set(previous_enemy_ids), set(self.active_enemy_ids)
+        for i in previous_enemy_ids:
+            if i not in current:
+                self.enemy_timers.pause(("jump", i))
+        for i in self.active_enemy_ids:
+            if i not in previous:
+                self.enemy_timers.resume(("jump", i))
+        
+        # Collected coins and power-ups are left out, and swap-removed when collected later
+        self.active_coins = [self.coins[i] for i in active(self.chunk_coins) if not self.coins[i].collected]
+        for live_index, coin in enumerate(self.active_coins):
+            coin.live_index = live_index
+        self.active_power_ups = [self.power_ups[i] for i in active(self.chunk_power_ups) if not self.power_ups[i].collected]
+        for live_index, power_up in enumerate(self.active_power_ups):
+            power_up.live_index = live_index
+    
+    def camera_position(self):
+        """Where the view should start: centered on player 1, stopping at the level edges"""
+        target = self.player.x + self.player.width // 2 - SCREEN_WIDTH // 2
+        return int(min(max(target, 0), self.world_width - SCREEN_WIDTH))
+    
+    def update_camera(self):
+        self.camera_x = self.camera_position()
+    
+    def get_static_chunk(self, chunk):
+        surface = self.static_chunks.get(chunk)
+        if surface is None:
+            surface = self.render_static_chunk(chunk)
+            self.static_chunks[chunk] = surface
+            if len(self.static_chunks) > STATIC_CHUNK_CACHE:
+                self.static_chunks.popitem(last=False)
+        else:
+            self.static_chunks.move_to_end(chunk)
+        return surface
+    
+    def render_static_chunk(self, chunk):
+        """Draw the background, clouds and static platforms of one chunk into an off-screen surface"""
+        layer = pygame.Surface((CHUNK_WIDTH, SCREEN_HEIGHT))
+        if pygame.display.get_surface() is not None:
+            layer = layer.convert()
+        left = chunk * CHUNK_WIDTH
+        
+        layer.fill(self.level.background)
+        
+        # Draw clouds
+        for x, y in self.level.clouds:
+            if left - 110 < x < left + CHUNK_WIDTH:
+                pygame.draw.ellipse(layer, WHITE, (x - left, y, 60, 40))
+                pygame.draw.ellipse(layer, WHITE, (x - left + 30, y - 10, 80, 50))
+        
+        # Draw platforms
+        for platform in self.collision_index.platforms_near(pygame.Rect(left, 0, CHUNK_WIDTH, SCREEN_HEIGHT)):
+            if not isinstance(platform, MovingPlatform):
+                platform.draw(layer, left)
+        
+        return layer
+    
+    def draw_background(self, rect):
+        """Copy the pre-rendered scenery under a screen rect onto the screen"""
+        world_left = rect.left + self.camera_x
+        world_right = rect.right + self.camera_x
+        first = self.chunk_of(world_left)
+        last = self.chunk_of(world_right - 1)
+        for chunk in range(first, last + 1):
+            left = chunk * CHUNK_WIDTH
+            area_left = max(world_left, left)
+            area_right = min(world_right, left + CHUNK_WIDTH)
+            if area_right <= area_left:
+                continue
+            area = pygame.Rect(area_left - left, rect.top, area_right - area_left, rect.height)
+            self.screen.blit(self.get_static_chunk(chunk), (area_left - self.camera_x, rect.top), area)
+            if self.profiler:
+                self.profiler.count_draws(1)
+    
+    def handle_collisions(self, fallen=()):
+        """Collisions for every player but those who fell in the pit this frame"""
+        for player in self.players:
+            if player not in fallen:
+                self.handle_player_collisions(player)
+    
+    def handle_player_collisions(self, player):
+        """Collisions for one player; returns True if the player lost a life"""
+        index = self.collision_index
+        if self.solid_platforms:
+            self.resolve_solid_platforms(player)
+            player_rect = player.get_rect()
+        else:
+            # A fast fall can carry the player right through a platform top
+            landing = swept_landing(index, player.prev_x, player.prev_y, player.width, player.height,
+                                    player.x - player.prev_x, player.y - player.prev_y)
+            if landing is not None and player.vel_y > 0:
+                self.land(player, landing[1])
+            player_rect = player.get_rect()
+            
+            # Platform collisions (static first, then moving)
+            for platform in index.platforms_near(player_rect):
+                platform_rect = platform.get_rect()
+                if player_rect.colliderect(platform_rect):
+                    if player.vel_y > 0 and player.y < platform.y:
+                        self.land(player, platform)
+        
+        # Coin collection
+        for i, coin in index.coins_near(player_rect):
+            if player_rect.colliderect(coin.get_rect()):
+                coin.collected = True
+                index.coin_grid.remove(i)
+                swap_remove(self.active_coins, coin)
+                self.score += coin.value
+        
+        # Power-up collection
+        for i, power_up in index.power_ups_near(player_rect):
+            if player_rect.colliderect(power_up.get_rect()):
+                power_up.collected = True
+                index.power_up_grid.remove(i)
+                swap_remove(self.active_power_ups, power_up)
+                self.score += 25
+                if power_up.power_type == "speed":
+                    self.timers.start(("speed_boost", 0), BOOST_FRAMES)
+                    player.speed = BOOSTED_SPEED
+                elif power_up.power_type == "jump":
+                    self.timers.start(("jump_boost", 0), BOOST_FRAMES)
+        
+        # Enemy collisions
+        if not player.invincible:
+            for enemy in index.enemies_near(player_rect):
+                if player_rect.colliderect(enemy.get_rect()):
+                    self.lose_life(player, enemy.enemy_type)
+                    return True
+        
+        # Check level completion (player 1, whom the camera follows, reaches the right side)
+        if player is self.player and player.x > self.world_width - LEVEL_END_MARGIN:
+            self.level_complete = True
+        return False
+    
+    def land(self, player, platform):
+        player.y = platform.y - player.height
+        player.vel_y = 0
+        player.on_ground = True
+        # Move player with platform
+        if isinstance(platform, MovingPlatform):
+            player.x += platform.speed * platform.direction
+    
+    def resolve_solid_platforms(self, player):
+        """Replay the player's last move against solid platforms: land on tops, bump heads, stop at sides"""
+        x, y = player.prev_x, player.prev_y
+        dx, dy = player.x - x, player.y - y
+        area = pygame.Rect(min(x, x + dx), min(y, y + dy), player.width + abs(dx), player.height + abs(dy))
+        platforms = self.collision_index.platforms_near(area)
+        # Each contact stops the motion along one axis, so two are enough
+        for _ in range(2):
+            first = None
+            for platform in platforms:
+                contact = sweep_aabb(x, y, player.width, player.height, dx, dy,
+                                     platform.x, platform.y, platform.x + platform.width, platform.y + platform.height)
+                if contact is not None and (first is None or contact[0] < first[0]):
+                    first = contact + (platform,)
+            if first is None:
+                break
+            time, normal_x, normal_y, platform = first
+            x += dx * time
+            y += dy * time
+            if normal_x:
+                dx, dy = 0, dy * (1 - time)
+            else:
+                dx, dy = dx * (1 - time), 0
+            if normal_y < 0:
+                player.x, player.y = x, y
+                self.land(player, platform)
+                x, y = player.x, player.y
+            elif normal_y > 0:
+                player.vel_y = 0
+        player.x = x + dx
+        player.y = y + dy
+        self.push_out_of_platforms(player)
+    
+    def push_out_of_platforms(self, player):
+        """Move the player out of any solid platform they overlap, the shortest way that is clear.
+        
+        The sweep above only replays the player's own move, so a moving platform
+        pushing into them, or being carried along by one, can still end inside one.
+        """
+        width, height = player.width, player.height
+        for platform in self.collision_index.platforms_near(player.get_rect()):
+            exits = [(player.x + width - platform.x, platform.x - width, player.y),
+                     (platform.x + platform.width - player.x, platform.x + platform.width, player.y),
+                     (player.y + height - platform.y, player.x, platform.y - height),
+                     (platform.y + platform.height - player.y, player.x, platform.y + platform.height)]
+            exits.sort(key=lambda exit: exit[0])
+            if exits[0][0] <= 0:
+                continue
+            # The shallowest exit that is clear of other platforms, so a player squeezed
+            # between two platforms closer together than their height leaves sideways
+            nearby = self.collision_index.platforms_near(player.get_rect().inflate(width * 2, height * 2))
+            for depth, x, y in exits:
+                if not any(other is not platform and boxes_overlap(x, y, width, height, other) for other in nearby):
+                    break
+            else:
+                depth, x, y = exits[0]
+            if y < player.y:
+                player.vel_y = 0
+                player.on_ground = True
+            elif y > player.y:
+                player.vel_y = max(player.vel_y, 0)
+            player.x, player.y = x, y
+    
+    def lose_life(self, player=None, cause=None):
+        self.last_death = cause
+        self.lives -= 1
+        if self.lives <= 0:
+            self.game_over = True
+        else:
+            player = player or self.player
+            player.reset_position()
+            self.timers.start(("invincible", self.players.index(player)), INVINCIBLE_FRAMES)
+    
+    def next_level(self):
+        if self.current_level < len(self.level_paths):
+            self.current_level += 1
+            self.level_complete = False
+            self.setup_level()
+        else:
+            self.game_won = True
+    
+    def get_ticks(self):
+        """Milliseconds of simulated time, the stand-in for pygame.time.get_ticks()"""
+        return self.frame_count * 1000 // FPS
+    
+    def update(self, controls, *other_controls):
+        if self.game_over or self.game_won:
+            return
+        
+        # Fire the power-up and invincibility timers that ran out
+        self.timers.advance()
+        
+        # Update game objects
+        profiler = self.profiler
+        if profiler:
+            profiler.lap("players")
+        # A player who falls in the pit sits out the rest of the frame; it
+        # goes on for the others
+        fallen = []
+        for player, player_controls in zip(self.players, (controls,) + other_controls):
+            if player.update(player_controls, self.world_width):  # Returns True if player died
+                self.lose_life(player, "pit")
+                fallen.append(player)
+        if self.game_over or len(fallen) == len(self.players):
+            return
+        
+        # Only chunks near the players are simulated
+        self.update_active_chunks()
+        
+        if profiler:
+            profiler.lap("moving_platforms")
+        for platform in self.active_moving_platforms:
+            platform.update()
+        self.collision_index.update_moving_platforms(self.active_moving_platform_ids)
+        
+        ticks = self.get_ticks()
+        if profiler:
+            profiler.lap("coins")
+        for coin in self.active_coins:
+            coin.update(ticks)
+        
+        if profiler:
+            profiler.lap("power_ups")
+        for power_up in self.active_power_ups:
+            power_up.update(ticks)
+        
+        if profiler:
+            profiler.lap("enemies")
+        self.enemy_timers.advance()
+        for i, enemy in zip(self.active_enemy_ids, self.active_enemies):
+            if enemy.update(self.collision_index, self.world_width):
+                self.enemy_timers.start(("jump", i), ENEMY_JUMP_FRAMES)
+        self.collision_index.update_enemies(self.active_enemy_ids)
+        
+        # Handle collisions
+        if profiler:
+            profiler.lap("collisions")
+        self.handle_collisions(fallen)
+        
+        # Check level completion
+        if self.level_complete:
+            self.next_level()
+    
+    def get_hud_state(self):
+        return (self.score, self.lives, self.current_level, self.speed_boost_timer > 0, self.jump_boost_timer > 0)
+    
+    def draw_hud(self):
+        """Draw the HUD and instruction line; returns the screen rects they cover"""
+        hud_state = self.get_hud_state()
+        if hud_state != self.hud_state:
+            self.hud_state = hud_state
+            self.render_hud(self.hud_surface)
+        hud_rect = self.screen.blit(self.hud_surface, (0, 0))
+        
+        # Instructions
+        inst_text = text_cache.render(self.font_small, "Arrow Keys/WASD: Move | Space/Up/W: Jump | ESC: Quit", WHITE)
+        inst_rect = self.screen.blit(inst_text, (20, 680))
+        if self.profiler:
+            self.profiler.count_draws(2)
+        return [hud_rect, inst_rect]
+    
+    def render_hud(self, hud):
+        """Draw the score, lives, level and boost fields into the HUD surface"""
+        # Background for HUD
+        pygame.draw.rect(hud, BLACK, (0, 0, SCREEN_WIDTH, 80))
+        pygame.draw.rect(hud, WHITE, (0, 0, SCREEN_WIDTH, 80), 2)
+        
+        # Score
+        score_text = text_cache.render(self.font_medium, f"Score: {self.score}", WHITE)
+        hud.blit(score_text, (20, 20))
+        
+        # Lives with heart symbols
+        lives_text = text_cache.render(self.font_medium, f"Lives: ", WHITE)
+        hud.blit(lives_text, (20, 45))
+        for i in range(self.lives):
+            pygame.draw.polygon(hud, RED, [
+                (120 + i*25, 55), (125 + i*25, 50), (130 + i*25, 50),
+                (135 + i*25, 55), (132 + i*25, 65), (127 + i*25, 60),
+                (122 + i*25, 65)
+            ])
+        
+        # Level
+        level_text = text_cache.render(self.font_medium, f"Level: {self.current_level}", WHITE)
+        hud.blit(level_text, (400, 20))
+        
+        # Level difficulty indicator
+        diff_text = text_cache.render(self.font_small, self.level.difficulty, self.level.difficulty_color)
+        hud.blit(diff_text, (400, 45))
+        
+        # Power-up status
+        if self.speed_boost_timer > 0:
+            speed_text = text_cache.render(self.font_small, "SPEED BOOST!", BLUE)
+            hud.blit(speed_text, (600, 20))
+        
+        if self.jump_boost_timer > 0:
+            jump_text = text_cache.render(self.font_small, "JUMP BOOST!", GREEN)
+            hud.blit(jump_text, (600, 45))
+    
+    def draw_entities(self):
+        """Draw everything that moves near the view; returns the screen rects drawn"""
+        rects = []
+        camera_x = self.camera_x
+        profiler = self.profiler
+        
+        # Draw moving platforms
+        if profiler:
+            profiler.lap("moving_platforms")
+        for platform in self.active_moving_platforms:
+            rects.append(platform.draw(self.screen, camera_x))
+        
+        # Draw coins
+        if profiler:
+            profiler.lap("coins")
+        for coin in self.active_coins:
+            rects.append(coin.draw(self.screen, camera_x))
+        
+        # Draw power-ups
+        if profiler:
+            profiler.lap("power_ups")
+        for power_up in self.active_power_ups:
+            rects.append(power_up.draw(self.screen, camera_x))
+        
+        # Draw enemies
+        if profiler:
+            profiler.lap("enemies")
+        for enemy in self.active_enemies:
+            rects.append(enemy.draw(self.screen, camera_x))
+        
+        # Draw players, player 1 on top
+        if profiler:
+            profiler.lap("players")
+        for i in reversed(range(len(self.players))):
+            rects.append(self.players[i].draw(self.screen, camera_x, self.timers.remaining(("invincible", i))))
+        
+        # Hidden entities (collected, flickering) draw nothing
+        rects = [rect for rect in rects if rect]
+        if profiler:
+            profiler.count_draws(len(rects))
+        return rects
+    
+    def draw(self):
+        self.update_camera()
+        profiler = self.profiler
+        
+        # Background, clouds and static platforms come pre-rendered
+        if profiler:
+            profiler.lap("background")
+        self.draw_background(self.screen.get_rect())
+        
+        self.entity_rects = self.draw_entities()
+        
+        # Draw HUD
+        if profiler:
+            profiler.lap("hud")
+        self.hud_rects = self.draw_hud()
+        
+        # Draw game over or win screen
+        if self.game_over:
+            self.draw_game_over()
+        elif self.game_won:
+            self.draw_victory()
+        elif self.level_complete:
+            self.draw_level_complete()
+        
+        if profiler:
+            profiler.lap("profiler")
+            profiler.draw(self.screen)
+    
+    def blend_positions(self, alpha):
+        """Move what moves alpha of the way from its previous step to its current one, for drawing.
+        
+        Objects only remember where they were a frame ago, so over a step of
+        several frames they are drawn along their last frame's motion,
+        stretched to the length of the step. Returns the saved positions for
+        restore_positions(), which must run before the next step.
+        """
+        back = (1 - alpha) * self.tick_frames
+        saved = []
+        for group in (self.players, self.active_enemies, self.active_moving_platforms):
+            for obj in group:
+                x, y = obj.x, obj.y
+                saved.append((obj, x, y))
+                obj.x = x - (x - obj.prev_x) * back
+                obj.y = y - (y - obj.prev_y) * back
+        return saved
+    
+    def restore_positions(self, saved):
+        for obj, x, y in saved:
+            obj.x = x
+            obj.y = y
+    
+    def draw_dirty(self):
+        """Redraw only what changed since the last frame.
+        
+        Restores the static layer under last frame's entities, draws the
+        entities again and redraws the HUD only when its values changed or an
+        entity touched it. Returns the screen rects to pass to
+        pygame.display.update().
+        """
+        # Scrolling changes everything on screen; the profiler overlay changes every frame
+        camera_x = self.camera_x
+        self.update_camera()
+        if self.full_redraw or self.on_static_screen() or self.camera_x != camera_x or self.profiler:
+            self.full_redraw = False
+            self.draw()
+            return [self.screen.get_rect()]
+        
+        dirty = self.entity_rects
+        for rect in dirty:
+            self.draw_background(rect)
+        self.entity_rects = self.draw_entities()
+        dirty = dirty + self.entity_rects
+        
+        hud_touched = any(rect.collidelist(dirty) != -1 for rect in self.hud_rects)
+        if hud_touched or self.get_hud_state() != self.hud_state:
+            # The instruction text is translucent, so clear under the HUD first
+            # and put back any entities that overlapped it
+            for rect in self.hud_rects:
+                self.draw_background(rect)
+            self.draw_entities()
+            self.hud_rects = self.draw_hud()
+            dirty.extend(self.hud_rects)
+        return dirty
+    
+    def overlay(self, alpha):
+        """Black full-screen surface drawn with the given alpha"""
+        surface = self.overlays.get(alpha)
+        if surface is None:
+            surface = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT))
+            surface.set_alpha(alpha)
+            surface.fill(BLACK)
+            self.overlays[alpha] = surface
+        return surface
+    
+    def draw_game_over(self):
+        # Semi-transparent overlay
+        self.screen.blit(self.overlay(180), (0, 0))
+        
+        # Game Over text
+        game_over_text = text_cache.render(self.font_large, "GAME OVER", RED)
+        text_rect = game_over_text.get_rect(center=(SCREEN_WIDTH//2, SCREEN_HEIGHT//2 - 100))
+        self.screen.blit(game_over_text, text_rect)
+        
+        # Final score
+        score_text = text_cache.render(self.font_medium, f"Final Score: {self.score}", WHITE)
+        score_rect = score_text.get_rect(center=(SCREEN_WIDTH//2, SCREEN_HEIGHT//2 - 50))
+        self.screen.blit(score_text, score_rect)
+        
+        # Level reached
+        level_text = text_cache.render(self.font_medium, f"Level Reached: {self.current_level}", WHITE)
+        level_rect = level_text.get_rect(center=(SCREEN_WIDTH//2, SCREEN_HEIGHT//2))
+        self.screen.blit(level_text, level_rect)
+        
+        # Restart instruction
+        restart_text = text_cache.render(self.font_small, "Press R to Restart or ESC to Quit", YELLOW)
+        restart_rect = restart_text.get_rect(center=(SCREEN_WIDTH//2, SCREEN_HEIGHT//2 + 100))
+        self.screen.blit(restart_text, restart_rect)
+    
+    def draw_victory(self):
+        # Semi-transparent overlay
+        self.screen.blit(self.overlay(180), (0, 0))
+        
+        # Victory text with rainbow effect
+        colors = [RED, ORANGE, YELLOW, GREEN, BLUE, PURPLE]
+        victory_text = "CONGRATULATIONS!"
+        for i, letter in enumerate(victory_text):
+            color = colors[i % len(colors)]
+            letter_surface = text_cache.render(self.font_large, letter, color)
+            x_offset = i * 35
+            self.screen.blit(letter_surface, (SCREEN_WIDTH//2 - 250 + x_offset, SCREEN_HEIGHT//2 - 150))
+        
+        # You Won text
+        won_text = text_cache.render(self.font_large, "YOU WON!", YELLOW)
+        won_rect = won_text.get_rect(center=(SCREEN_WIDTH//2, SCREEN_HEIGHT//2 - 50))
+        self.screen.blit(won_text, won_rect)
+        
+        # Final score
+        score_text = text_cache.render(self.font_medium, f"Final Score: {self.score}", WHITE)
+        score_rect = score_text.get_rect(center=(SCREEN_WIDTH//2, SCREEN_HEIGHT//2))
+        self.screen.blit(score_text, score_rect)
+        
+        # Completion message
+        complete_text = text_cache.render(self.font_medium, f"All {len(self.level_paths)} Levels Completed!", GREEN)
+        complete_rect = complete_text.get_rect(center=(SCREEN_WIDTH//2, SCREEN_HEIGHT//2 + 50))
+        self.screen.blit(complete_text, complete_rect)
+        
+        # Restart instruction
+        restart_text = text_cache.render(self.font_small, "Press R to Play Again or ESC to Quit", YELLOW)
+        restart_rect = restart_text.get_rect(center=(SCREEN_WIDTH//2, SCREEN_HEIGHT//2 + 150))
+        self.screen.blit(restart_text, restart_rect)
+    
+    def draw_level_complete(self):
+        # Semi-transparent overlay
+        self.screen.blit(self.overlay(150), (0, 0))
+        
+        # Level Complete text
+        complete_text = text_cache.render(self.font_large, f"LEVEL {self.current_level - 1} COMPLETE!", GREEN)
+        complete_rect = complete_text.get_rect(center=(SCREEN_WIDTH//2, SCREEN_HEIGHT//2 - 50))
+        self.screen.blit(complete_text, complete_rect)
+        
+        # Next level preview
+        if self.current_level <= len(self.level_paths):
+            next_text = text_cache.render(self.font_medium, f"Get ready for Level {self.current_level}!", WHITE)
+            next_rect = next_text.get_rect(center=(SCREEN_WIDTH//2, SCREEN_HEIGHT//2))
+            self.screen.blit(next_text, next_rect)
+        
+        # Continue instruction
+        continue_text = text_cache.render(self.font_small, "Press SPACE to Continue", YELLOW)
+        continue_rect = continue_text.get_rect(center=(SCREEN_WIDTH//2, SCREEN_HEIGHT//2 + 100))
+        self.screen.blit(continue_text, continue_rect)
+    
+    def state_size(self):
+        """Bytes needed by save_state() for the current level"""
+        return (STATE_HEADER.size + PLAYER_STATE.size * len(self.players) + self.state_body.size
+                + self.timers.state_size() + self.enemy_timers.state_size())
+    
+    def save_state(self, buffer=None):
+        """Capture all mutable game state as a compact binary blob.
+        
+        Pass a preallocated bytearray of at least state_size() bytes to avoid
+        allocating; otherwise a new one is returned.
+        """
+        if buffer is None:
+            buffer = bytearray(self.state_size())
+        game_flags = self.game_over | self.level_complete << 1 | self.game_won << 2
+        STATE_HEADER.pack_into(
+            buffer, 0, self.current_level, self.frame_count, self.score, self.lives, game_flags,
+        )
+        offset = STATE_HEADER.size
+        for player in self.players:
+            player_flags = player.on_ground | player.invincible << 1
+            PLAYER_STATE.pack_into(
+                buffer, offset,
+                player.x, player.y, player.vel_x, player.vel_y, player.speed, player_flags,
+            )
+            offset += PLAYER_STATE.size
+        
+        values = []
+        for platform in self.moving_platforms:
+            values += (platform.x, platform.direction)
+        for coin in self.coins:
+            values += (coin.collected, coin.rotation, coin.bob_offset)
+        for power_up in self.power_ups:
+            values += (power_up.collected, power_up.bob_offset)
+        for enemy in self.enemies:
+            if enemy.enemy_type == "jumper":
+                values += (enemy.x, enemy.y, enemy.direction, enemy.jump_ready, enemy.vel_y)
+            else:
+                values += (enemy.x, enemy.y, enemy.direction, False, 0)
+        self.state_body.pack_into(buffer, offset, *values)
+        offset = self.timers.save_into(buffer, offset + self.state_body.size)
+        self.enemy_timers.save_into(buffer, offset)
+        return buffer
+    
+    def load_state(self, buffer):
+        """Restore a state captured by save_state(), switching level if needed"""
+        level, self.frame_count, self.score, self.lives, game_flags = STATE_HEADER.unpack_from(buffer)
+        if level != self.current_level:
+            self.current_level = level
+            self.setup_level()
+        self.game_over = bool(game_flags & 1)
+        self.level_complete = bool(game_flags & 2)
+        self.game_won = bool(game_flags & 4)
+        
+        offset = STATE_HEADER.size
+        for player in self.players:
+            (player.x, player.y, player.vel_x, player.vel_y, player.speed,
+             player_flags) = PLAYER_STATE.unpack_from(buffer, offset)
+            player.on_ground = bool(player_flags & 1)
+            player.invincible = bool(player_flags & 2)
+            offset += PLAYER_STATE.size
+        
+        values = self.state_body.unpack_from(buffer, offset)
+        i = 0
+        for platform in self.moving_platforms:
+            platform.x, platform.direction = values[i:i + 2]
+            i += 2
+        for coin in self.coins:
+            coin.collected, coin.rotation, coin.bob_offset = values[i:i + 3]
+            i += 3
+        for power_up in self.power_ups:
+            power_up.collected, power_up.bob_offset = values[i:i + 2]
+            i += 2
+        for enemy in self.enemies:
+            enemy.x, enemy.y, enemy.direction = values[i:i + 3]
+            if enemy.enemy_type == "jumper":
+                enemy.jump_ready, enemy.vel_y = values[i + 3:i + 5]
+            i += 5
+        
+        # Moved objects need re-bucketing and the screen needs a full redraw
+        self.collision_index.update_moving_platforms()
+        self.collision_index.update_enemies()
+        self.collision_index.sync_collected()
+        self.active_chunks = None
+        self.update_active_chunks()
+        self.full_redraw = True
+        
+        # After update_active_chunks, which pauses and resumes enemy timers
+        offset = self.timers.load_from(buffer, offset + self.state_body.size)
+        self.enemy_timers.load_from(buffer, offset)
+    
+    def restart_game(self):
+        self.score = 0
+        self.lives = 5
+        self.current_level = 1
+        self.game_over = False
+        self.level_complete = False
+        self.game_won = False
+        self.timers.clear()
+        self.setup_level()
+    
+    def step(self, controls, *other_controls, frames=1):
+        """Advance the game by exactly one frame, or by several with the same controls.
+        
+        Takes one InputFrame per player, player 1 first. The held buttons
+        apply to every frame of the step and the key presses to its first
+        frame, so a step of several frames ends exactly where as many single
+        steps with the presses on the first would.
+        """
+        if self.recorder is not None:
+            self.recorder.record(controls, frames)
+        
+        for i, player_controls in enumerate((controls,) + other_controls):
+            if player_controls.restart and (self.game_over or self.game_won):
+                self.restart_game()
+            elif player_controls.jump_pressed and self.level_complete:
+                self.level_complete = False
+            # Special jump boost handling
+            elif player_controls.jump_pressed:
+                player = self.players[i]
+                if self.jump_boost_timer > 0 and player.on_ground:
+                    player.vel_y = JUMP_STRENGTH * JUMP_BOOST  # Enhanced jump
+        
+        for _ in range(frames):
+            self.update(controls, *other_controls)
+            self.frame_count += 1
+    
+    def simulate(self, input_source, frames, step_frames=1):
+        """Step the game as fast as possible without drawing.
+        
+        input_source is called with the game before every step and returns
+        the InputFrame to apply. With step_frames above 1 it is asked only
+        once per step of that many frames (see step()). Stops early once the
+        game is over or won. Returns the number of frames simulated.
+        """
+        frame = 0
+        while frame < frames:
+            if self.game_over or self.game_won:
+                return frame
+            step = min(step_frames, frames - frame)
+            self.step(input_source(self), frames=step)
+            frame += step
+        return frames
+    
+    def on_static_screen(self):
+        """True while the game over, victory or level complete screen is up"""
+        return self.game_over or self.game_won or self.level_complete
+    
+    def entity_counts(self):
+        """(active, collected, total) per entity group, for the profiler"""
+        return {
+            "moving_platforms": (len(self.active_moving_platforms), 0, len(self.moving_platforms)),
+            "coins": (len(self.active_coins), sum(coin.collected for coin in self.coins), len(self.coins)),
+            "power_ups": (len(self.active_power_ups), sum(power_up.collected for power_up in self.power_ups),
+                          len(self.power_ups)),
+            "enemies": (len(self.active_enemies), 0, len(self.enemies)),
+        }
+    
+    def handle_debug_keys(self, events):
+        """F3 toggles the profiler overlay, F4 dumps its recent frames as a Chrome trace"""
+        for event in events:
+            if event.type != pygame.KEYDOWN:
+                continue
+            if event.key == PROFILER_KEY:
+                if self.profiler is None:
+                    from profiler import FrameProfiler
+                    self.profiler = FrameProfiler()
+                else:
+                    self.profiler = None
+                self.full_redraw = True
+            elif event.key == TRACE_KEY and self.profiler is not None:
+                path = time.strftime("trace-%Y%m%d-%H%M%S.json")
+                self.profiler.dump_trace(path)
+                print(f"Wrote {len(self.profiler.frames)} frames to {path}")
+    
+    def handle_quit_events(self, events):
+        for event in events:
+            if event.type == pygame.QUIT:
+                self.running = False
+            elif event.type == pygame.KEYDOWN and event.key == pygame.K_ESCAPE:
+                self.running = False
+    
+    def wait_on_static_screen(self):
+        """Show a static screen once, then sleep until input arrives"""
+        if not self.screen_idle:
+            self.draw()
+            pygame.display.flip()
+            if self.capture is not None:
+                self.capture.capture(self.screen)
+            self.screen_idle = True
+        
+        # Block without using CPU until something happens
+        events = [pygame.event.wait()]
+        events.extend(pygame.event.get())
+        self.handle_quit_events(events)
+        if any(event.type == pygame.VIDEOEXPOSE for event in events):
+            pygame.display.flip()
+        
+        if any(event.type == pygame.KEYDOWN for event in events):
+            self.step(read_keyboard(events))
+            if not self.on_static_screen():
+                self.screen_idle = False
+                self.full_redraw = True
+                self.clock.tick()  # Don't count the idle time as a slow frame
+    
+    def run(self):
+        step_time = 1 / self.tick_rate
+        lag = 0.0  # Real time not yet simulated
+        last_time = time.perf_counter()
+        jump_pressed = restart = False  # Presses waiting for the next step
+        while self.running:
+            if self.on_static_screen():
+                self.wait_on_static_screen()
+                lag = 0.0
+                last_time = time.perf_counter()
+                continue
+            
+            # Handle events
+            profiler = self.profiler
+            if profiler:
+                profiler.phase("input")
+            events = pygame.event.get()
+            self.handle_quit_events(events)
+            self.handle_debug_keys(events)
+            controls = read_keyboard(events)
+            jump_pressed = jump_pressed or controls.jump_pressed
+            restart = restart or controls.restart
+            
+            # Run as many fixed steps as real time has passed, but never so many
+            # that a slow frame makes the next one slower still
+            now = time.perf_counter()
+            lag = min(lag + now - last_time, MAX_CATCH_UP_STEPS * step_time)
+            last_time = now
+            if profiler:
+                profiler.phase("update")
+            while lag >= step_time and not self.on_static_screen():
+                controls.jump_pressed, controls.restart = jump_pressed, restart
+                self.step(controls, frames=self.tick_frames)
+                jump_pressed = restart = False
+                lag -= step_time
+            
+            # Draw everything and update display, part way to the next step
+            if profiler:
+                profiler.phase("draw")
+            saved = self.blend_positions(lag / step_time)
+            if self.dirty_rects:
+                rects = self.draw_dirty()
+                if profiler:
+                    profiler.phase("flip")
+                pygame.display.update(rects)
+            else:
+                self.draw()
+                if profiler:
+                    profiler.phase("flip")
+                pygame.display.flip()
+            self.restore_positions(saved)
+            if self.capture is not None:
+                if profiler:
+                    profiler.phase("capture")
+                self.capture.capture(self.screen)
+            if profiler:
+                profiler.end_frame(self)
+            self.clock.tick(self.render_fps)
+        
+        if self.recorder is not None:
+            self.recorder.save(self)
+        if self.capture is not None:
+            print(self.capture.close())
+        pygame.quit()
+        sys.exit()
+
+# Run the game
+if __name__ == "__main__":
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="Play Super Mario")
+    parser.add_argument("--record", metavar="FILE", help="record the inputs of the session for replay.py")
+    parser.add_argument("--capture", metavar="FILE", help="record the session as video for capture.py")
+    parser.add_argument("--capture-format", choices=["raw", "zlib"], default="zlib",
+                        help="store captured frames as raw pixels or zlib-compressed (default)")
+    args = parser.parse_args()
+    
+    level_paths = find_levels()
+    print(f"=== SUPER MARIO BROS - {len(level_paths)} LEVELS ===")
+    print("CONTROLS:")
+    print("- Arrow Keys or WASD: Move Mario")
+    print("- Space/Up/W: Jump (hold for higher jumps with power-up)")
+    print("- ESC: Quit game")
+    print("- R: Restart (when game over)")
+    print()
+    print("LEVELS:")
+    for path in level_paths:
+        level = open_level(path, CELL_SIZE)
+        print(f"- {level.name} ({level.difficulty.title()}): {len(level.platforms)} platforms, "
+              f"{len(level.moving_platforms)} moving platforms, {len(level.enemies)} enemies")
+    print()
+    print("ITEMS:")
+    print("- Yellow Coins: 10-50 points")
+    print("- Blue Power-up: Speed boost")
+    print("- Green Power-up: Jump boost")
+    print()
+    print("Starting game...")
+    
+    game = Game()
+    if args.record:
+        from replay import Recorder
+        game.recorder = Recorder(args.record)
+    if args.capture:
+        from capture import VideoCapture
+        game.capture = VideoCapture(args.capture, args.capture_format)
     game.run()
\ No newline at end of file
@@ -0,0 +1,264 @@
+import argparse
+import heapq
+import random
+import socket
+import struct
+import sys
+import time
+
+import pygame
+
+from mario_game import Game, InputFrame, FPS, INPUT_JUMP_PRESSED, INPUT_RESTART, read_keyboard
+
+# How far the local game may run ahead of the last confirmed remote input
+MAX_ROLLBACK = 12
+STATE_RING = MAX_ROLLBACK + 2
+
+# Packet: newest remote frame we have confirmed (ack), first frame carried, input count,
+# followed by one INPUT_* byte per frame
+PACKET = struct.Struct("<iiB")
+MAX_PACKET_INPUTS = 255
+
+# Key presses are one-frame edges, so predictions never repeat them
+EDGE_BITS = INPUT_JUMP_PRESSED | INPUT_RESTART
+
+class LatencyShim:
+    """Wraps a UDP socket and delays, jitters and drops outgoing packets.
+
+    Used to test rollback on a single machine. Jitter also reorders packets.
+    """
+    def __init__(self, sock, delay=0.0, jitter=0.0, loss=0.0, seed=None):
+        self.sock = sock
+        self.delay = delay
+        self.jitter = jitter
+        self.loss = loss
+        self.random = random.Random(seed)
+        self.pending = []  # (due time, sequence, data, address) heap
+        self.sequence = 0
+
+    def sendto(self, data, address):
+        if self.random.random() < self.loss:
+            return
+        due = time.monotonic() + self.delay + self.random.uniform(0, self.jitter)
+        heapq.heappush(self.pending, (due, self.sequence, data, address))
+        self.sequence += 1
+        self.flush()
+
+    def flush(self):
+        """Send every held packet whose delay has passed"""
+        now = time.monotonic()
+        while self.pending and self.pending[0][0] <= now:
+            _, _, data, address = heapq.heappop(self.pending)
+            self.sock.sendto(data, address)
+
+    def recvfrom(self, size):
+        self.flush()
+        return self.sock.recvfrom(size)
+
+class RollbackSession:
+    """Keeps a two-player Game in sync with a remote peer by exchanging inputs only.
+
+    The local player's input is applied immediately. The remote player's input
+    is predicted until it arrives; if the guess was wrong the game is rolled
+    back to the saved state of that frame and re-simulated with the real input.
+    """
+    def __init__(self, game, local_player, sock, remote_address):
+        self.game = game
+        self.local_player = local_player
+        self.sock = sock
+        self.remote_address = remote_address
+
+        self.frame = 0  # Next frame to simulate
+        self.local_inputs = bytearray()  # Local INPUT_* bits by frame
+        self.remote_inputs = {}  # Confirmed remote bits by frame
+        self.used_remote = {}  # Remote bits each simulated frame actually used
+        self.confirmed = -1  # Every remote input up to this frame has arrived
+        self.remote_ack = -1  # The peer has every local input up to this frame
+
+        # Saved state before each recent frame, preallocated
+        self.states = [bytearray(game.state_size()) for _ in range(STATE_RING)]
+
+        # Statistics
+        self.rollbacks = 0
+        self.max_rollback = 0
+        self.stalls = 0
+        self.resimulation_time = 0.0
+
+    def advance(self, controls):
+        """Simulate one frame with the local controls.
+
+        Returns False without simulating when the remote peer is too far
+        behind to roll back to; call again with the same controls next frame.
+        """
+        self.poll()
+        if self.frame - self.confirmed > MAX_ROLLBACK:
+            self.stalls += 1
+            self.send_inputs()
+            return False
+        self.local_inputs.append(controls.to_bits())
+        self.send_inputs()
+        self.simulate_frame()
+        return True
+
+    def poll(self):
+        """Read every waiting packet and roll back if a prediction was wrong"""
+        rollback_to = None
+        while True:
+            try:
+                data, _ = self.sock.recvfrom(PACKET.size + MAX_PACKET_INPUTS)
+            except BlockingIOError:
+                break
+            ack, first, count = PACKET.unpack_from(data)
+            self.remote_ack = max(self.remote_ack, ack)
+            for frame, bits in enumerate(data[PACKET.size:PACKET.size + count], first):
+                if frame <= self.confirmed or frame in self.remote_inputs:
+                    continue
+                self.remote_inputs[frame] = bits
+                if frame < self.frame and self.used_remote[frame] != bits:
+                    if rollback_to is None or frame < rollback_to:
+                        rollback_to = frame
+
+        while self.confirmed + 1 in self.remote_inputs:
+            self.confirmed += 1
+
+        # Forget inputs that can no longer be rolled back to
+        for frame in [frame for frame in self.used_remote if frame < self.frame - STATE_RING]:
+            del self.used_remote[frame]
+            self.remote_inputs.pop(frame, None)
+
+        if rollback_to is not None:
+            self.rollback(rollback_to)
+
+    def send_inputs(self):
+        """Send every local input the peer has not acknowledged yet"""
+        first = max(self.remote_ack + 1, len(self.local_inputs) - MAX_PACKET_INPUTS)
+        inputs = self.local_inputs[first:]
+        self.sock.sendto(PACKET.pack(self.confirmed, first, len(inputs)) + inputs, self.remote_address)
+
+    def rollback(self, frame):
+        """Restore the state before frame and re-simulate up to the present"""
+        start = time.perf_counter()
+        depth = self.frame - frame
+        self.game.load_state(self.states[frame % STATE_RING])
+        end = self.frame
+        self.frame = frame
+        while self.frame < end:
+            self.simulate_frame()
+        self.rollbacks += 1
+        self.max_rollback = max(self.max_rollback, depth)
+        self.resimulation_time += time.perf_counter() - start
+
+    def simulate_frame(self):
+        frame = self.frame
+        state = self.states[frame % STATE_RING]
+        if len(state) < self.game.state_size():  # Levels differ in size
+            state = self.states[frame % STATE_RING] = bytearray(self.game.state_size())
+        self.game.save_state(state)
+
+        remote = self.remote_inputs.get(frame)
+        if remote is None:
+            remote = self.predict()
+        self.used_remote[frame] = remote
+
+        local = InputFrame.from_bits(self.local_inputs[frame])
+        if self.local_player == 0:
+            self.game.step(local, InputFrame.from_bits(remote))
+        else:
+            self.game.step(InputFrame.from_bits(remote), local)
+        self.frame += 1
+
+    def predict(self):
+        """Guess the remote input: keep holding what was last confirmed"""
+        return self.remote_inputs.get(self.confirmed, 0) & ~EDGE_BITS
+
+def open_socket(port, delay, jitter, loss, seed=None):
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.bind(("127.0.0.1", port))
+    sock.setblocking(False)
+    if delay or jitter or loss:
+        return LatencyShim(sock, delay, jitter, loss, seed)
+    return sock
+
+def selftest(frames, delay, jitter, loss, seed=0):
+    """Run both peers in one process over loopback and check they end in the same state"""
+    rng = random.Random(seed)
+    sockets = [open_socket(0, delay, jitter, loss, seed + i) for i in range(2)]
+    addresses = [getattr(sock, "sock", sock).getsockname() for sock in sockets]
+    sessions = [
+        RollbackSession(Game(headless=True, num_players=2), i, sockets[i], addresses[1 - i])
+        for i in range(2)
+    ]
+
+    # Random held buttons with occasional key presses for each peer
+    held = [0, 0]
+    pending = [None, None]
+    start = time.perf_counter()
+    tick = 1.0 / FPS
+    next_tick = time.monotonic()
+    while any(session.frame < frames for session in sessions):
+        for i, session in enumerate(sessions):
+            if session.frame >= frames:
+                session.poll()
+                session.send_inputs()
+                continue
+            if pending[i] is None:
+                if rng.random() < 0.1:
+                    held[i] = rng.randrange(8)
+                pending[i] = held[i] | (INPUT_JUMP_PRESSED if rng.random() < 0.05 else 0)
+            if session.advance(InputFrame.from_bits(pending[i])):
+                pending[i] = None
+        next_tick += tick
+        time.sleep(max(0.0, next_tick - time.monotonic()))
+
+    # Keep exchanging until both peers have every input
+    while any(session.confirmed < frames - 1 for session in sessions):
+        for session in sessions:
+            session.poll()
+            session.send_inputs()
+        time.sleep(0.001)
+
+    elapsed = time.perf_counter() - start
+    states = [bytes(session.game.save_state()) for session in sessions]
+    for i, session in enumerate(sessions):
+        average = session.resimulation_time / session.rollbacks * 1000 if session.rollbacks else 0.0
+        print(f"peer {i}: {session.rollbacks} rollbacks, deepest {session.max_rollback} frames, "
+              f"{session.stalls} stalled frames, {average:.2f} ms per rollback")
+    in_sync = states[0] == states[1]
+    print(f"{frames} frames in {elapsed:.1f}s: {'in sync' if in_sync else 'DESYNC'}")
+    return in_sync
+
+def play(local_player, port, peer, delay, jitter, loss):
+    """Play one side of a networked two-player game in a window"""
+    game = Game(num_players=2)
+    pygame.display.set_caption(f"Super Mario Bros - Player {local_player + 1}")
+    host, peer_port = peer.rsplit(":", 1)
+    session = RollbackSession(game, local_player, open_socket(port, delay, jitter, loss), (host, int(peer_port)))
+    # Key presses made while the session is stalled wait for the next frame it runs
+    pending_edges = 0
+    while game.running:
+        events = pygame.event.get()
+        game.handle_quit_events(events)
+        bits = read_keyboard(events).to_bits() | pending_edges
+        if session.advance(InputFrame.from_bits(bits)):
+            pending_edges = 0
+        else:
+            pending_edges = bits & EDGE_BITS
+        game.draw()
+        pygame.display.flip()
+        game.clock.tick(FPS)
+    pygame.quit()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Two-player rollback netplay over UDP")
+    parser.add_argument("--player", type=int, choices=(1, 2), default=1, help="which player this process controls")
+    parser.add_argument("--port", type=int, default=7000, help="local UDP port")
+    parser.add_argument("--peer", default="127.0.0.1:7001", help="host:port of the other player")
+    parser.add_argument("--delay", type=float, default=0.0, help="added one-way delay in ms")
+    parser.add_argument("--jitter", type=float, default=0.0, help="extra random delay in ms")
+    parser.add_argument("--loss", type=float, default=0.0, help="fraction of packets to drop")
+    parser.add_argument("--selftest", type=int, metavar="FRAMES", help="run both peers headless and check sync")
+    args = parser.parse_args()
+
+    if args.selftest:
+        sys.exit(0 if selftest(args.selftest, args.delay / 1000, args.jitter / 1000, args.loss) else 1)
+    play(args.player - 1, args.port, args.peer, args.delay / 1000, args.jitter / 1000, args.loss)
@@ -0,0 +1,184 @@
+import json
+import time
+from collections import deque
+
+import pygame
+
+from mario_game import SCREEN_WIDTH, FPS, WHITE, YELLOW, RED, GREEN, BLACK, text_cache
+
+# Frames kept for the graph and for trace dumps
+HISTORY_FRAMES = 600
+GRAPH_FRAMES = 150
+AVERAGE_FRAMES = 30
+
+# The text panel is re-rendered this often; the overlay is otherwise just a blit
+PANEL_REFRESH = 10
+PANEL_WIDTH = 330
+PANEL_POSITION = (SCREEN_WIDTH - PANEL_WIDTH - 10, 90)
+GRAPH_HEIGHT = 50
+GRAPH_MAX_MS = 2000 / FPS  # Top of the graph is two frame budgets
+
+class FrameRecord:
+    """Timings and counts of one profiled frame"""
+    def __init__(self, start):
+        self.start = start
+        self.end = start
+        self.events = []  # (name, category, start, duration); category is the enclosing phase or None
+        self.draw_calls = 0
+        self.counts = {}
+
+class FrameProfiler:
+    """Times the phases of each frame for the debug overlay and trace dumps.
+
+    A frame is split into phases (input, update, draw, flip) and each phase
+    into laps (one per entity group). Starting a phase or lap ends the one
+    before it, so instrumented code only marks where each part begins. Game
+    holds a FrameProfiler only while profiling is on, so the instrumentation
+    is a single attribute test per mark when it is off.
+    """
+    def __init__(self, history=HISTORY_FRAMES):
+        self.frames = deque(maxlen=history)
+        self.frame = None
+        self.phase_name = None
+        self.phase_start = 0.0
+        self.lap_name = None
+        self.lap_start = 0.0
+        self.origin = time.perf_counter()
+        self.panel = None
+        self.panel_age = PANEL_REFRESH
+
+    def phase(self, name):
+        now = time.perf_counter()
+        if self.frame is None:
+            self.frame = FrameRecord(now)
+        self.close_phase(now)
+        self.phase_name = name
+        self.phase_start = now
+
+    def lap(self, name):
+        if self.phase_name is None:
+            return
+        now = time.perf_counter()
+        self.close_lap(now)
+        self.lap_name = name
+        self.lap_start = now
+
+    def close_lap(self, now):
+        if self.lap_name is not None:
+            self.frame.events.append((self.lap_name, self.phase_name, self.lap_start, now - self.lap_start))
+            self.lap_name = None
+
+    def close_phase(self, now):
+        if self.phase_name is not None:
+            self.close_lap(now)
+            self.frame.events.append((self.phase_name, None, self.phase_start, now - self.phase_start))
+            self.phase_name = None
+
+    def count_draws(self, count):
+        if self.frame is not None:
+            self.frame.draw_calls += count
+
+    def end_frame(self, game):
+        """Close the frame and take the entity counts from game"""
+        if self.frame is None:
+            return
+        now = time.perf_counter()
+        self.close_phase(now)
+        self.frame.end = now
+        self.frame.counts = game.entity_counts()
+        self.frames.append(self.frame)
+        self.frame = None
+
+    def averages(self):
+        """Mean milliseconds over the recent frames as (phase, [(lap, ms)], ms), in frame order"""
+        frames = list(self.frames)[-AVERAGE_FRAMES:]
+        phases = {}
+        laps = {}
+        for frame in frames:
+            for name, category, _, duration in frame.events:
+                if category is None:
+                    phases[name] = phases.get(name, 0.0) + duration
+                else:
+                    phase_laps = laps.setdefault(category, {})
+                    phase_laps[name] = phase_laps.get(name, 0.0) + duration
+        scale = 1000 / len(frames) if frames else 0
+        return [
+            (phase, [(lap, lap_total * scale) for lap, lap_total in laps.get(phase, {}).items()], total * scale)
+            for phase, total in phases.items()
+        ]
+
+    def draw(self, screen):
+        """Blit the overlay panel; returns the screen rect it covers"""
+        self.panel_age += 1
+        if self.panel is None or self.panel_age >= PANEL_REFRESH:
+            self.panel = self.render_panel()
+            self.panel_age = 0
+        self.count_draws(1)
+        return screen.blit(self.panel, PANEL_POSITION)
+
+    def render_panel(self):
+        font = text_cache.font(None, 20)
+        lines = []
+        frames = list(self.frames)
+        if len(frames) > 1:
+            recent = frames[-AVERAGE_FRAMES:]
+            work = sum(frame.end - frame.start for frame in recent) / len(recent) * 1000
+            interval = (recent[-1].start - recent[0].start) / max(len(recent) - 1, 1) * 1000
+            rate = f"  ({1000 / interval:.0f} fps)" if interval else ""
+            lines.append((f"work {work:.2f} ms, interval {interval:.2f} ms{rate}", "", WHITE))
+        for phase, laps, ms in self.averages():
+            lines.append((phase, f"{ms:.3f} ms", YELLOW))
+            for lap, lap_ms in laps:
+                lines.append(("    " + lap, f"{lap_ms:.3f} ms", WHITE))
+        if frames:
+            last = frames[-1]
+            lines.append(("draw calls", str(last.draw_calls), YELLOW))
+            lines.append(("objects", "active / collected / total", YELLOW))
+            for group, (active, collected, total) in last.counts.items():
+                lines.append(("    " + group, f"{active} / {collected} / {total}", WHITE))
+
+        line_height = 17
+        height = GRAPH_HEIGHT + 20 + line_height * len(lines)
+        panel = pygame.Surface((PANEL_WIDTH, height))
+        panel.set_alpha(210)
+        panel.fill(BLACK)
+
+        # Frame work time graph with a line at the frame budget
+        graph = frames[-GRAPH_FRAMES:]
+        bar_width = PANEL_WIDTH / GRAPH_FRAMES
+        for i, frame in enumerate(graph):
+            ms = (frame.end - frame.start) * 1000
+            bar = min(GRAPH_HEIGHT, ms / GRAPH_MAX_MS * GRAPH_HEIGHT)
+            color = GREEN if ms < 1000 / FPS else RED
+            pygame.draw.rect(panel, color, (i * bar_width, 10 + GRAPH_HEIGHT - bar, max(bar_width, 1), bar))
+        budget_y = 10 + GRAPH_HEIGHT - GRAPH_HEIGHT / 2
+        pygame.draw.line(panel, WHITE, (0, budget_y), (PANEL_WIDTH, budget_y))
+
+        y = GRAPH_HEIGHT + 15
+        for label, value, color in lines:
+            panel.blit(font.render(label, True, color), (6, y))
+            if value:
+                value_text = font.render(value, True, color)
+                panel.blit(value_text, (PANEL_WIDTH - 6 - value_text.get_width(), y))
+            y += line_height
+        return panel
+
+    def trace_events(self):
+        """The recorded frames as Chrome trace events (timestamps in microseconds)"""
+        events = [{"name": "process_name", "ph": "M", "pid": 1, "args": {"name": "Super Mario"}}]
+        for number, frame in enumerate(self.frames):
+            start = (frame.start - self.origin) * 1e6
+            events.append({"name": "frame", "cat": "frame", "ph": "X", "pid": 1, "tid": 1,
+                           "ts": start, "dur": (frame.end - frame.start) * 1e6, "args": {"frame": number}})
+            for name, category, event_start, duration in frame.events:
+                events.append({"name": name, "cat": category or "phase", "ph": "X", "pid": 1, "tid": 1,
+                               "ts": (event_start - self.origin) * 1e6, "dur": duration * 1e6})
+            active = {group: counts[0] for group, counts in frame.counts.items()}
+            active["draw_calls"] = frame.draw_calls
+            events.append({"name": "objects", "ph": "C", "pid": 1, "ts": start, "args": active})
+        return events
+
+    def dump_trace(self, path):
+        """Write the recorded frames as a Chrome trace (chrome://tracing, Perfetto)"""
+        with open(path, "w") as f:
+            json.dump({"traceEvents": self.trace_events(), "displayTimeUnit": "ms"}, f)
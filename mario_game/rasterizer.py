@@ -0,0 +1,144 @@
+import argparse
+import math
+import random
+import sys
+
+import numpy as np
+
+from mario_game import Game, InputFrame, SCREEN_WIDTH, SCREEN_HEIGHT, INPUT_RESTART
+
+# One channel per kind of object, in this order
+CHANNELS = ["platforms", "moving_platforms", "basic", "fast", "jumper", "coins", "power_ups", "player"]
+PLATFORMS, MOVING_PLATFORMS, ENEMY_BASIC, ENEMY_FAST, ENEMY_JUMPER, COINS, POWER_UPS, PLAYER = range(len(CHANNELS))
+ENEMY_CHANNELS = {"basic": ENEMY_BASIC, "fast": ENEMY_FAST, "jumper": ENEMY_JUMPER}
+
+class Rasterizer:
+    """Draws the game state straight into a small NumPy grid, one channel per object kind.
+
+    The grid covers the visible screen at 1/downsample resolution: cell (y, x)
+    is 1 in a channel when an object of that kind overlaps it. Static
+    platforms are rasterized once per level across the whole level width and
+    sliced at the camera; everything else is one slice assignment per object.
+    Nothing here touches SDL, so it works without pygame drawing or a display.
+    """
+    def __init__(self, downsample=4):
+        self.downsample = downsample
+        self.height = math.ceil(SCREEN_HEIGHT / downsample)
+        self.width = math.ceil(SCREEN_WIDTH / downsample)
+        self.shape = (len(CHANNELS), self.height, self.width)
+        self.level = None
+        self.static = None
+
+    def static_layer(self, game):
+        """Static platforms of the whole level, rebuilt when the level changes"""
+        if self.level is not game.level:
+            d = self.downsample
+            static = np.zeros((self.height, math.ceil(game.world_width / d) + self.width), dtype=np.uint8)
+            for platform in game.platforms:
+                left, top = math.floor(platform.x / d), math.floor(platform.y / d)
+                right, bottom = math.ceil((platform.x + platform.width) / d), math.ceil((platform.y + platform.height) / d)
+                static[max(top, 0):max(bottom, 0), max(left, 0):max(right, 0)] = 1
+            self.level = game.level
+            self.static = static
+        return self.static
+
+    def render(self, game, out=None):
+        """Rasterize the current view of game into out (allocated if None) and return it"""
+        if out is None:
+            out = np.empty(self.shape, dtype=np.uint8)
+        camera_x = game.camera_position()
+        column = camera_x // self.downsample
+        out[PLATFORMS] = self.static_layer(game)[:, column:column + self.width]
+        out[MOVING_PLATFORMS:] = 0
+
+        d = self.downsample
+        fill_objects(out[MOVING_PLATFORMS], game.active_moving_platforms, camera_x, d, False)
+        enemies = game.active_enemies
+        for enemy_type, channel in ENEMY_CHANNELS.items():
+            fill_objects(out[channel], [enemy for enemy in enemies if enemy.enemy_type == enemy_type], camera_x, d, False)
+        fill_objects(out[COINS], game.active_coins, camera_x, d, True)
+        fill_objects(out[POWER_UPS], game.active_power_ups, camera_x, d, True)
+        fill_objects(out[PLAYER], game.players, camera_x, d, False)
+        return out
+
+def fill_objects(grid, objects, camera_x, d, bobbing):
+    """Set the cells under every object on screen; bobbing objects are drawn at y + bob_offset"""
+    for obj in objects:
+        x = obj.x - camera_x
+        right = x + obj.width
+        if right <= 0 or x >= SCREEN_WIDTH:
+            continue
+        y = obj.y + obj.bob_offset if bobbing else obj.y
+        bottom = y + obj.height
+        if bottom <= 0 or y >= SCREEN_HEIGHT:
+            continue
+        # Floor of the near edges and ceiling of the far edges, in cells. Both
+        # ends are kept on the grid: a negative slice end would count from the
+        # far side and fill most of the column
+        top = int(y // d)
+        left = int(x // d)
+        grid[top if top > 0 else 0:int(-(-bottom // d)), left if left > 0 else 0:int(-(-right // d))] = 1
+
+def reference_grid(rasterizer, game):
+    """Dynamic channels of render() worked out cell by cell from each object's pixel box"""
+    d = rasterizer.downsample
+    camera_x = game.camera_position()
+    boxes = [(MOVING_PLATFORMS, p.x, p.y, p) for p in game.active_moving_platforms]
+    boxes += [(ENEMY_CHANNELS[e.enemy_type], e.x, e.y, e) for e in game.active_enemies]
+    boxes += [(COINS, c.x, c.y + c.bob_offset, c) for c in game.active_coins]
+    boxes += [(POWER_UPS, p.x, p.y + p.bob_offset, p) for p in game.active_power_ups]
+    boxes += [(PLAYER, p.x, p.y, p) for p in game.players]
+    grid = np.zeros(rasterizer.shape, dtype=np.uint8)
+    rows = np.arange(rasterizer.height)[:, None] * d
+    columns = np.arange(rasterizer.width)[None, :] * d
+    for channel, x, y, obj in boxes:
+        # Clip to the screen, then mark every cell the clipped box overlaps
+        left, right = max(x - camera_x, 0), min(x - camera_x + obj.width, SCREEN_WIDTH)
+        top, bottom = max(y, 0), min(y + obj.height, SCREEN_HEIGHT)
+        if left < right and top < bottom:
+            grid[channel] |= (rows < bottom) & (rows + d > top) & (columns < right) & (columns + d > left)
+    return grid
+
+def selftest(frames, seed=0):
+    """Play random inputs on every level, also moving an enemy off each edge of the screen,
+    and check the dynamic channels of render() against reference_grid(); returns True if all matched"""
+    rng = random.Random(seed)
+    rasterizer = Rasterizer()
+    failed = 0
+    game = Game(headless=True)
+    for level in range(1, len(game.level_paths) + 1):
+        game.current_level = level
+        game.setup_level()
+        for frame in range(frames):
+            game.step(InputFrame.from_bits(rng.randrange(INPUT_RESTART)))
+            if game.game_over or game.current_level != level:
+                break
+            # Every 10th frame park an enemy above, below, or beside the screen
+            enemies = game.active_enemies
+            if frame % 10 == 0 and enemies:
+                enemy = rng.choice(enemies)
+                camera_x = game.camera_position()
+                enemy.x, enemy.y = rng.choice([
+                    (camera_x + 100, -enemy.height - rng.uniform(0, 200)),
+                    (camera_x + 100, -enemy.height / 2),
+                    (camera_x + 100, SCREEN_HEIGHT + rng.uniform(0, 50)),
+                    (camera_x - enemy.width - rng.uniform(0, 50), 300),
+                    (camera_x + SCREEN_WIDTH + rng.uniform(0, 50), 300),
+                ])
+            wrong = rasterizer.render(game)[MOVING_PLATFORMS:] != reference_grid(rasterizer, game)[MOVING_PLATFORMS:]
+            if wrong.any():
+                failed += 1
+                channels = sorted({CHANNELS[MOVING_PLATFORMS + channel] for channel in np.nonzero(wrong)[0]})
+                print(f"FAIL level {level} frame {frame}: {', '.join(channels)} differ")
+    print(f"{failed} mismatched frames over {len(game.level_paths)} levels")
+    return not failed
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rasterize game state into NumPy grids")
+    parser.add_argument("--selftest", type=int, metavar="FRAMES",
+                        help="play random inputs on every level and check render() cell by cell")
+    args = parser.parse_args()
+
+    if args.selftest:
+        sys.exit(0 if selftest(args.selftest) else 1)
+    parser.print_help()
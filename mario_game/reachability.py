@@ -0,0 +1,403 @@
+import argparse
+import bisect
+import heapq
+import json
+import math
+import sys
+import time
+
+from mario_game import (
+    Player, Coin, PowerUp, CELL_SIZE, SCREEN_WIDTH, SCREEN_HEIGHT,
+    GRAVITY, JUMP_STRENGTH, JUMP_BOOST, PLAYER_SPEED, BOOSTED_SPEED, BOOST_FRAMES, LEVEL_END_MARGIN,
+)
+from level_format import find_levels, open_level
+
+PLAYER = Player(0, 0)
+
+# Arcs are followed until the player has dropped this far, which is past the
+# pit from anywhere a platform can be stood on
+MAX_DROP = SCREEN_HEIGHT + PLAYER.height
+
+# How far coins and power-ups bob above and below their level position
+COIN_BOB = 5
+POWER_UP_BOB = 3
+
+GOAL = -1  # Node index of the end of the level in routes
+
+class Arc:
+    """How far the player has risen or dropped, frame by frame, after leaving the ground one way.
+
+    fall_frames is how long the player drops off an edge before jumping, or
+    None to never jump. Walking off an edge leaves Player.on_ground set, so
+    the game allows that one late jump. dy[t - 1] is the height change at the
+    end of frame t; segments split the frames into runs that only rise or
+    only fall, so the frames within a height band can be found by bisection.
+    """
+    def __init__(self, fall_frames, jump_velocity):
+        self.fall_frames = fall_frames
+        self.dy = []
+        self.segments = []  # (first frame, dy values, rising); rising runs store -dy so all are ascending
+        y = vel = 0.0
+        while y <= MAX_DROP:
+            if len(self.dy) == fall_frames:
+                vel = jump_velocity
+            vel += GRAVITY
+            y += vel
+            self.dy.append(y)
+            rising = vel <= 0
+            if not self.segments or self.segments[-1][2] != rising:
+                self.segments.append((len(self.dy), [], rising))
+            self.segments[-1][1].append(-y if rising else y)
+        self.frames = len(self.dy)
+        self.top = min(self.dy)
+        self.landing_start = self.segments[-1][0]  # Frames before the final descent
+
+    def first_frame(self, low, high, min_frames=0, falling_only=False):
+        """The earliest frame from min_frames on where low < dy < high, or None"""
+        for first, values, rising in self.segments:
+            if first + len(values) <= min_frames:
+                continue
+            if rising:
+                if falling_only:
+                    continue
+                start, end = bisect.bisect_right(values, -high), bisect.bisect_left(values, -low)
+            else:
+                start, end = bisect.bisect_right(values, low), bisect.bisect_left(values, high)
+            if start < end and first + end - 1 >= min_frames:
+                return max(first + start, min_frames)
+        return None
+
+    def frames_above(self, height):
+        """Frames before dy first goes past height"""
+        return bisect.bisect_right(self.dy, height) if self.dy[-1] > height else self.frames
+
+class Physics:
+    """The player's running speed and every arc to leave the ground with the given jump strengths"""
+    def __init__(self, speed=PLAYER_SPEED, jump_velocities=(JUMP_STRENGTH,)):
+        self.speed = speed
+        self.jump_velocities = jump_velocities
+        self.drop = Arc(None, 0)
+        # One list of arcs per jump strength, ordered by how long the player drops before jumping
+        self.jumps = [[Arc(fall_frames, velocity) for fall_frames in range(self.drop.frames)]
+                      for velocity in jump_velocities]
+
+    def with_speed(self, speed):
+        return Physics(speed, self.jump_velocities)
+
+    @classmethod
+    def boosted(cls):
+        """Both power-ups active. The boosted jump is a press released within the
+        same frame; Player.update turns a held press back into a plain jump"""
+        return cls(BOOSTED_SPEED, (JUMP_STRENGTH, JUMP_STRENGTH * JUMP_BOOST))
+
+class Node:
+    """Somewhere the player can stand, as the player.x range and player.y while standing there"""
+    __slots__ = ("name", "left", "right", "y", "grounded")
+
+    def __init__(self, name, left, right, y, grounded=True):
+        self.name = name
+        self.left = left
+        self.right = right
+        self.y = y
+        self.grounded = grounded  # False for the start point: the player falls from it and cannot jump
+
+class ReachabilityGraph:
+    """Which platforms of a level the player can get between, and how fast.
+
+    Every static platform is a node, as is every moving platform across its
+    whole range of travel and the start point. edges[i] lists (j, frames) for
+    each node j the player can land on from node i in one jump or drop, with
+    the fewest frames in the air that takes. The model is optimistic: it
+    ignores enemies, assumes a moving platform is wherever it is needed and
+    lets an arc pass through the tops of platforms other than its target.
+    """
+    def __init__(self, level, physics):
+        self.physics = physics
+        self.world_width = max(SCREEN_WIDTH, math.ceil(level.bounds[2]))
+        self.goal_x = self.world_width - LEVEL_END_MARGIN
+        self.max_x = self.world_width - PLAYER.width
+
+        start_x, start_y = level.player_start
+        self.nodes = [Node("start", start_x, start_x, start_y, grounded=False)]
+        for i, (x, y, width, height, _) in enumerate(level.platforms):
+            self.add_node(f"platform {i}", x, x + width, y)
+        for i, (x, y, width, height, _, min_x, max_x) in enumerate(level.moving_platforms):
+            self.add_node(f"moving platform {i}", min_x, max_x + width, y)
+
+        # Frames each node allows in the air before the pit, which bounds how far away its edges go
+        self.air_frames = [max(arc.frames_above(SCREEN_HEIGHT - node.y) for arcs in self.arcs(node) for arc in arcs)
+                           for node in self.nodes]
+        self.reach = physics.speed * max(self.air_frames)
+
+        # Targets are looked up by x so wide levels don't compare every pair of nodes
+        self.by_left = sorted(range(len(self.nodes)), key=lambda i: self.nodes[i].left)
+        self.lefts = [self.nodes[i].left for i in self.by_left]
+        self.edges = [self.edges_from(node, physics.speed * air) for node, air in zip(self.nodes, self.air_frames)]
+
+    def add_node(self, name, left, right, top):
+        # Standing means overlapping the platform by at least a pixel
+        left, right = max(left - PLAYER.width + 1, 0), min(right - 1, self.max_x)
+        if left <= right:
+            self.nodes.append(Node(name, left, right, top - PLAYER.height))
+
+    def arcs(self, node):
+        """Lists of arcs the player can leave node on; within each, later jumps peak lower"""
+        drop = [self.physics.drop]
+        return [drop] + self.physics.jumps if node.grounded else [drop]
+
+    def nodes_within(self, left, right, reach):
+        """Nodes that overlap the x range left to right widened by reach"""
+        return [i for i in self.by_left[:bisect.bisect_right(self.lefts, right + reach)]
+                if self.nodes[i].right >= left - reach]
+
+    def edges_from(self, node, reach):
+        speed = self.physics.speed
+        edges = []
+        for j in self.nodes_within(node.left, node.right, reach):
+            target = self.nodes[j]
+            if target is node or not target.grounded:
+                continue
+            gap = max(target.left - node.right, node.left - target.right, 0)
+            rise = target.y - node.y
+            # Walking straight across; the landing snap also climbs steps up to a player height
+            if node.grounded and gap == 0 and -PLAYER.height + GRAVITY < rise < GRAVITY:
+                edges.append((j, 0))
+                continue
+            # Landing needs the player moving down with its feet inside the platform top
+            low, high = rise, min(target.y + PLAYER.height, SCREEN_HEIGHT) - node.y
+            best = self.landing_frames(node, low, high, math.ceil(gap / speed))
+            if best is not None:
+                edges.append((j, best))
+        edges.sort()
+        return edges
+
+    def landing_frames(self, node, low, high, min_frames):
+        """Fewest frames from leaving node to coming down with low < dy < high, at least min_frames, or None"""
+        best = None
+        for arcs in self.arcs(node):
+            for arc in arcs:
+                # Later jumps peak lower and come down later; the drop covers landings before the jump
+                if arc.fall_frames is not None and (high <= arc.top or best is not None and best <= arc.landing_start):
+                    break
+                frames = arc.first_frame(low, high, max(min_frames, arc.landing_start), falling_only=True)
+                if frames is not None and (best is None or frames < best):
+                    best = frames
+                    if best == min_frames:
+                        return best
+        return best
+
+    def reaches_goal(self, i):
+        node = self.nodes[i]
+        return node.right + self.physics.speed * self.air_frames[i] > self.goal_x
+
+    def frames_to_goal(self, x):
+        """Fewest frames to get from x past the end of the level, a lower bound from anywhere"""
+        return max(0, math.floor((self.goal_x - x) / self.physics.speed) + 1)
+
+    def reachable(self):
+        """Indices of the nodes the player can get to from the start"""
+        seen = {0}
+        pending = [0]
+        while pending:
+            for j, _ in self.edges[pending.pop()]:
+                if j not in seen:
+                    seen.add(j)
+                    pending.append(j)
+        return seen
+
+    def reachable_with_boost(self, boosted, boxes):
+        """Indices of the nodes the player can get to without and with the speed boost, as two sets.
+
+        A search over (node, boosted) from the start: touching one of boxes, the
+        (x, y, width, height) of the speed power-ups, switches from these edges
+        to those of boosted, the graph at BOOSTED_SPEED, for BOOST_FRAMES. Each
+        boosted node keeps the most boost left on landing there and every
+        boosted edge uses up its air time. Wherever the player is boosted they
+        can wait the boost out. Picking up a second speed power-up while boosted
+        is left out.
+        """
+        plain = set()
+        boost_left = {}  # Boosted node -> most boost frames left on getting there
+        pending = [0]
+        heap = []  # (-boost frames left, node)
+        while pending or heap:
+            while pending:
+                i = pending.pop()
+                if i in plain:
+                    continue
+                plain.add(i)
+                pending.extend(j for j, _ in self.edges[i])
+                if any(self.can_touch((i,), *box) for box in boxes):
+                    heapq.heappush(heap, (-BOOST_FRAMES, i))
+            if heap:
+                left, i = heapq.heappop(heap)
+                left = -left
+                if boost_left.get(i, -1) >= left:
+                    continue
+                boost_left[i] = left
+                pending.append(i)
+                for j, air in boosted.edges[i]:
+                    if air <= left and boost_left.get(j, -1) < left - air:
+                        heapq.heappush(heap, (air - left, j))
+        return plain, set(boost_left)
+
+    def route(self):
+        """The fastest route to the end of the level as [(node index, x, frame)], or None.
+
+        A* over (node, landing x), where getting from x on one node to another
+        takes the longer of its air time and the horizontal distance at full
+        speed. The heuristic is the distance to the end at full speed. Frame
+        counts leave out waiting for moving platforms and never pick up power-ups.
+        """
+        speed = self.physics.speed
+        start_x = self.nodes[0].left
+        # Ties go to the state furthest along, since many routes run at full speed
+        heap = [(self.frames_to_goal(start_x), 0, 0, 0, start_x)]
+        best = {(0, round(start_x)): 0}
+        came_from = {}
+        while heap:
+            _, _, frames, i, x = heapq.heappop(heap)
+            if i == GOAL:
+                route = [(GOAL, x, frames)]
+                key = (GOAL, round(x))
+                while key in came_from:
+                    key, step = came_from[key]
+                    route.append(step)
+                return route[::-1]
+            if frames > best.get((i, round(x)), frames):
+                continue
+            # Land as close as possible, or as far as the jump carries either way
+            moves = []
+            for j, air in self.edges[i]:
+                target = self.nodes[j]
+                for aim in (x, x + speed * air, x - speed * air):
+                    moves.append((j, min(max(aim, target.left), target.right), air))
+            if self.reaches_goal(i):
+                moves.append((GOAL, max(x, self.goal_x + 1), 0))
+            for j, to_x, air in moves:
+                arrival = frames + max(air, math.ceil(abs(to_x - x) / speed))
+                key = (j, round(to_x))
+                if arrival < best.get(key, arrival + 1):
+                    best[key] = arrival
+                    came_from[key] = ((i, round(x)), (i, x, frames))
+                    heapq.heappush(heap, (arrival + self.frames_to_goal(to_x), -arrival, arrival, j, to_x))
+        return None
+
+    def can_touch(self, nodes, x, y, width, height):
+        """True if the player can overlap the box from any of the given nodes"""
+        speed = self.physics.speed
+        for i in self.nodes_within(x - PLAYER.width, x + width, self.reach):
+            if i not in nodes:
+                continue
+            node = self.nodes[i]
+            gap = max(x - PLAYER.width + 1 - node.right, node.left - (x + width - 1), 0)
+            if node.grounded and gap == 0 and node.y < y + height and node.y + PLAYER.height > y:
+                return True
+            min_frames = math.ceil(gap / speed)
+            low, high = y - PLAYER.height - node.y, y + height - node.y
+            for arcs in self.arcs(node):
+                for arc in arcs:
+                    if arc.fall_frames is not None and high <= arc.top:
+                        break
+                    if arc.first_frame(low, high, min_frames) is not None:
+                        return True
+        return False
+
+class Report:
+    """What check_level found out about one level"""
+    def __init__(self, name):
+        self.name = name
+        self.completable = False
+        self.route = None
+        self.frames = None
+        self.unreachable_platforms = []
+        self.unreachable_coins = []
+        self.unreachable_power_ups = []
+        self.milliseconds = 0.0
+
+    def to_dict(self):
+        return {
+            "completable": self.completable,
+            "frames": self.frames,
+            "route": self.route,
+            "unreachable_platforms": self.unreachable_platforms,
+            "unreachable_coins": self.unreachable_coins,
+            "unreachable_power_ups": self.unreachable_power_ups,
+            "milliseconds": round(self.milliseconds, 3),
+        }
+
+def check_level(level, physics):
+    """Build the reachability graph of a loaded level and report on it.
+
+    Unless physics already runs at BOOSTED_SPEED, a second graph at that speed
+    covers where the player can get after touching a speed power-up.
+    """
+    start = time.perf_counter()
+    graph = ReachabilityGraph(level, physics)
+    report = Report(level.name)
+    speed_boxes = [(x, y - POWER_UP_BOB, PowerUp.width, PowerUp.height + 2 * POWER_UP_BOB)
+                   for x, y, power_type in level.power_ups if power_type == "speed"]
+    if speed_boxes and physics.speed < BOOSTED_SPEED:
+        boosted = ReachabilityGraph(level, physics.with_speed(BOOSTED_SPEED))
+        reachable, boosted_reachable = graph.reachable_with_boost(boosted, speed_boxes)
+    else:
+        boosted = None
+        reachable, boosted_reachable = graph.reachable(), set()
+
+    def can_touch(x, y, width, height):
+        return (graph.can_touch(reachable, x, y, width, height)
+                or boosted is not None and boosted.can_touch(boosted_reachable, x, y, width, height))
+
+    route = graph.route()
+    if route is not None:
+        report.completable = True
+        report.frames = route[-1][2]
+        report.route = [("end" if i == GOAL else graph.nodes[i].name, round(x), frames) for i, x, frames in route]
+    report.unreachable_platforms = [graph.nodes[i].name for i in range(1, len(graph.nodes))
+                                    if i not in reachable and i not in boosted_reachable]
+    report.unreachable_coins = [
+        i for i, (x, y, _) in enumerate(level.coins)
+        if not can_touch(x, y - COIN_BOB, Coin.width, Coin.height + 2 * COIN_BOB)
+    ]
+    report.unreachable_power_ups = [
+        i for i, (x, y, _) in enumerate(level.power_ups)
+        if not can_touch(x, y - POWER_UP_BOB, PowerUp.width, PowerUp.height + 2 * POWER_UP_BOB)
+    ]
+    report.milliseconds = (time.perf_counter() - start) * 1000
+    return report
+
+def print_report(path, report, show_route):
+    status = f"completable in {report.frames} frames" if report.completable else "NOT COMPLETABLE"
+    print(f"{path}: {status} ({report.milliseconds:.1f} ms)")
+    if show_route and report.route:
+        for name, x, frames in report.route:
+            print(f"    frame {frames:>5}  {name} at x={x}")
+    if report.unreachable_platforms:
+        print(f"    unreachable platforms: {', '.join(report.unreachable_platforms)}")
+    if report.unreachable_coins:
+        print(f"    unreachable coins: {report.unreachable_coins}")
+    if report.unreachable_power_ups:
+        print(f"    unreachable power-ups: {report.unreachable_power_ups}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check that levels can be completed without playing them")
+    parser.add_argument("levels", nargs="*", help="level JSON files (default: every level in the levels folder)")
+    parser.add_argument("--boosted", action="store_true", help="assume both power-ups are active throughout")
+    parser.add_argument("--route", action="store_true", help="print the fastest route through each level")
+    parser.add_argument("--strict", action="store_true", help="also fail when a coin or power-up is unreachable")
+    parser.add_argument("--json", help="write the reports to this JSON file")
+    args = parser.parse_args()
+
+    physics = Physics.boosted() if args.boosted else Physics()
+    failed = False
+    reports = {}
+    for path in args.levels or find_levels():
+        report = check_level(open_level(path, CELL_SIZE), physics)
+        print_report(path, report, args.route)
+        reports[path] = report.to_dict()
+        failed |= not report.completable
+        failed |= args.strict and bool(report.unreachable_coins or report.unreachable_power_ups)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(reports, f, indent=2)
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,162 @@
+import argparse
+import os
+import random
+import struct
+import sys
+import tempfile
+
+from mario_game import Game, InputFrame, INPUT_JUMP_PRESSED, INPUT_RESTART
+
+# File layout: a header with the final result, then runs of identical steps,
+# each a repeat count, the INPUT_* bitmask and the frames per step. Version 1
+# files have no frames per step; every step in them is one frame.
+MAGIC = b"MREC"
+VERSION = 2
+HEADER = struct.Struct("<4sBIiiiB")  # magic, version, frames, score, lives, level, flags
+RUN = struct.Struct("<HBB")  # repeat count, INPUT_* bitmask, frames per step
+RUN_V1 = struct.Struct("<HB")  # repeat count, INPUT_* bitmask
+MAX_RUN = 0xFFFF
+
+FLAG_GAME_OVER = 1
+FLAG_GAME_WON = 2
+
+# Self-test: random sessions recorded at each of these step sizes
+SELFTEST_STEPS = [1, 2, 3, 4]
+SELFTEST_FRAMES = 3000
+
+class Recorder:
+    """Collects the controls and length of every Game.step() as run-length encoded bitmasks"""
+    def __init__(self, path):
+        self.path = path
+        self.runs = []  # [count, bits, frames per step] lists
+        self.frames = 0
+
+    def record(self, controls, frames=1):
+        bits = controls.to_bits()
+        last = self.runs[-1] if self.runs else None
+        if last is not None and last[1] == bits and last[2] == frames and last[0] < MAX_RUN:
+            last[0] += 1
+        else:
+            self.runs.append([1, bits, frames])
+        self.frames += frames
+
+    def save(self, game):
+        """Write the recording along with the game's final score, lives and level"""
+        flags = 0
+        if game.game_over:
+            flags |= FLAG_GAME_OVER
+        if game.game_won:
+            flags |= FLAG_GAME_WON
+        with open(self.path, "wb") as f:
+            f.write(HEADER.pack(MAGIC, VERSION, self.frames, game.score, game.lives, game.current_level, flags))
+            for run in self.runs:
+                f.write(RUN.pack(*run))
+
+class Recording:
+    """A recording loaded from disk"""
+    def __init__(self, frames, score, lives, level, flags, runs):
+        self.frames = frames
+        self.score = score
+        self.lives = lives
+        self.level = level
+        self.game_over = bool(flags & FLAG_GAME_OVER)
+        self.game_won = bool(flags & FLAG_GAME_WON)
+        self.runs = runs
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "rb") as f:
+            data = f.read()
+        magic, version, frames, score, lives, level, flags = HEADER.unpack_from(data)
+        if magic != MAGIC or version not in (1, VERSION):
+            raise ValueError(f"{path} is not a version 1 or {VERSION} recording")
+        if version == 1:
+            runs = [(count, bits, 1) for count, bits in RUN_V1.iter_unpack(data[HEADER.size:])]
+        else:
+            runs = list(RUN.iter_unpack(data[HEADER.size:]))
+        return cls(frames, score, lives, level, flags, runs)
+
+def replay(recording):
+    """Feed a recording to a headless Game at full speed, step by step as recorded, and return the game"""
+    game = Game(headless=True)
+    for count, bits, frames in recording.runs:
+        controls = InputFrame.from_bits(bits)
+        for _ in range(count):
+            game.step(controls, frames=frames)
+    return game
+
+def verify(path):
+    """Replay a recording file; returns a list of mismatches (empty if it reproduces)"""
+    recording = Recording.load(path)
+    game = replay(recording)
+    expected = (recording.score, recording.lives, recording.level, recording.game_over, recording.game_won)
+    actual = (game.score, game.lives, game.current_level, game.game_over, game.game_won)
+    names = ("score", "lives", "level", "game_over", "game_won")
+    return [f"{name}: expected {want}, got {got}" for name, want, got in zip(names, expected, actual) if want != got]
+
+class RandomInputs:
+    """Random held buttons with occasional jump presses, as in netplay's self-test"""
+    def __init__(self, rng):
+        self.rng = rng
+        self.held = 0
+
+    def __call__(self, game):
+        if self.rng.random() < 0.1:
+            self.held = self.rng.randrange(8)
+        return InputFrame.from_bits(self.held | (INPUT_JUMP_PRESSED if self.rng.random() < 0.05 else 0))
+
+def replay_single_frames(recording):
+    """Replay a recording one frame at a time, with each step's key presses on its first frame"""
+    game = Game(headless=True)
+    for count, bits, frames in recording.runs:
+        controls = InputFrame.from_bits(bits)
+        held = InputFrame.from_bits(bits & ~(INPUT_JUMP_PRESSED | INPUT_RESTART))
+        for _ in range(count):
+            game.step(controls)
+            for _ in range(frames - 1):
+                game.step(held)
+    return game
+
+def selftest(sessions, seed=0):
+    """Record random sessions at every SELFTEST_STEPS step size and check each one
+    replays to its result and to the same state as single-frame steps; returns True if all did"""
+    failed = 0
+    with tempfile.TemporaryDirectory() as directory:
+        for step_frames in SELFTEST_STEPS:
+            for session in range(sessions):
+                path = os.path.join(directory, f"step{step_frames}-{session}.mrec")
+                game = Game(headless=True)
+                game.recorder = Recorder(path)
+                game.simulate(RandomInputs(random.Random(seed + session)), SELFTEST_FRAMES, step_frames)
+                game.recorder.save(game)
+
+                problems = verify(path)
+                if bytes(replay_single_frames(Recording.load(path)).save_state()) != bytes(game.save_state()):
+                    problems.append("single-frame steps end in a different state")
+                if problems:
+                    failed += 1
+                    print(f"FAIL {step_frames}-frame steps, session {session}: " + "; ".join(problems))
+    total = len(SELFTEST_STEPS) * sessions
+    print(f"{total - failed} of {total} sessions reproduced at {', '.join(map(str, SELFTEST_STEPS))} frames per step")
+    return not failed
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Verify recordings made with mario_game.py --record")
+    parser.add_argument("recordings", nargs="*", help="recording files to replay and check")
+    parser.add_argument("--selftest", type=int, metavar="SESSIONS",
+                        help="record random sessions at several step sizes and check they replay")
+    args = parser.parse_args()
+
+    if args.selftest:
+        sys.exit(0 if selftest(args.selftest) else 1)
+    # Verify every recording given on the command line
+    failed = 0
+    for path in args.recordings:
+        problems = verify(path)
+        if problems:
+            failed += 1
+            print(f"FAIL {path}: " + "; ".join(problems))
+        else:
+            print(f"ok   {path}")
+    print(f"{len(args.recordings) - failed} passed, {failed} failed")
+    sys.exit(1 if failed else 0)